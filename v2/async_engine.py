@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import threading
+
+try:
+    import aiohttp
+    from yarl import URL
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+import crawler as crawler_module
+from crawler import Crawler
+from list_parser import extract_list_page
+from http_cache import CachedResponse
+from rate_limiter import is_throttle_status
+
+MAX_CONNECTIONS = 32           # open sockets per session, the rate limiter decides how fast they are used
+MAX_DETAILS_IN_FLIGHT = 64     # detail pages being fetched at once by AsyncDetailFetcher
+MAX_PHOTOS_IN_FLIGHT = 32      # photos being downloaded at once, a separate stage from the detail pages
+STOP_POLL_INTERVAL = 0.1
+
+if AIOHTTP_AVAILABLE:
+    NETWORK_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+else:
+    NETWORK_ERRORS = (asyncio.TimeoutError,)
+
+
+async def fetch(session, url, headers, timeout, http_cache=None):
+    """Async GET returning a http_cache.CachedResponse, through http_cache if given.
+
+    Raises aiohttp.ClientResponseError for HTTP errors and aiohttp.ClientError /
+    asyncio.TimeoutError for network errors.
+    """
+    fresh, meta, request_headers = None, None, headers
+    if http_cache is not None:
+        fresh, meta, request_headers = await asyncio.to_thread(http_cache.prepare, url, headers)
+        if fresh is not None:
+            return fresh
+    # encoded=True sends the URL exactly as built (yarl would otherwise re-quote the jc%5B%5D params)
+    async with session.get(URL(url, encoded=True), headers=request_headers, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        body = await resp.read()
+        if resp.status >= 400:
+            raise aiohttp.ClientResponseError(resp.request_info, resp.history, status=resp.status,
+                                              message=resp.reason or "", headers=resp.headers)
+        status, resp_headers = resp.status, dict(resp.headers)
+    if http_cache is None:
+        return CachedResponse(url, body, status, resp_headers)
+    cached = await asyncio.to_thread(http_cache.complete, url, meta, status, resp_headers, body)
+    if cached is None:
+        # Stored body vanished, fetch it again unconditionally
+        return await fetch(session, url, headers, timeout)
+    return cached
+
+
+async def wait_or_stop(stop_event, seconds):
+    """Sleeps for seconds unless stop_event gets set. Returns True if it did."""
+    while seconds > 0:
+        if stop_event.is_set(): return True
+        await asyncio.sleep(min(seconds, STOP_POLL_INTERVAL))
+        seconds -= STOP_POLL_INTERVAL
+    return stop_event.is_set()
+
+
+class AsyncCrawler(Crawler):
+    """Crawler that runs every shard and page request as a task on one asyncio event loop.
+
+    Same signals, settings and crawl semantics as Crawler; only the transport changes.
+    Parsing still happens off the loop, in the default thread pool or the parse process pool.
+    """
+
+    def _crawl_all(self, shards, parse_pool):
+        return asyncio.run(self._crawl_all_async(shards, parse_pool))
+
+    async def _crawl_all_async(self, shards, parse_pool):
+        shard_sem = asyncio.Semaphore(self.shard_concurrency)
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=MAX_CONNECTIONS)) as session:
+            async def run_shard(label, build_url):
+                async with shard_sem:
+                    return (label, *await self._crawl_async(session, label, build_url, parse_pool))
+            return await asyncio.gather(*(run_shard(label, build_url) for label, build_url in shards))
+
+    async def _crawl_async(self, session, label, build_url, parse_pool):
+        state = self._new_crawl_state()
+        next_page_to_fetch = 1
+        crawl_error = None
+        in_flight = {}
+        try:
+            while not self._stop_event.is_set():
+                while len(in_flight) < self.page_concurrency:
+                    in_flight[next_page_to_fetch] = asyncio.create_task(
+                        self._fetch_and_parse_page_async(session, build_url, next_page_to_fetch, label, parse_pool))
+                    next_page_to_fetch += 1
+
+                box_count, listing_fields, crawl_error = await in_flight.pop(state["page"])
+                if box_count is None:
+                    break
+                delay = self._consume_page(label, state, box_count, listing_fields)
+                if delay is None or await wait_or_stop(self._stop_event, delay):
+                    break
+        finally:
+            for task in in_flight.values(): task.cancel()
+        return self._state_stats(state), crawl_error
+
+    async def _fetch_and_parse_page_async(self, session, build_url, page, label, parse_pool):
+        resp, fetch_error = await self._fetch_page_async(session, build_url, page, label)
+        if resp is None:
+            return None, [], fetch_error
+        box_count, listing_fields = await asyncio.get_running_loop().run_in_executor(
+            parse_pool, extract_list_page, resp.content, page, self.parser_backend.name)
+        return box_count, listing_fields, None
+
+    async def _fetch_page_async(self, session, build_url, page, label="all"):
+        """Async twin of Crawler._fetch_page with the same retry and backoff rules."""
+        url = build_url(page)
+        page_name = f"page {page}" if label == "all" else f"[{label}] page {page}"
+        current_backoff_time = crawler_module.INITIAL_BACKOFF_TIME
+        retries = 0
+        while not self._stop_event.is_set():
+            if not await self.rate_limiter.acquire_async(self._stop_event): break
+            logging.info(f"Fetching {page_name}: {url}")
+            self.progress.emit(f"Fetching {page_name}...")
+            try:
+                resp = await fetch(session, url, self._get_headers(), 20, self.http_cache)
+                self.rate_limiter.record_success()
+                return resp, None
+            except aiohttp.ClientResponseError as http_err:
+                logging.warning(f"HTTP error: {http_err.status} for {url}")
+                self.rate_limiter.record_response(http_err.status, (http_err.headers or {}).get('Retry-After'))
+                if not is_throttle_status(http_err.status):
+                    return None, f"HTTP error: {http_err.status} {http_err.message} for url: {url}"
+                retries += 1
+                if retries > crawler_module.MAX_SCRAPER_RETRIES:
+                    return None, f"Max retries exceeded for {url}. Error: {http_err.status} {http_err.message}"
+                self.progress.emit(f"Rate limited. Retrying {page_name} in {current_backoff_time}s...")
+            except NETWORK_ERRORS as req_err:
+                logging.error(f"Request exception: {req_err!r} for {url}")
+                self.rate_limiter.record_throttle()
+                retries += 1
+                if retries > crawler_module.MAX_SCRAPER_RETRIES:
+                    return None, f"Max retries exceeded for {url}. Error: {type(req_err).__name__}: {req_err}"
+                self.progress.emit(f"Network issue. Retrying {page_name} in {current_backoff_time}s...")
+            logging.warning(f"Retrying ({retries}/{crawler_module.MAX_SCRAPER_RETRIES}) in {current_backoff_time}s...")
+            await wait_or_stop(self._stop_event, current_backoff_time)
+            current_backoff_time = min(current_backoff_time * 2, crawler_module.MAX_BACKOFF_TIME)
+        return None, None
+
+
+class AsyncDetailFetcher:
+    """Runs ListingStore's detail page and photo fetches as tasks on one event loop.
+
+    The loop lives in its own daemon thread. Feeder threads take jobs from the store's
+    detail and photo queues whenever one of that stage's slots is free, so queue order is
+    kept. Listings go through the same parsing, caches and signals as the threaded workers.
+    """
+
+    def __init__(self, store, max_in_flight=MAX_DETAILS_IN_FLIGHT, max_photos_in_flight=MAX_PHOTOS_IN_FLIGHT):
+        self.store = store
+        self.max_in_flight = max_in_flight
+        self.max_photos_in_flight = max_photos_in_flight
+        self._loop = asyncio.new_event_loop()
+        self._session = None
+        self._free_slots = threading.Semaphore(max_in_flight)
+        self._free_photo_slots = threading.Semaphore(max_photos_in_flight)
+        threading.Thread(target=self._loop.run_forever, daemon=True, name="async-detail-fetcher").start()
+
+    def start_feeder(self):
+        feeder = threading.Thread(target=self._feed, daemon=True, name="async-detail-feeder")
+        feeder.start()
+        return feeder
+
+    def start_photo_feeder(self):
+        feeder = threading.Thread(target=self._feed_photos, daemon=True, name="async-photo-feeder")
+        feeder.start()
+        return feeder
+
+    def _feed(self):
+        while True:
+            self._free_slots.acquire()
+            listing = self.store._take_detail_job()
+            asyncio.run_coroutine_threadsafe(self._run_job(listing), self._loop)
+
+    def _feed_photos(self):
+        while True:
+            self._free_photo_slots.acquire()
+            url, listing = self.store._photo_jobs.take()
+            asyncio.run_coroutine_threadsafe(self._run_photo_job(listing, url), self._loop)
+
+    async def _run_job(self, listing):
+        try: await self._fetch_details(listing)
+        finally: self.store._finish_detail_job(listing); self._free_slots.release()
+
+    async def _run_photo_job(self, listing, url):
+        try: await self._fetch_photo(listing, url, self.store._get_headers())
+        except Exception as e: logging.error(f"Photo job error for {url}: {e!r}", exc_info=True)
+        finally: self.store._finish_photo_job(listing, url); self._free_photo_slots.release()
+
+    def close(self):
+        async def shutdown():
+            if self._session is not None: await self._session.close()
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _ensure_session(self):
+        # Created lazily so it belongs to the fetcher's loop
+        if self._session is None:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=MAX_CONNECTIONS))
+        return self._session
+
+    async def _limited_fetch(self, url, headers, timeout, use_cache=False):
+        """Async twin of ListingStore._limited_get."""
+        store = self.store
+        if not await store.rate_limiter.acquire_async(store.detail_fetch_stop_event): raise InterruptedError("Stop event set while waiting for rate limiter")
+        try:
+            resp = await fetch(self._ensure_session(), url, headers, timeout, store.http_cache if use_cache else None)
+        except aiohttp.ClientResponseError as e:
+            store.rate_limiter.record_response(e.status, (e.headers or {}).get('Retry-After')); raise
+        except NETWORK_ERRORS:
+            store.rate_limiter.record_throttle(); raise
+        store.rate_limiter.record_success()
+        return resp
+
+    async def _fetch_photo(self, listing, url, headers):
+        store = self.store
+        if store.detail_fetch_stop_event.is_set() or store.image_store.contains(url): return
+        self._ensure_session()
+        try:
+            img_resp = await self._limited_fetch(url, headers, timeout=15)
+            await asyncio.to_thread(store.image_store.put, url, img_resp.content)
+            store._count("photos"); store._count("photo_bytes", len(img_resp.content))
+        except NETWORK_ERRORS as img_e: logging.warning(f"Image download failed for {url}: {img_e!r}")
+        except InterruptedError: logging.info(f"Photo fetch interrupted for {listing.link}")
+
+    async def _fetch_details(self, listing):
+        store = self.store
+        self._ensure_session()
+        if store.detail_fetch_stop_event.is_set():
+            logging.debug(f"Skipping detail fetch for {listing.link} as stop event is set.")
+            if listing.fetch_status != "Details OK":
+                listing.fetch_status = "Detail Fetch Error"; listing.detail_fetch_error_message = "Operation stopped"
+                store._persist_changes([listing])
+                store.listing_details_fetched.emit(listing)
+            return
+        try:
+            logging.info(f"Fetching full details for: {listing.link}")
+            store.fetch_status_update.emit(f"Fetching details: {listing.title[:30]}...")
+            headers = store._get_headers()
+            resp = await self._limited_fetch(listing.link, headers, timeout=25, use_cache=True)
+            await asyncio.get_running_loop().run_in_executor(None, store._process_detail_page, listing, resp)
+            listing.details_fetched = True; listing.fetch_status = "Details OK"; listing.detail_fetch_error_message = ""
+            listing.detail_attempts = 0; listing.detail_retry_at = None
+
+        except InterruptedError: listing.fetch_status = "Detail Fetch Error"; listing.detail_fetch_error_message = "Operation stopped"
+        except NETWORK_ERRORS as e:
+            logging.warning(f"Net error details {listing.link}: {e!r}")
+            store._detail_fetch_failed(listing, e, getattr(e, 'status', None))
+        except Exception as e: logging.error(f"Error parsing details {listing.link}: {e!r}", exc_info=True); listing.fetch_status = "Detail Parse Error"; listing.detail_fetch_error_message = str(e)
+        finally: store._persist_changes([listing]); store.fetch_status_update.emit(""); store.listing_details_fetched.emit(listing)
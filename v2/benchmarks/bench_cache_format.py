@@ -0,0 +1,79 @@
+"""Compares save time, load time and file size of the listings cache formats.
+
+Usage (from the v2 directory):  python benchmarks/bench_cache_format.py [--sizes 10000,100000,500000]
+
+For each size the same fully fetched listings are saved with ListingStore.save_listings_cache()
+and read back into a fresh store with load_listings_cache(), once per format: the indented
+listings_cache.json (every listing through to_dict / from_dict), and the compact .jsonl and
+.msgpack files of cache_format (rows through to_row / from_row). .msgpack is skipped when
+msgpack isn't installed; .jsonl uses orjson when it is.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cache_format
+from image_store import ImageStore
+from listing import Listing
+from listing_store import ListingStore
+
+LAYOUTS = ["1R", "1K", "1DK", "1LDK", "2K", "2DK"]
+FILES = ["listings_cache.json", cache_format.LISTINGS_JSONL_FILE, cache_format.LISTINGS_MSGPACK_FILE]
+
+
+def make_listings(count):
+    listings = {}
+    for n in range(count):
+        l = Listing(f"Mansion {n}", f"https://www.monthly-mansion.com/tokyo/rent/{n}", f"東京都新宿区西新宿{n % 9}-{n % 30}",
+                    "JR山手線 新宿駅 徒歩5分", 18.0 + n % 40, LAYOUTS[n % len(LAYOUTS)], f"{1980 + n % 44}年3月", "Card",
+                    60000 + (n * 37) % 140000, "5,000円", "10,000円",
+                    ["エアコン", "冷蔵庫", "洗濯機", "電子レンジ"], "Quiet neighbourhood.\nNo pets allowed.",
+                    [f"https://www.monthly-mansion.com/img/{n}/{i:02d}.jpg" for i in range(5)])
+        l.details_fetched = True; l.fetch_status = "Details OK"; l.latitude = 35.69; l.longitude = 139.70
+        listings[l.link] = l
+    return listings
+
+
+def make_store(cache_file, load_cache):
+    return ListingStore(cache_file=cache_file, image_store=ImageStore(cache_dir="image_cache"), load_cache=load_cache)
+
+
+def bench(cache_file, listings):
+    store = make_store(cache_file, load_cache=False)
+    store.all_listings_map = dict(listings)
+    start = time.perf_counter()
+    store.save_listings_cache()
+    save_seconds = time.perf_counter() - start
+
+    store = make_store(cache_file, load_cache=False)
+    start = time.perf_counter()
+    store.load_listings_cache()
+    load_seconds = time.perf_counter() - start
+    assert len(store.all_listings_map) == len(listings)
+    return save_seconds, load_seconds, os.path.getsize(cache_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,500000")
+    args = parser.parse_args()
+    os.chdir(tempfile.mkdtemp(prefix="bench_cache_format_"))
+    files = [f for f in FILES if cache_format.MSGPACK_AVAILABLE or not f.endswith(cache_format.MSGPACK_EXTENSION)]
+    print(f"orjson: {cache_format.ORJSON_AVAILABLE}, msgpack: {cache_format.MSGPACK_AVAILABLE}")
+
+    print(f"{'listings':>9} {'format':>8} {'save ms':>9} {'load ms':>9} {'file MB':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        listings = make_listings(size)
+        for cache_file in files:
+            save_seconds, load_seconds, file_bytes = bench(cache_file, listings)
+            os.remove(cache_file)
+            print(f"{size:>9} {os.path.splitext(cache_file)[1]:>8} {save_seconds * 1000:>9.0f} {load_seconds * 1000:>9.0f} "
+                  f"{file_bytes / 1024 / 1024:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
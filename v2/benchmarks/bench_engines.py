@@ -0,0 +1,149 @@
+"""Compares the threaded and asyncio fetch engines against a local stand-in server.
+
+Usage (from the v2 directory):  python benchmarks/bench_engines.py [--latency S] [--details N]
+
+The server answers every request after --latency seconds, like a slow remote site. The
+list benchmark runs a sharded crawl (one query per ward x layout); the detail benchmark
+fetches N detail pages with three photos each. The rate limiter is opened wide so the
+numbers show the engines, not the politeness settings.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PyQt5.QtCore import QCoreApplication, Qt
+
+import crawler
+import listing_store
+from async_engine import AIOHTTP_AVAILABLE
+from data_manager import DataManager
+from listing import Listing
+from rate_limiter import AdaptiveRateLimiter
+from scraper import AsyncScraper, Scraper
+
+MOCK_HTML_DIR = os.path.join(os.path.dirname(__file__), '..', 'tests', 'mock_html')
+PAGES_PER_SHARD = 4
+LAYOUTS = ["1K", "1R"]
+
+
+def read_mock_html(filename):
+    with open(os.path.join(MOCK_HTML_DIR, filename), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def start_server(latency):
+    list_page = read_mock_html('page_with_listings.html')
+    empty_page = read_mock_html('page_empty.html').encode('euc_jp', errors='xmlcharrefreplace')
+    detail_page = read_mock_html('detail_page.html')
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            url = urlparse(self.path)
+            if url.path.endswith("list.html"):
+                query = parse_qs(url.query)
+                page, ward = int(query["pno"][0]), query["jc[]"][0]
+                if page > PAGES_PER_SHARD: body = empty_page
+                else:
+                    # Unique links per shard and page so nothing is merged away
+                    body = re.sub(r'/tokyo/rent/(\d+)', lambda m: f"/tokyo/rent/{ward}-{url.query[-30:]}-{m.group(1)}", list_page)
+                    body = body.encode('euc_jp', errors='xmlcharrefreplace')
+            elif url.path.startswith("/rent/"):
+                body = detail_page.replace("/img/1001/", f"/img{url.path}/").replace("https://cdn.example.com", "").encode('euc_jp')
+            else:
+                body = b"\xff\xd8 not really a jpeg"
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=EUC-JP')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 256
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def open_limiter():
+    return AdaptiveRateLimiter(rate=10000, max_rate=10000, burst=10000)
+
+
+def bench_list(scraper_cls, page_concurrency, shard_concurrency):
+    done = threading.Event()
+    scraper_obj = scraper_cls(rate_limiter=open_limiter())
+    scraper_obj.finished.connect(done.set, Qt.DirectConnection)
+    listings = []
+    scraper_obj.listings_batch.connect(listings.extend, Qt.DirectConnection)
+    start = time.perf_counter()
+    scraper_obj.start(LAYOUTS, set(), False, page_concurrency=page_concurrency, sharded=True, shard_concurrency=shard_concurrency)
+    done.wait()
+    return time.perf_counter() - start, scraper_obj.last_crawl_stats["pages_fetched"], len(listings)
+
+
+def bench_details(base_url, engine, count):
+    manager = DataManager(rate_limiter=open_limiter(), fetch_engine=engine)
+    finished = []
+    all_done = threading.Event()
+
+    def on_fetched(listing):
+        finished.append(listing)
+        if len(finished) == count: all_done.set()
+    manager.listing_details_fetched.connect(on_fetched, Qt.DirectConnection)
+    listings = [Listing(f"Apartment {n}", f"{base_url}/rent/{engine}-{n}", "", "", 25.0, "1K", "", "", 80000, "", "")
+                for n in range(count)]
+    start = time.perf_counter()
+    manager._queue_detail_fetches(listings)
+    all_done.wait()
+    manager.wait_for_photos(poll_interval=0.01)
+    elapsed = time.perf_counter() - start
+    if manager.async_fetcher: manager.async_fetcher.close()
+    assert all(l.fetch_status == "Details OK" for l in listings)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--details", type=int, default=200)
+    parser.add_argument("--shard-concurrency", type=int, default=20)
+    args = parser.parse_args()
+    if not AIOHTTP_AVAILABLE:
+        sys.exit("aiohttp is not installed.")
+
+    QCoreApplication(sys.argv)
+    server, base_url = start_server(args.latency)
+    crawler.BASE_URL = base_url; listing_store.BASE_URL = base_url
+    crawler.PAGE_DELAY = 0
+    os.chdir(tempfile.mkdtemp(prefix="bench_engines_"))
+
+    print(f"server latency {args.latency * 1000:.0f} ms, {len(crawler.WARD_CODES) * len(LAYOUTS)} shards x {PAGES_PER_SHARD} pages")
+    print(f"{'list crawl':<24} {'seconds':>8} {'pages/s':>8} {'listings':>9}")
+    for name, cls in (("threads", Scraper), ("asyncio", AsyncScraper)):
+        elapsed, pages, listings = bench_list(cls, 3, args.shard_concurrency)
+        print(f"{name:<24} {elapsed:>8.2f} {pages / elapsed:>8.1f} {listings:>9}")
+
+    print(f"\n{'details (' + str(args.details) + ' x 3 photos)':<24} {'seconds':>8} {'pages/s':>8}")
+    for engine in ("threads", "asyncio"):
+        elapsed = bench_details(base_url, engine, args.details)
+        print(f"{engine:<24} {elapsed:>8.2f} {args.details / elapsed:>8.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
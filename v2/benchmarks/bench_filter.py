@@ -0,0 +1,69 @@
+"""Measures what one filter change costs the GUI: filter + sort, favourites and statistics.
+
+Usage (from the v2 directory):  python benchmarks/bench_filter.py [--sizes 10000,100000]
+
+This is the work MainWindow._update_models_and_stats does on every spinbox tick or sort
+change, minus the Qt model reset. For each sort key and direction, "sort change" is the
+first update after picking it and "filter change" the median of the updates after that,
+which only change min area / max rent.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from image_store import ImageStore
+from listing import Listing
+from listing_store import ListingStore
+
+LAYOUTS = ["1R", "1K", "1DK", "1LDK", "2K", "2DK"]
+SORT_KEYS = ["-- none --", "Price", "Area", "Price per m²", "Build Year", "Date Added"]
+FILTERS = [(0, 0), (20, 0), (0, 120000), (25, 150000)]
+
+
+def make_store(count):
+    store = ListingStore(cache_file="listings_cache.json", image_store=ImageStore(cache_dir="image_cache"), load_cache=False)
+    store._queue_detail_fetches = lambda listings, priority=None: None  # no network
+    listings = []
+    for n in range(count):
+        l = Listing(f"Mansion {n}", f"https://www.monthly-mansion.com/tokyo/rent/{n}", f"東京都新宿区西新宿{n % 9}", "JR山手線 新宿駅 徒歩5分",
+                    18.0 + (n * 7) % 40, LAYOUTS[n % len(LAYOUTS)], f"{1980 + n % 44}年3月" if n % 10 else "", "Card",
+                    60000 + (n * 37) % 140000, "5,000円", "10,000円")
+        l.is_fav = n % 500 == 0
+        listings.append(l)
+    store.add_or_update_listings(listings, recheck_details=False)
+    return store
+
+
+def update_once(store, min_area, max_rent, sort_key, sort_desc):
+    filtered = store.get_filtered_listings(min_area, max_rent, sort_key, sort_desc)
+    store.get_favourites()
+    store.calculate_statistics(filtered)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000")
+    args = parser.parse_args()
+    os.chdir(tempfile.mkdtemp(prefix="bench_filter_"))
+
+    print(f"{'listings':>9} {'sort key':>13} {'sort change ms':>15} {'filter change ms':>17}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        store = make_store(size)
+        update_once(store, 0, 0, "-- none --", False)  # warm up
+        for sort_key in SORT_KEYS:
+            sort_times, filter_times = [], []
+            for sort_desc in (False, True):
+                for i, (min_area, max_rent) in enumerate(FILTERS * 3):
+                    start = time.perf_counter()
+                    update_once(store, min_area, max_rent, sort_key, sort_desc)
+                    (filter_times if i else sort_times).append(time.perf_counter() - start)
+            print(f"{size:>9} {sort_key:>13} {statistics.median(sort_times) * 1000:>15.1f} {statistics.median(filter_times) * 1000:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Measures how many bytes each Listing takes in memory once loaded from the cache.
+
+Usage (from the v2 directory):  python benchmarks/bench_listing_memory.py [--sizes 10000,100000]
+                                [--baseline OLD_LISTING_PY]
+
+The listings are decoded from JSON text and built with Listing.from_dict, as when loading
+listings_cache.json, and once more from rows with Listing.from_row, as the compact cache
+formats load them. The bytes counted by tracemalloc are what is left once the decoded data
+is dropped: the objects and the strings, lists and datetimes they keep alive.
+--baseline also measures another listing.py, e.g. an older one saved with
+git show <commit>:v2/listing.py > /tmp/listing_old.py
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import listing
+
+LAYOUTS = ["1R", "1K", "1DK", "1LDK", "2K", "2DK"]
+STATIONS = ["JR山手線 新宿駅 徒歩5分", "東京メトロ丸ノ内線 西新宿駅 徒歩3分", "都営大江戸線 都庁前駅 徒歩7分", "JR中央線 中野駅 徒歩10分"]
+APPLIANCES = [["エアコン", "冷蔵庫", "洗濯機", "電子レンジ"], ["エアコン", "冷蔵庫", "テレビ"], ["エアコン"]]
+
+
+def make_dicts(count):
+    dicts = []
+    for n in range(count):
+        dicts.append({
+            "title": f"Mansion {n}", "link": f"https://www.monthly-mansion.com/tokyo/rent/{n}",
+            "address": f"東京都新宿区西新宿{n % 9}-{n % 30}-{n % 17}", "stations": STATIONS[n % len(STATIONS)],
+            "area": 18.0 + n % 40, "layout": LAYOUTS[n % len(LAYOUTS)], "build": f"{1980 + n % 44}年3月",
+            "build_year": 1980 + n % 44, "date_added": f"2026-0{1 + n % 9}-1{n % 10}T12:{n % 60:02d}:00.{n % 999999:06d}",
+            "pay_methods": "Card", "middle_rent": 60000 + (n * 37) % 140000, "utilities": "5,000円", "cleaning": "10,000円",
+            "appliances": APPLIANCES[n % len(APPLIANCES)], "remarks": "Quiet neighbourhood.\nNo pets allowed.",
+            "photo_urls": [f"https://www.monthly-mansion.com/img/{n}/{i:02d}.jpg" for i in range(5)],
+            "ppm2": 3500.0 + n % 100, "is_fav": n % 50 == 0, "is_viewed": n % 3 == 0, "details_fetched": True,
+            "fetch_status": "Details OK", "detail_fetch_error_message": "", "latitude": 35.69 + n * 1e-6,
+            "longitude": 139.70 + n * 1e-6, "detail_digest": f"{n:032x}", "detail_attempts": 0, "detail_retry_at": None,
+        })
+    return dicts
+
+
+def bytes_per_listing(build, payload, count):
+    gc.collect()
+    tracemalloc.start()
+    records = json.loads(payload)
+    listings = [build(r) for r in records]
+    del records
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(listings) == count
+    return used / count
+
+
+def load_listing_module(path):
+    spec = importlib.util.spec_from_file_location("listing_baseline", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--baseline", help="another listing.py to measure, e.g. the one before a change")
+    args = parser.parse_args()
+    modules = [("current", listing)]
+    if args.baseline: modules.insert(0, ("baseline", load_listing_module(args.baseline)))
+
+    print(f"{'listings':>9} {'listing.py':>11} {'from_dict B':>12} {'from_row B':>11}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        dicts = make_dicts(size)
+        dict_payload = json.dumps(dicts, ensure_ascii=False)
+        row_payload = json.dumps([[d[f] for f in listing.Listing.CACHE_FIELDS] for d in dicts], ensure_ascii=False)
+        del dicts
+        for name, module in modules:
+            from_dict = bytes_per_listing(module.Listing.from_dict, dict_payload, size)
+            from_row = bytes_per_listing(module.Listing.from_row, row_payload, size) if hasattr(module.Listing, "from_row") else float("nan")
+            print(f"{size:>9} {name:>11} {from_dict:>12.0f} {from_row:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
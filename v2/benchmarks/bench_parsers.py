@@ -0,0 +1,130 @@
+"""Compares the HTML parser backends on list and detail pages.
+
+Usage (from the v2 directory):  python benchmarks/bench_parsers.py [--rounds N] [--detail-pages DIR]
+
+List pages are built from the test fixtures, repeated up to the 30 boxes per page
+the live site serves, and encoded as EUC-JP like the real responses. Detail pages are
+the *.html files in --detail-pages (saved from the site, EUC-JP), or else the fixture
+padded with navigation, scripts and related listings to a real page's size; each is
+parsed as a full tree and with detail_parser's targeted extractor.
+"""
+import glob
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from parser_backend import available_backends, get_backend
+from list_parser import extract_list_page
+from detail_parser import extract_detail_page
+
+MOCK_HTML_DIR = os.path.join(os.path.dirname(__file__), '..', 'tests', 'mock_html')
+BOXES_PER_PAGE = 30
+DETAIL_PADDING_BLOCKS = 120
+
+
+def read_mock_html(filename):
+    with open(os.path.join(MOCK_HTML_DIR, filename), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def build_list_page():
+    html = read_mock_html('page_with_listings.html')
+    boxes = re.findall(r'<div class="box">.*?\n        </div>\n', html, re.S)
+    repeated = "".join(boxes[i % len(boxes)] for i in range(BOXES_PER_PAGE))
+    start = html.index('<div class="listArea">') + len('<div class="listArea">')
+    end = html.rindex('</div>', 0, html.index('</body>'))
+    return (html[:start] + "\n" + repeated + html[end:]).encode('euc_jp', errors='xmlcharrefreplace')
+
+
+def build_detail_page():
+    html = read_mock_html('detail_page.html')
+    nav = "".join(f'<li><a href="/tokyo/area/{n}">エリア {n}</a></li>' for n in range(DETAIL_PADDING_BLOCKS))
+    script = "<script>" + "var d = {" + ",".join(f'"k{n}": "<th>設備</th>{n}"' for n in range(DETAIL_PADDING_BLOCKS)) + "};</script>"
+    related = "".join(f'<div class="box"><p class="th02"><a href="/tokyo/rent/{n}">物件 {n}</a></p>'
+                      f'<table><tr><th>賃料</th><td>{80000 + n}円/月</td></tr><tr><th>面積</th><td>25m²</td></tr></table></div>'
+                      for n in range(DETAIL_PADDING_BLOCKS))
+    html = html.replace('<div class="header">', f'{script}<div class="header"><ul class="nav">{nav}</ul>', 1)
+    html = html.replace('<div class="footer">', f'<div class="related">{related}</div><div class="footer">', 1)
+    return html.encode('euc_jp', errors='xmlcharrefreplace')
+
+
+def load_detail_pages(directory):
+    if not directory:
+        return [build_detail_page()]
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.html'))):
+        with open(path, 'rb') as f: pages.append(f.read())
+    if not pages: sys.exit(f"No *.html files in {directory}")
+    return pages
+
+
+def time_per_page(func, rounds):
+    func()  # warm-up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def bench_list_page(backend, page_bytes):
+    def run():
+        box_count, listings = extract_list_page(page_bytes, 1, backend.name)
+        assert len(listings) == BOXES_PER_PAGE
+    return run
+
+
+def bench_detail_page(backend, page_text):
+    def run():
+        soup = backend.parse(page_text)
+        [a.attr('href') for a in soup.select('div.photo ul.thumbnail li a')]
+        th = soup.find_by_text('th', '設備')
+        [li.text() for li in th.next_sibling('td').select('li')]
+        soup.find_by_text('th', '備考').next_sibling('td').text("\n")
+        soup.select_one('iframe[src*="google.com/maps/embed"]').attr('src')
+    return run
+
+
+def bench_detail_extract(backend, pages, targeted):
+    def run():
+        for page in pages: extract_detail_page(page, backend.name, targeted=targeted)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--detail-pages", help="directory of saved detail pages (*.html)")
+    args = parser.parse_args()
+
+    list_page = build_list_page()
+    detail_page = read_mock_html('detail_page.html')
+    results = {}
+    for name in available_backends():
+        backend = get_backend(name)
+        results[name] = (time_per_page(bench_list_page(backend, list_page), args.rounds),
+                         time_per_page(bench_detail_page(backend, detail_page), args.rounds))
+
+    base_list, base_detail = results["html.parser"]
+    print(f"{'backend':<12} {'list ms/page':>13} {'speed-up':>9} {'detail ms/page':>15} {'speed-up':>9}")
+    for name, (list_ms, detail_ms) in results.items():
+        print(f"{name:<12} {list_ms:>13.2f} {base_list / list_ms:>8.1f}x {detail_ms:>15.2f} {base_detail / detail_ms:>8.1f}x")
+
+    pages = load_detail_pages(args.detail_pages)
+    rounds = max(1, args.rounds // len(pages))
+    print(f"\ndetail extraction, {len(pages)} page(s), {sum(map(len, pages)) // len(pages) // 1024} KB average")
+    print(f"{'backend':<12} {'full ms/page':>13} {'targeted ms/page':>17} {'speed-up':>9}")
+    for name in available_backends():
+        backend = get_backend(name)
+        for page in pages:
+            assert extract_detail_page(page, name, targeted=True) == extract_detail_page(page, name, targeted=False)
+        full_ms = time_per_page(bench_detail_extract(backend, pages, False), rounds) / len(pages)
+        targeted_ms = time_per_page(bench_detail_extract(backend, pages, True), rounds) / len(pages)
+        print(f"{name:<12} {full_ms:>13.2f} {targeted_ms:>17.2f} {full_ms / targeted_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Measures how long the GUI waits for the listings cache at startup, synchronous vs background load.
+
+Usage (from the v2 directory):  python benchmarks/bench_startup.py [--sizes 10000,100000]
+
+For each size a listings cache with fully fetched listings is written to a temporary
+directory. "sync" constructs DataManager the old way, which loads the whole file before
+returning, then fills a ListingModel the way MainWindow does. "background" constructs it
+with load_cache=False and starts load_listings_cache_in_background(): the window could be
+shown as soon as construction returns, the first rows are there after the first merged
+chunk, and the last column is the time until every listing is in.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PyQt5.QtCore import QCoreApplication
+
+from data_manager import DataManager
+from listing import Listing
+from listing_model import ListingModel
+
+LAYOUTS = ["1R", "1K", "1DK", "1LDK", "2K", "2DK"]
+
+
+def write_cache(path, count):
+    listings = []
+    for n in range(count):
+        l = Listing(f"Mansion {n}", f"https://www.monthly-mansion.com/tokyo/rent/{n}", f"東京都新宿区西新宿{n % 9}-{n % 30}",
+                    "JR山手線 新宿駅 徒歩5分", 18.0 + n % 40, LAYOUTS[n % len(LAYOUTS)], f"{1980 + n % 44}年3月", "Card",
+                    60000 + (n * 37) % 140000, "5,000円", "10,000円",
+                    ["エアコン", "冷蔵庫", "洗濯機", "電子レンジ"], "Quiet neighbourhood.\nNo pets allowed.",
+                    [f"https://www.monthly-mansion.com/img/{n}/{i:02d}.jpg" for i in range(5)])
+        l.details_fetched = True; l.fetch_status = "Details OK"; l.latitude = 35.69; l.longitude = 139.70
+        listings.append(l.to_dict())
+    with open(path, 'w', encoding='utf-8') as f: json.dump(listings, f, ensure_ascii=False, indent=2)
+
+
+def fill_model(manager, model):
+    filtered = manager.get_filtered_listings(0, 0, "-- none --", False)
+    manager.get_favourites()
+    model.update_listings(filtered)
+    manager.calculate_statistics(filtered)
+
+
+def bench_sync():
+    model = ListingModel()
+    start = time.perf_counter()
+    manager = DataManager()
+    fill_model(manager, model)
+    return time.perf_counter() - start
+
+
+def bench_background(app):
+    model = ListingModel()
+    marks = {}
+    start = time.perf_counter()
+    manager = DataManager(load_cache=False)
+
+    def on_update():
+        fill_model(manager, model)
+        if model.rowCount(): marks.setdefault("first_rows", time.perf_counter() - start)
+
+    def on_loaded(count):
+        marks["all"] = time.perf_counter() - start
+        app.quit()
+    manager.listings_updated.connect(on_update)
+    manager.cache_loaded.connect(on_loaded)
+    manager.load_listings_cache_in_background()
+    marks["constructed"] = time.perf_counter() - start
+    app.exec_()
+    return marks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000")
+    args = parser.parse_args()
+    app = QCoreApplication(sys.argv)
+    os.chdir(tempfile.mkdtemp(prefix="bench_startup_"))
+
+    print(f"{'listings':>9} {'file MB':>8} {'sync ms':>9} {'bg ready ms':>12} {'bg first rows ms':>17} {'bg all ms':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        write_cache("listings_cache.json", size)
+        file_mb = os.path.getsize("listings_cache.json") / 1024 / 1024
+        sync_seconds = bench_sync()
+        marks = bench_background(app)
+        print(f"{size:>9} {file_mb:>8.1f} {sync_seconds * 1000:>9.0f} {marks['constructed'] * 1000:>12.1f} "
+              f"{marks['first_rows'] * 1000:>17.1f} {marks['all'] * 1000:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
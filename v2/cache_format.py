@@ -0,0 +1,99 @@
+import json
+import logging
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+from listing import Listing
+
+# Compact listings cache files, chosen by extension instead of the indented listings_cache.json:
+#   .msgpack  a MessagePack stream (needs msgpack)
+#   .jsonl    one JSON value per line, encoded with orjson when it is installed
+# Both start with a header naming the schema version and the fields, followed by one row per
+# listing holding the Listing.to_row() values without the keys.
+LISTINGS_MSGPACK_FILE = "listings_cache.msgpack"
+LISTINGS_JSONL_FILE = "listings_cache.jsonl"
+MSGPACK_EXTENSION = ".msgpack"
+JSONL_EXTENSION = ".jsonl"
+COMPACT_EXTENSIONS = (MSGPACK_EXTENSION, JSONL_EXTENSION)
+FORMAT_NAME = "listings"
+SCHEMA_VERSION = 1
+WRITE_BATCH = 10000
+
+
+def is_compact_file(path):
+    """True if path names a compact (.msgpack / .jsonl) listings cache rather than a JSON or SQLite one."""
+    return path.lower().endswith(COMPACT_EXTENSIONS)
+
+
+def _is_msgpack(path):
+    if not path.lower().endswith(MSGPACK_EXTENSION): return False
+    if not MSGPACK_AVAILABLE: raise RuntimeError(f"msgpack is not installed, can't use {path}")
+    return True
+
+
+def _header():
+    return {"format": FORMAT_NAME, "version": SCHEMA_VERSION, "fields": list(Listing.CACHE_FIELDS)}
+
+
+def write_listings(path, listings):
+    """Writes the listings to a compact cache file. Returns how many were written."""
+    header, count = _header(), 0
+    with open(path, 'wb') as f:
+        if _is_msgpack(path):
+            packer = msgpack.Packer(use_bin_type=True)
+            f.write(packer.pack(header))
+            encode = packer.pack
+        else:
+            f.write(_dumps_line(header))
+            encode = _dumps_line
+        batch = []
+        for l_obj in listings:
+            batch.append(encode(l_obj.to_row()))
+            if len(batch) >= WRITE_BATCH:
+                f.write(b"".join(batch)); count += len(batch); batch = []
+        f.write(b"".join(batch)); count += len(batch)
+    return count
+
+
+def iter_listings(path):
+    """Yields the listings of a compact cache file.
+
+    Rows written with the current fields become Listings straight away (Listing.from_row);
+    rows from a file with other fields are yielded as dicts for Listing.from_dict, which
+    fills in defaults for whatever is missing.
+    """
+    with open(path, 'rb') as f:
+        if _is_msgpack(path): records = msgpack.Unpacker(f, raw=False, max_buffer_size=1 << 30)
+        else: records = (_loads_line(line) for line in f if line.strip())
+        header = next(records, None)
+        if header is None: return
+        if not isinstance(header, dict) or header.get("format") != FORMAT_NAME:
+            raise ValueError(f"{path} is not a listings cache file")
+        if header.get("version", 0) > SCHEMA_VERSION:
+            raise ValueError(f"{path} has listings cache version {header.get('version')}, this program reads up to {SCHEMA_VERSION}")
+        fields = tuple(header.get("fields", ()))
+        if fields == Listing.CACHE_FIELDS:
+            for row in records: yield Listing.from_row(row)
+        else:
+            logging.info(f"{path} was written with other listing fields, reading it the slow way")
+            for row in records: yield dict(zip(fields, row))
+
+
+if ORJSON_AVAILABLE:
+    def _dumps_line(value): return orjson.dumps(value) + b"\n"
+    _loads_line = orjson.loads
+else:
+    def _dumps_line(value): return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode('utf-8') + b"\n"
+    def _loads_line(line): return json.loads(line)
@@ -0,0 +1,173 @@
+"""Headless crawler: runs the list crawl and the detail/photo fetches without Qt.
+
+Usage (from the v2 directory):  python cli.py [--output FILE] [--layouts 1K,1DK] [--only-new] ...
+
+Defaults come from scraper_settings.json, like the GUI. Listings already in the output file
+are loaded first and updated in place, so --only-new gives a cheap delta crawl from cron.
+Nothing here imports PyQt, folium or QtWebEngine.
+"""
+import argparse
+import logging
+import sys
+import time
+
+from crawler import LAYOUT_PARAM_MAP, MAX_PAGE_CONCURRENCY, Crawler
+from async_engine import AIOHTTP_AVAILABLE, AsyncCrawler
+import cache_format
+from listing_store import LISTINGS_CACHE_FILE, PHOTO_MODE_EAGER, PHOTO_MODE_LAZY, ListingStore
+from settings_manager import SettingsManager
+from parser_backend import get_backend
+from http_cache import HttpCache
+from image_store import ImageStore
+from rate_limiter import configure_shared_limiter
+
+
+class HeadlessStore(ListingStore):
+    """ListingStore that can leave the detail pages alone (--no-details)."""
+
+    def __init__(self, fetch_details=True, **kwargs):
+        self.fetch_details = fetch_details
+        super().__init__(**kwargs)
+
+    def _queue_detail_fetches(self, listings, priority=None):
+        if self.fetch_details: super()._queue_detail_fetches(listings, priority)
+
+
+def parse_args(settings, argv=None):
+    default_layouts = [name for name, checked in settings.get_setting("layouts_checked").items() if checked]
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default=LISTINGS_CACHE_FILE,
+                        help="listings cache file to update: .json, compact .jsonl / .msgpack or an SQLite .db / .sqlite (default: %(default)s)")
+    parser.add_argument("--layouts", default=",".join(default_layouts), help=f"comma separated, any of {','.join(LAYOUT_PARAM_MAP)}")
+    parser.add_argument("--only-new", action="store_true", default=settings.get_setting("skip_cached_search"),
+                        help="skip listings already in the output file")
+    parser.add_argument("--known-page-stop", type=int, default=settings.get_setting("known_page_stop"),
+                        help="with --only-new, stop after this many pages of known listings (0 = off)")
+    parser.add_argument("--page-concurrency", type=int, default=settings.get_setting("page_concurrency"))
+    parser.add_argument("--parse-workers", type=int, default=settings.get_setting("parse_workers"))
+    parser.add_argument("--sharded", action="store_true", default=settings.get_setting("sharded_crawl"),
+                        help="crawl one query per ward and layout")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default=settings.get_setting("fetch_engine"))
+    parser.add_argument("--parser", default=settings.get_setting("parser_backend"), help="selectolax, lxml, html.parser or auto")
+    parser.add_argument("--no-details", action="store_true", help="only crawl the list pages")
+    parser.add_argument("--photos", choices=[PHOTO_MODE_EAGER, PHOTO_MODE_LAZY], default=settings.get_setting("photo_mode"),
+                        help="lazy: only download photos of favourites")
+    parser.add_argument("--no-http-cache", action="store_true", help="don't use the on-disk HTTP cache")
+    parser.add_argument("--gc-images", action="store_true",
+                        help="don't crawl, delete cached photos no listing in the output file refers to")
+    parser.add_argument("--import-json", metavar="PATH", help="don't crawl, copy a JSON listings cache into the --output database or compact file")
+    parser.add_argument("--export-json", metavar="PATH", help="don't crawl, write the --output database or compact file as a JSON listings cache")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+def print_stats(stages):
+    print(f"{'stage':<14} {'items':>8} {'seconds':>8} {'items/s':>9}  notes")
+    for name, items, seconds, notes in stages:
+        rate = f"{items / seconds:>9.1f}" if seconds > 0 else f"{'-':>9}"
+        print(f"{name:<14} {items:>8} {seconds:>8.2f} {rate}  {notes}")
+
+
+def main(argv=None):
+    settings = SettingsManager()
+    args = parse_args(settings, argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s [%(funcName)s]: %(message)s",
+                        datefmt="%Y-%m-%d %H:%M:%S")
+    layouts = [l.strip() for l in args.layouts.split(",") if l.strip() in LAYOUT_PARAM_MAP]
+    if not layouts:
+        print(f"No valid layouts in '{args.layouts}'.", file=sys.stderr)
+        return 2
+
+    configure_shared_limiter(rate=settings.get_setting("request_rate"), max_rate=settings.get_setting("max_request_rate"))
+    parser_backend = get_backend(args.parser)
+    http_cache = None
+    if settings.get_setting("http_cache_enabled") and not args.no_http_cache:
+        http_cache = HttpCache(ttl=settings.get_setting("http_cache_ttl"), max_bytes=settings.get_setting("http_cache_max_mb") * 1024 * 1024)
+
+    if args.output.lower().endswith(cache_format.MSGPACK_EXTENSION) and not cache_format.MSGPACK_AVAILABLE:
+        print("msgpack is not installed, use a .jsonl --output for a compact cache file.", file=sys.stderr)
+        return 2
+
+    pipeline_start = time.perf_counter()
+    image_store = ImageStore(max_bytes=settings.get_setting("image_cache_max_mb") * 1024 * 1024)
+    maintenance_only = args.gc_images or args.import_json or args.export_json
+    store = HeadlessStore(fetch_details=not args.no_details and not maintenance_only, parser_backend=parser_backend, http_cache=http_cache,
+                          fetch_engine=args.engine, cache_file=args.output, photo_mode=args.photos, image_store=image_store)
+    if args.gc_images:
+        removed, freed = store.gc_image_cache()
+        print(f"removed {removed} unused photos ({freed / 1024 / 1024:.1f} MB), "
+              f"{len(image_store)} photos / {image_store.total_bytes() / 1024 / 1024:.1f} MB kept")
+        return 0
+    if args.import_json or args.export_json:
+        if store.listing_db is None and not cache_format.is_compact_file(args.output):
+            print("--import-json / --export-json need an SQLite (.db / .sqlite) or compact (.jsonl / .msgpack) --output", file=sys.stderr)
+            return 2
+        if args.import_json: print(f"imported {store.import_json_cache(args.import_json)} listings into {args.output}")
+        if args.export_json: print(f"exported {store.export_json_cache(args.export_json)} listings to {args.export_json}")
+        return 0
+    store.resume_detail_queue()
+    known_at_start = len(store.all_listings_map)
+    crawler_cls = AsyncCrawler if args.engine == "asyncio" and AIOHTTP_AVAILABLE else Crawler
+    crawler = crawler_cls(parser_backend=parser_backend, http_cache=http_cache)
+
+    scraped = [0]
+    errors = []
+    def on_batch(batch):
+        scraped[0] += len(batch)
+        store.add_or_update_listings(batch, recheck_details=False)
+    crawler.listings_batch.connect(on_batch)
+    crawler.error.connect(errors.append)
+    crawler.progress.connect(logging.debug)
+
+    crawl_start = time.perf_counter()
+    crawl_seconds = details_seconds = photos_seconds = 0.0
+    try:
+        crawler.start(layouts, store.get_known_links(), args.only_new, background=False,
+                      page_concurrency=min(args.page_concurrency, MAX_PAGE_CONCURRENCY), parse_workers=args.parse_workers,
+                      known_page_stop=args.known_page_stop, expected_pages=settings.get_setting("last_crawl_pages"),
+                      sharded=args.sharded, shard_concurrency=settings.get_setting("shard_concurrency"))
+        crawl_seconds = time.perf_counter() - crawl_start
+        if not args.no_details:
+            store.wait_for_details()
+        details_seconds = time.perf_counter() - crawl_start
+        if not args.no_details:
+            store.wait_for_photos()
+        photos_seconds = time.perf_counter() - crawl_start
+    except KeyboardInterrupt:
+        print("Interrupted, saving what we have.", file=sys.stderr)
+        crawler.stop(); store.stop_detail_fetching()
+        crawl_seconds = crawl_seconds or time.perf_counter() - crawl_start
+        details_seconds = details_seconds or time.perf_counter() - crawl_start
+        photos_seconds = time.perf_counter() - crawl_start
+
+    save_start = time.perf_counter()
+    store.save_listings_cache()
+    save_seconds = time.perf_counter() - save_start
+
+    listings = store.get_all_listings()
+    crawl_stats = crawler.last_crawl_stats
+    counters = store.fetch_counters
+    statuses = {}
+    for l in listings: statuses[l.fetch_status] = statuses.get(l.fetch_status, 0) + 1
+    stages = [
+        ("list pages", crawl_stats.get("pages_fetched", 0), crawl_seconds,
+         f"{crawl_stats.get('shards', 1)} shard(s), {crawler_cls.__name__}" + (", stopped early" if crawl_stats.get("stopped_early") else "")),
+        ("listings", scraped[0], crawl_seconds, f"{len(listings) - known_at_start} new, {len(listings)} total"),
+    ]
+    if not args.no_details:
+        queue_stats = store.detail_queue_stats()
+        stages += [
+            ("detail pages", counters["detail_pages"], details_seconds,
+             f"{queue_stats['workers']} workers, {queue_stats['retrying']} retries scheduled, {counters['changed']} changed, {counters['unchanged']} unchanged ({counters['not_modified']} by 304), {queue_stats['duplicates_avoided']} duplicates avoided, " + ", ".join(f"{n} {s}" for s, n in sorted(statuses.items()))),
+            ("photos", counters["photos"], photos_seconds,
+             f"{store.photo_queue_stats()['workers']} workers, {args.photos}, {counters['photo_bytes'] / 1024 / 1024:.1f} MB"),
+        ]
+    stages.append(("save", len(listings), save_seconds, args.output))
+    print_stats(stages)
+    print(f"total {time.perf_counter() - pipeline_start:.2f}s")
+    for error in errors: print(f"error: {error}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
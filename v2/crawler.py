@@ -0,0 +1,348 @@
+import threading
+import logging
+import requests
+import random
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+
+from listing import Listing 
+from parser_backend import get_backend
+from list_parser import BASE_URL, extract_list_page
+from rate_limiter import get_shared_limiter, is_throttle_status
+from signals import Signal
+
+WARD_CODES = ["13119","13113","13104","13115","13102",
+              "13101","13116","13105","13103","13110"]
+LAYOUT_PARAM_MAP = {
+    "1R":"m1r","1K":"m1k","1DK":"m1dk","1LDK":"m1ldk",
+    "2K":"m2k","2DK":"m2dk","2LDK":"m2ldk","3LDK":"m3ldk"
+}
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15',
+]
+INITIAL_BACKOFF_TIME = 5
+MAX_BACKOFF_TIME     = 60
+MAX_SCRAPER_RETRIES  = 5
+PAGE_DELAY           = 0.25
+MAX_PAGE_CONCURRENCY = 8
+DEFAULT_SHARD_CONCURRENCY = 4
+
+class Crawler:
+    """Crawls the search result pages, without any Qt dependency.
+
+    start() runs the crawl in a background thread, run() in the calling one. Results are
+    reported through the signals below (plain callbacks here, pyqtSignals in scraper.Scraper).
+    """
+    new_listing = Signal()
+    listings_batch = Signal() # all new listings of one page, emitted after the per-listing signals
+    finished    = Signal()
+    error       = Signal()
+    progress    = Signal()
+
+    def __init__(self, parser_backend=None, http_cache=None, rate_limiter=None):
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_shared_limiter()
+        self.parser_backend = parser_backend if parser_backend is not None else get_backend()
+        self.http_cache = http_cache # optional http_cache.HttpCache for conditional list-page requests
+        self._stop_event   = threading.Event()
+        self._crawl_stop_events = set() # one per running crawl (shard), set by stop() too
+        self._stop_lock = threading.Lock()
+        self.layout_params = []
+        self.known_listing_links = set() # delta scraping check
+        self.page_concurrency = 1
+        self.parse_workers = 0
+        self.known_page_stop = 0
+        self.expected_pages = None
+        self.ward_codes = WARD_CODES
+        self.sharded = False
+        self.shard_concurrency = DEFAULT_SHARD_CONCURRENCY
+        self.last_crawl_stats = {}
+
+    def _get_headers(self):
+        return {'User-Agent': random.choice(USER_AGENTS)}
+
+    def start(self, layout_params, known_links, skip_cached, page_concurrency=1, parse_workers=0,
+              known_page_stop=0, expected_pages=None, sharded=False, ward_codes=None,
+              shard_concurrency=DEFAULT_SHARD_CONCURRENCY, background=True):
+        """Starts a crawl in a background thread (or runs it right here with background=False).
+
+        With skip_cached and known_page_stop=K > 0 the crawl stops after K consecutive pages
+        whose listings are all in known_links (delta crawl). expected_pages, the page count of
+        the last full crawl, is only used to report how many pages that saved.
+
+        sharded=True splits the search into one query per (ward, layout), crawled
+        shard_concurrency at a time, each with its own pagination and termination; results are
+        merged by link. ward_codes limits the crawl to some of WARD_CODES.
+        """
+        logging.debug(f"Scraper.start() with layouts={layout_params}, skip_cached={skip_cached}, page_concurrency={page_concurrency}, parse_workers={parse_workers}, known_page_stop={known_page_stop}")
+        self.layout_params = layout_params
+        self.known_listing_links = known_links
+        self.skip_cached = skip_cached
+        self.page_concurrency = max(1, min(int(page_concurrency), MAX_PAGE_CONCURRENCY))
+        self.parse_workers = max(0, int(parse_workers))
+        self.known_page_stop = max(0, int(known_page_stop)) if skip_cached else 0
+        self.expected_pages = expected_pages
+        self.ward_codes = list(ward_codes) if ward_codes else WARD_CODES
+        self.sharded = sharded
+        self.shard_concurrency = max(1, int(shard_concurrency))
+        self._stop_event.clear()
+        if background: threading.Thread(target=self.run, daemon=True).start()
+        else: self.run()
+
+    def stop(self):
+        logging.info("Stop requested for Scraper.")
+        with self._stop_lock:
+            self._stop_event.set()
+            for event in self._crawl_stop_events: event.set()
+
+    def _new_crawl_stop_event(self):
+        """An event that stops the page fetches of one crawl; stop() sets it as well."""
+        event = threading.Event()
+        with self._stop_lock:
+            if self._stop_event.is_set(): event.set()
+            self._crawl_stop_events.add(event)
+        return event
+
+    def _end_crawl(self, stop_event):
+        # Fetches still running for pages past the end give up instead of retrying them
+        stop_event.set()
+        with self._stop_lock: self._crawl_stop_events.discard(stop_event)
+
+    def _build_url(self, page, ward_codes=None, layout_params=None):
+        url = BASE_URL + "/tokyo/search/list.html?search_mode=area"
+        for c in (ward_codes or self.ward_codes):
+            url += f"&jc%5B%5D={c}"
+        url += "&cmd=select_page&rno=300&cnt=30&srt=1"
+        for t in (layout_params if layout_params is not None else self.layout_params):
+            p = LAYOUT_PARAM_MAP.get(t)
+            if p:
+                url += f"&{p}=1"
+        url += "&j01=1"
+        url += f"&pno={page}"
+        return url
+
+    def _shards(self):
+        """One (label, url builder) per independent query: the whole search, or every ward x layout pair."""
+        if not self.sharded:
+            return [("all", self._build_url)]
+        return [(f"{ward}/{layout}", partial(self._build_url, ward_codes=[ward], layout_params=[layout]))
+                for ward in self.ward_codes for layout in self.layout_params if layout in LAYOUT_PARAM_MAP]
+
+    def _fetch_page(self, build_url, page, label="all", stop_event=None):
+        """Fetches one list page, retrying with backoff on rate limiting and network errors.
+
+        Returns (response, None) on success, (None, error_message) when the crawl has to
+        be aborted and (None, None) if the scraper (or stop_event, the crawl's own event)
+        was stopped while waiting.
+        """
+        if stop_event is None: stop_event = self._stop_event
+        url = build_url(page)
+        page_name = f"page {page}" if label == "all" else f"[{label}] page {page}"
+        current_backoff_time = INITIAL_BACKOFF_TIME
+        retries = 0
+        while not stop_event.is_set():
+            if not self.rate_limiter.acquire(stop_event): break
+            logging.info(f"Fetching {page_name}: {url}")
+            self.progress.emit(f"Fetching {page_name}...")
+            try:
+                if self.http_cache: resp = self.http_cache.get(url, headers=self._get_headers(), timeout=20)
+                else: resp = requests.get(url, headers=self._get_headers(), timeout=20)
+                resp.raise_for_status()
+                self.rate_limiter.record_success()
+                return resp, None
+            except requests.exceptions.HTTPError as http_err:
+                logging.warning(f"HTTP error: {http_err.response.status_code} for {url}")
+                self.rate_limiter.record_response(http_err.response.status_code, http_err.response.headers.get('Retry-After'))
+                if is_throttle_status(http_err.response.status_code):
+                    retries += 1
+                    if retries > MAX_SCRAPER_RETRIES:
+                        return None, f"Max retries exceeded for {url}. Error: {http_err}"
+                    logging.warning(f"Retrying ({retries}/{MAX_SCRAPER_RETRIES}) in {current_backoff_time}s...")
+                    self.progress.emit(f"Rate limited. Retrying {page_name} in {current_backoff_time}s...")
+                    stop_event.wait(current_backoff_time)
+                    current_backoff_time = min(current_backoff_time * 2, MAX_BACKOFF_TIME)
+                    continue
+                else:
+                    return None, f"HTTP error: {http_err}"
+            except requests.exceptions.RequestException as req_err:
+                logging.error(f"Request exception: {req_err} for {url}")
+                self.rate_limiter.record_throttle()
+                retries += 1
+                if retries > MAX_SCRAPER_RETRIES:
+                    return None, f"Max retries exceeded for {url}. Error: {type(req_err).__name__}: {req_err}"
+                logging.warning(f"Retrying ({retries}/{MAX_SCRAPER_RETRIES}) in {current_backoff_time}s...")
+                self.progress.emit(f"Network issue. Retrying {page_name} in {current_backoff_time}s...")
+                stop_event.wait(current_backoff_time)
+                current_backoff_time = min(current_backoff_time * 2, MAX_BACKOFF_TIME)
+                continue
+        return None, None
+
+    def _fetch_and_parse_page(self, build_url, page, label, parse_pool, stop_event=None):
+        """Fetches and parses one list page off the scraper thread.
+
+        Returns (box_count, listing_fields, error_message); box_count is None when the page
+        could not be fetched (see _fetch_page for the meaning of error_message).
+        """
+        resp, fetch_error = self._fetch_page(build_url, page, label, stop_event)
+        if resp is None or (stop_event is not None and stop_event.is_set()):
+            return None, [], fetch_error
+        if parse_pool is not None:
+            box_count, listing_fields = parse_pool.submit(extract_list_page, resp.content, page, self.parser_backend.name).result()
+        else:
+            box_count, listing_fields = extract_list_page(resp.content, page, self.parser_backend.name)
+        return box_count, listing_fields, None
+
+    def _crawl_stats(self, pages_consumed, last_result_page, stopped_early, reached_end):
+        pages_saved = None
+        if stopped_early and self.expected_pages and not self.sharded:
+            pages_saved = max(0, self.expected_pages - pages_consumed)
+        return {"pages_fetched": pages_consumed, "result_pages": last_result_page,
+                "stopped_early": stopped_early, "reached_end": reached_end, "pages_saved": pages_saved}
+
+    def _emit_new_listings(self, listing_fields):
+        """Emits the listings of one page that are neither known (delta mode) nor already seen in this crawl."""
+        page_listings = []
+        for fields in listing_fields:
+            # Delta Scraping Check
+            if self.skip_cached and fields["link"] in self.known_listing_links:
+                logging.debug(f"Skipping known listing (delta mode): {fields['link']}")
+                continue
+            # Shards overlap (and pagination can shift mid-crawl), merge by link
+            with self._seen_lock:
+                if fields["link"] in self._seen_links: continue
+                self._seen_links.add(fields["link"])
+            listing = Listing(**fields)
+            page_listings.append(listing)
+            self.new_listing.emit(listing)
+        if page_listings:
+            self.listings_batch.emit(page_listings)
+
+    def _new_crawl_state(self):
+        return {"page": 1, "empty_in_a_row": 0, "known_pages_in_a_row": 0, "last_result_page": 0,
+                "stopped_early": False, "reached_end": False}
+
+    def _consume_page(self, label, state, box_count, listing_fields):
+        """Emits one parsed page and advances the crawl state.
+
+        Returns the delay before the next page is consumed, or None when the crawl is over
+        (two empty pages in a row or a delta stop).
+        """
+        page = state["page"]
+        if not box_count:
+            state["empty_in_a_row"] += 1
+            if state["empty_in_a_row"] >= 2:
+                logging.info(f"[{label}] No more listings after page {page-1}.")
+                state["reached_end"] = True
+                return None
+            state["page"] += 1
+            return 1
+        state["empty_in_a_row"] = 0
+        state["last_result_page"] = page
+
+        self._emit_new_listings(listing_fields)
+
+        if self.known_page_stop:
+            page_fully_known = bool(listing_fields) and all(f["link"] in self.known_listing_links for f in listing_fields)
+            state["known_pages_in_a_row"] = state["known_pages_in_a_row"] + 1 if page_fully_known else 0
+            if state["known_pages_in_a_row"] >= self.known_page_stop:
+                logging.info(f"[{label}] Delta crawl: {state['known_pages_in_a_row']} fully known pages in a row, stopping at page {page}.")
+                state["stopped_early"] = True
+                return None
+        state["page"] += 1
+        return PAGE_DELAY
+
+    def _state_stats(self, state):
+        return self._crawl_stats(state["page"], state["last_result_page"], state["stopped_early"], state["reached_end"])
+
+    def _crawl(self, label, build_url, parse_pool, stop_event=None):
+        """Crawls one query page by page until two empty pages, a delta stop, an error or stop().
+
+        stop_event (made here if not given) is set when the crawl ends, so the fetches of
+        pages it no longer needs stop retrying. Returns (stats, error_message).
+        """
+        if stop_event is None: stop_event = self._new_crawl_stop_event()
+        # Pages are fetched by a small pool, at most page_concurrency in flight while
+        # the current one is emitted, and consumed strictly in page order. Parsing happens
+        # in the fetching threads or, with parse_workers > 0, in a process pool.
+        executor = ThreadPoolExecutor(max_workers=self.page_concurrency, thread_name_prefix="scraper-page")
+        try:
+            state = self._new_crawl_state()
+            next_page_to_fetch = 1
+            crawl_error = None
+            in_flight = {}
+
+            while not stop_event.is_set():
+                while len(in_flight) < self.page_concurrency:
+                    in_flight[next_page_to_fetch] = executor.submit(self._fetch_and_parse_page, build_url, next_page_to_fetch, label, parse_pool, stop_event)
+                    next_page_to_fetch += 1
+
+                box_count, listing_fields, crawl_error = in_flight.pop(state["page"]).result()
+                if box_count is None:
+                    break
+                delay = self._consume_page(label, state, box_count, listing_fields)
+                if delay is None or stop_event.wait(delay):
+                    break
+
+            return self._state_stats(state), crawl_error
+        finally:
+            self._end_crawl(stop_event)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _crawl_all(self, shards, parse_pool):
+        """Crawls every shard, shard_concurrency at a time. Returns [(label, stats, error_message)] in shard order."""
+        if len(shards) == 1:
+            label, build_url = shards[0]
+            return [(label, *self._crawl(label, build_url, parse_pool))]
+        shard_pool = ThreadPoolExecutor(max_workers=self.shard_concurrency, thread_name_prefix="scraper-shard")
+        stop_events = [self._new_crawl_stop_event() for _ in shards]
+        try:
+            futures = [(label, shard_pool.submit(self._crawl, label, build_url, parse_pool, stop_event))
+                       for (label, build_url), stop_event in zip(shards, stop_events)]
+            return [(label, *future.result()) for label, future in futures]
+        finally:
+            # Shards still running if one of them raised stop as well
+            for stop_event in stop_events: self._end_crawl(stop_event)
+            shard_pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self):
+        parse_pool = None
+        if self.parse_workers > 0:
+            parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            self._seen_links = set()
+            self._seen_lock = threading.Lock()
+            shards = self._shards()
+            logging.debug(f"Scraper thread started ({len(shards)} shard(s), page_concurrency={self.page_concurrency}, parse_workers={self.parse_workers})")
+
+            results = self._crawl_all(shards, parse_pool)
+
+            stats = [r[1] for r in results]
+            self.last_crawl_stats = {
+                "shards": len(shards),
+                "pages_fetched": sum(s["pages_fetched"] for s in stats),
+                "result_pages": sum(s["result_pages"] for s in stats),
+                "stopped_early": any(s["stopped_early"] for s in stats),
+                "reached_end": all(s["reached_end"] for s in stats),
+                "pages_saved": stats[0]["pages_saved"] if len(stats) == 1 else None,
+                "listings": len(self._seen_links),
+            }
+            logging.info(f"Crawl stats: {self.last_crawl_stats}")
+
+            failed = [(label, err) for label, _, err in results if err]
+            if failed:
+                if len(shards) == 1: self.error.emit(failed[0][1])
+                else: self.error.emit(f"{len(failed)} of {len(shards)} shards failed: " + "; ".join(f"[{label}] {err}" for label, err in failed))
+            elif self.last_crawl_stats["stopped_early"]:
+                saved = self.last_crawl_stats["pages_saved"]
+                self.progress.emit(f"Delta crawl stopped early" + (f", saved ~{saved} pages." if saved is not None else "."))
+
+            logging.debug("Scraper thread exiting normally or due to stop.")
+            self.finished.emit()
+
+        except Exception as e:
+            logging.error("Unhandled Scraper error in run:", exc_info=True)
+            self.error.emit(f"Critical scraper error: {str(e)}")
+        finally:
+            if parse_pool is not None: parse_pool.shutdown(wait=False, cancel_futures=True)
+            logging.debug("Scraper thread run finished.")
@@ -0,0 +1,160 @@
+import hashlib
+import logging
+import re
+from functools import lru_cache
+
+from parser_backend import decode_page, get_backend
+
+# Kept free of Qt and of any store state, like list_parser.
+
+BASE_URL = "https://www.monthly-mansion.com"
+
+# The targeted extractor finds these anchors with plain text searches and cuts out only
+# the regions around them; matches inside <script> or comments are skipped.
+_PHOTO_DIV_RE = re.compile(r'<div\b[^>]*\bclass="(?:[^"]*\s)?photo(?:\s[^"]*)?"', re.I)
+_THUMBNAIL_UL_RE = re.compile(r'<ul\b[^>]*\bclass="(?:[^"]*\s)?thumbnail(?:\s[^"]*)?"[^>]*>', re.I)
+_SPEC_TH_RE = re.compile(r'<th\b[^>]*>(?:設備|備考)</th\s*>', re.I)
+_MAPS_IFRAME_RE = re.compile(r'<iframe\b[^>]*google\.com/maps/embed[^>]*>', re.I)
+# Looser versions of the anchors above. Where one of these matches something the exact
+# pattern doesn't (other quoting, whitespace, markup inside a <th>), the full parse might
+# read a region the cut-out would miss, so the whole page is parsed instead.
+_LOOSE_PHOTO_DIV_RE = re.compile(r'<div\b[^>]*\bphoto\b', re.I)
+_LOOSE_THUMBNAIL_UL_RE = re.compile(r'<ul\b[^>]*\bthumbnail\b', re.I)
+_LOOSE_SPEC_TH_RE = re.compile(r'<th\b[^>]*>(?:(?!</th).)*?(?:設備|備考)', re.S | re.I)
+_TAG_RES = {tag: re.compile(rf'<(/?){tag}\b', re.I) for tag in ('div', 'ul')}
+
+
+@lru_cache(maxsize=None)
+def _backend(name):
+    return get_backend(name)
+
+
+def extract_detail_page(raw_bytes, backend_name="auto", base_url=BASE_URL, targeted=True, fragment=None):
+    """Parses a listing detail page into a dict of photo_urls, appliances, remarks, latitude, longitude.
+
+    targeted=True parses only the photo thumbnail list, the spec tables with the 設備 / 備考
+    rows and the Google Maps iframe, cut out of the page text; targeted=False parses the
+    whole page. Both give the same fields. If none of the regions can be found (the page
+    layout has changed), or one can't be cut out cleanly or might be missed, the whole page
+    is parsed.
+    fragment is the cut-out returned by detail_digest for the same page, if already made.
+    """
+    if not targeted: fragment = None
+    elif fragment is None: fragment = _targeted_fragment(raw_bytes)
+    root = _backend(backend_name).parse(fragment if fragment is not None else raw_bytes)
+    return _extract_fields(root, base_url)
+
+
+def detail_digest(raw_bytes):
+    """Returns (digest, fragment): a hash of the regions extract_detail_page reads and the cut-out itself.
+
+    Hashing only those regions keeps ads, tokens and other parts of the page that change
+    on every request from looking like a change to the listing. When the regions can't
+    be cut out the whole page is hashed and fragment is None.
+    """
+    fragment = _targeted_fragment(raw_bytes)
+    data = fragment.encode('utf-8') if fragment is not None else raw_bytes
+    if isinstance(data, str): data = data.encode('utf-8')
+    return hashlib.blake2b(data, digest_size=16).hexdigest(), fragment
+
+
+def _targeted_fragment(raw_bytes):
+    """The regions extract_detail_page needs as one small HTML document, or None to parse the whole page."""
+    html = decode_page(raw_bytes) if isinstance(raw_bytes, bytes) else raw_bytes
+    parts = []
+    photo_divs = _unambiguous_matches(_PHOTO_DIV_RE, _LOOSE_PHOTO_DIV_RE, html)
+    if photo_divs is None or len(photo_divs) > 1: return None
+    if photo_divs:
+        # Only the thumbnail list inside div.photo counts, and it may hold nested lists
+        div_end = _element_end(html, photo_divs[0].start(), 'div')
+        if div_end < 0: return None
+        thumbnails = _unambiguous_matches(_THUMBNAIL_UL_RE, _LOOSE_THUMBNAIL_UL_RE, html, photo_divs[0].end(), div_end)
+        if thumbnails is None or len(thumbnails) > 1: return None
+        if thumbnails:
+            ul_end = _element_end(html, thumbnails[0].start(), 'ul')
+            if ul_end < 0 or ul_end > div_end: return None
+            parts.append(f'<div class="photo">{html[thumbnails[0].start():ul_end]}</div>')
+    spec_ths = _unambiguous_matches(_SPEC_TH_RE, _LOOSE_SPEC_TH_RE, html)
+    if spec_ths is None: return None
+    tables = []
+    for th in spec_ths:
+        start = html.rfind('<table', 0, th.start()); end = html.find('</table', th.end())
+        if start < 0 or end < 0: return None
+        end = html.find('>', end) + 1
+        if (start, end) in tables: continue
+        if '<table' in html[start + 1:end] or '</table' in html[start:th.start()]:
+            return None # nested tables can't be cut out this way
+        tables.append((start, end))
+    parts.extend(html[start:end] for start, end in tables)
+    iframe = _first_outside_scripts(_MAPS_IFRAME_RE, html)
+    if iframe: parts.append(iframe.group(0))
+    if not parts: return None
+    return "<html><body>" + "".join(parts) + "</body></html>"
+
+
+def _element_end(html, start, tag):
+    """The index just past the closing tag of the <tag> element opened at start, or -1 if it isn't closed."""
+    depth = 0
+    for match in _TAG_RES[tag].finditer(html, start):
+        depth += -1 if match.group(1) else 1
+        if depth == 0:
+            end = html.find('>', match.end())
+            return end + 1 if end >= 0 else -1
+    return -1
+
+
+def _outside_scripts(pattern, html, pos=0, endpos=None):
+    """pattern.finditer(html, pos, endpos), skipping matches inside <script> elements and comments."""
+    if endpos is None: endpos = len(html)
+    while True:
+        match = pattern.search(html, pos, endpos)
+        if match is None: return
+        start = match.start()
+        if html.rfind('<script', 0, start) > html.rfind('</script', 0, start):
+            pos = html.find('</script', start)
+        elif html.rfind('<!--', 0, start) > html.rfind('-->', 0, start):
+            pos = html.find('-->', start)
+        else:
+            yield match
+            pos = match.end()
+            continue
+        if pos < 0: return
+
+
+def _unambiguous_matches(pattern, loose_pattern, html, pos=0, endpos=None):
+    """The matches of pattern outside scripts, or None if loose_pattern matches more often there."""
+    matches = list(_outside_scripts(pattern, html, pos, endpos))
+    if sum(1 for _ in _outside_scripts(loose_pattern, html, pos, endpos)) != len(matches): return None
+    return matches
+
+
+def _first_outside_scripts(pattern, html):
+    return next(_outside_scripts(pattern, html), None)
+
+
+def _extract_fields(root, base_url):
+    photo_urls = []
+    for a_tag in root.select('div.photo ul.thumbnail li a'):
+        img_href = a_tag.attr('href')
+        if img_href: photo_urls.append(base_url + img_href if not img_href.startswith('http') else img_href)
+
+    appliances, remarks_str = [], ""
+    setsubi_th = root.find_by_text('th', '設備'); bikou_th = root.find_by_text('th', '備考')
+    if setsubi_th and setsubi_th.next_sibling('td'):
+        setsubi_td = setsubi_th.next_sibling('td')
+        if setsubi_td.select('li'): appliances = [li.text() for li in setsubi_td.select('li')]
+        else: appliances = [item.strip() for item in re.split(r'[、､,]', setsubi_td.text()) if item.strip()]
+    if bikou_th and bikou_th.next_sibling('td'): remarks_str = bikou_th.next_sibling('td').text("\n")
+
+    latitude = longitude = None
+    gmaps_iframe = root.select_one('iframe[src*="google.com/maps/embed"]')
+    if gmaps_iframe and gmaps_iframe.attr('src'):
+        gmaps_src = gmaps_iframe.attr('src')
+        coord_match = re.search(r'[?&]q=([\d.-]+),([\d.-]+)', gmaps_src)
+        if coord_match:
+            try: latitude = float(coord_match.group(1)); longitude = float(coord_match.group(2)); logging.info(f"Geo found: {latitude}, {longitude}")
+            except ValueError: logging.warning(f"Geo convert fail: {coord_match.groups()}")
+        else: logging.warning(f"Geo parse fail: {gmaps_src}")
+    else: logging.warning("No GMap iframe found")
+    return {"photo_urls": photo_urls, "appliances": appliances, "remarks": remarks_str,
+            "latitude": latitude, "longitude": longitude}
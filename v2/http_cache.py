@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import requests
+
+HTTP_CACHE_DIR = "http_cache"
+DEFAULT_TTL = 0                        # seconds a stored page is served without asking the server
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+class CachedResponse:
+    """The subset of requests.Response the scrapers use, plus where the body came from."""
+
+    def __init__(self, url, content, status_code=200, headers=None, from_cache=False, not_modified=False):
+        self.url = url
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.from_cache = from_cache      # body served from disk (fresh within TTL or revalidated)
+        self.not_modified = not_modified  # body is the same as the last time we downloaded it
+
+    def raise_for_status(self):
+        # Only successful (or revalidated) bodies are ever returned
+        pass
+
+
+class HttpCache:
+    """On-disk HTTP response cache keyed by URL with ETag / Last-Modified revalidation.
+
+    Entries are a '<sha256>.body' file plus a '<sha256>.json' metadata file. Within the TTL
+    a stored body is returned without a request; after that the request is made conditional
+    and a 304 returns the stored body with not_modified=True. The total body size is kept
+    under max_bytes by evicting the least recently used entries.
+    """
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = {}   # url -> metadata dict
+        self._total_bytes = 0
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "evicted": 0}
+        self._load_index()
+
+    def _key(self, url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _body_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.body")
+
+    def _meta_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_index(self):
+        if not os.path.isdir(self.cache_dir):
+            try: os.makedirs(self.cache_dir)
+            except OSError as e: logging.error(f"Failed to create HTTP cache directory '{self.cache_dir}': {e}")
+            return
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"): continue
+            try:
+                with open(os.path.join(self.cache_dir, name), 'r', encoding='utf-8') as f: meta = json.load(f)
+                meta["last_used"] = meta.get("stored_at", 0)
+                self._entries[meta["url"]] = meta
+                self._total_bytes += meta.get("size", 0)
+            except Exception as e: logging.warning(f"Skipping unreadable HTTP cache entry '{name}': {e!r}")
+        logging.info(f"HTTP cache: {len(self._entries)} entries, {self._total_bytes / 1024 / 1024:.1f} MB in {self.cache_dir}")
+
+    def _read_body(self, meta):
+        try:
+            with open(self._body_path(meta["key"]), 'rb') as f: return f.read()
+        except OSError as e:
+            logging.warning(f"HTTP cache body missing for {meta['url']}: {e}")
+            return None
+
+    def get(self, url, headers=None, timeout=20):
+        """GETs url through the cache. Raises the same requests exceptions as requests.get + raise_for_status."""
+        fresh, meta, request_headers = self.prepare(url, headers)
+        if fresh is not None:
+            return fresh
+        resp = requests.get(url, headers=request_headers, timeout=timeout)
+        if resp.status_code != 304:
+            resp.raise_for_status()
+        cached = self.complete(url, meta, resp.status_code, resp.headers, resp.content)
+        if cached is None:
+            # Stored body vanished, fetch it again unconditionally
+            resp = requests.get(url, headers=headers, timeout=timeout)
+            resp.raise_for_status()
+            cached = self.complete(url, None, resp.status_code, resp.headers, resp.content)
+        return cached
+
+    def prepare(self, url, headers=None):
+        """First half of a cached GET for callers that bring their own HTTP client.
+
+        Returns (fresh_response, meta, request_headers): a stored response that is still within
+        the TTL (no request needed), otherwise None plus the entry to revalidate and the
+        headers with If-None-Match / If-Modified-Since added.
+        """
+        with self._lock: meta = self._entries.get(url)
+        if meta and self.ttl > 0 and time.time() - meta["stored_at"] < self.ttl:
+            body = self._read_body(meta)
+            if body is not None:
+                with self._lock: meta["last_used"] = time.time(); self.stats["hits"] += 1
+                return CachedResponse(url, body, from_cache=True, not_modified=True), meta, None
+
+        request_headers = dict(headers or {})
+        if meta:
+            if meta.get("etag"): request_headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"): request_headers["If-Modified-Since"] = meta["last_modified"]
+        return None, meta, request_headers
+
+    def complete(self, url, meta, status_code, resp_headers, body):
+        """Second half of a cached GET: stores a successful body or resolves a 304 against meta.
+
+        Returns the CachedResponse, or None if the server answered 304 but the stored body is
+        gone (the caller then has to repeat the request without the conditional headers).
+        """
+        if status_code == 304 and meta:
+            body = self._read_body(meta)
+            if body is None: return None
+            logging.debug(f"HTTP cache: 304 Not Modified for {url}")
+            self._touch(meta)
+            return CachedResponse(url, body, headers=resp_headers, from_cache=True, not_modified=True)
+
+        with self._lock: self.stats["misses"] += 1
+        etag = resp_headers.get("ETag"); last_modified = resp_headers.get("Last-Modified")
+        if status_code == 200 and (etag or last_modified or self.ttl > 0):
+            self._store(url, body, etag, last_modified)
+        return CachedResponse(url, body, status_code, resp_headers)
+
+    def _store(self, url, body, etag, last_modified):
+        key = self._key(url)
+        now = time.time()
+        meta = {"url": url, "key": key, "etag": etag, "last_modified": last_modified, "stored_at": now, "size": len(body)}
+        try:
+            with open(self._body_path(key), 'wb') as f: f.write(body)
+            with open(self._meta_path(key), 'w', encoding='utf-8') as f: json.dump(meta, f)
+        except OSError as e:
+            logging.warning(f"Failed to write HTTP cache entry for {url}: {e}")
+            return
+        with self._lock:
+            old = self._entries.get(url)
+            if old: self._total_bytes -= old.get("size", 0)
+            meta["last_used"] = now
+            self._entries[url] = meta
+            self._total_bytes += len(body)
+            self._evict_locked()
+
+    def _touch(self, meta):
+        """Restarts the TTL of an entry the server just confirmed as unchanged."""
+        with self._lock:
+            self.stats["revalidated"] += 1
+            meta["stored_at"] = meta["last_used"] = time.time()
+            on_disk = {k: v for k, v in meta.items() if k != "last_used"}
+        try:
+            with open(self._meta_path(meta["key"]), 'w', encoding='utf-8') as f: json.dump(on_disk, f)
+        except OSError as e: logging.warning(f"Failed to update HTTP cache entry for {meta['url']}: {e}")
+
+    def _evict_locked(self):
+        if self._total_bytes <= self.max_bytes: return
+        for meta in sorted(self._entries.values(), key=lambda m: m["last_used"]):
+            if self._total_bytes <= self.max_bytes: break
+            self._remove_locked(meta)
+            self.stats["evicted"] += 1
+
+    def _remove_locked(self, meta):
+        self._entries.pop(meta["url"], None)
+        self._total_bytes -= meta.get("size", 0)
+        for path in (self._body_path(meta["key"]), self._meta_path(meta["key"])):
+            try: os.remove(path)
+            except OSError: pass
+
+    def total_bytes(self):
+        return self._total_bytes
+
+    def clear(self):
+        with self._lock:
+            for meta in list(self._entries.values()): self._remove_locked(meta)
+        logging.info(f"Cleared HTTP cache in {self.cache_dir}")
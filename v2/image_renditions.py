@@ -0,0 +1,33 @@
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, Qt
+from PyQt5.QtGui import QImage, QPainter
+
+from image_store import THUMBNAIL, DISPLAY
+
+THUMBNAIL_HEIGHT = 80
+DISPLAY_WIDTH = 1000       # wider than the detail pane usually is, so it is only ever scaled down
+JPEG_QUALITY = {THUMBNAIL: 80, DISPLAY: 88}
+
+
+def _encode_jpeg(image, quality):
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    if not image.save(buffer, "JPG", quality): raise ValueError("JPEG encoding failed")
+    return bytes(data)
+
+
+def make_renditions(image_bytes):
+    """ImageStore renderer: {THUMBNAIL: ..., DISPLAY: ...} as JPEG bytes, or {} if the photo can't be decoded.
+
+    Only uses QImage, which is safe off the GUI thread, so it runs in the photo workers.
+    """
+    image = QImage.fromData(image_bytes)
+    if image.isNull(): return {}
+    if image.hasAlphaChannel():
+        # JPEG has no alpha, flatten transparent PNG/GIF photos onto white
+        flat = QImage(image.size(), QImage.Format_RGB32); flat.fill(Qt.white)
+        painter = QPainter(flat); painter.drawImage(0, 0, image); painter.end()
+        image = flat
+    thumb = image.scaledToHeight(THUMBNAIL_HEIGHT, Qt.SmoothTransformation) if image.height() > THUMBNAIL_HEIGHT else image
+    display = image.scaledToWidth(DISPLAY_WIDTH, Qt.SmoothTransformation) if image.width() > DISPLAY_WIDTH else image
+    return {THUMBNAIL: _encode_jpeg(thumb, JPEG_QUALITY[THUMBNAIL]), DISPLAY: _encode_jpeg(display, JPEG_QUALITY[DISPLAY])}
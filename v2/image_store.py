@@ -0,0 +1,257 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+IMAGE_CACHE_DIR = "image_cache"
+INDEX_FILE = "index.json"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+INDEX_FLUSH_INTERVAL = 10   # seconds between index writes while photos are being stored
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
+# Renditions stored next to each original as '<sha256>.<name>.jpg'
+THUMBNAIL = "thumb"         # strip under the main photo, 80 px high
+DISPLAY = "display"         # main photo, at most the detail pane's usual width
+RENDITIONS = (THUMBNAIL, DISPLAY)
+
+
+class ImageStore:
+    """Size-bounded photo cache keyed by URL, with an in-memory index.
+
+    Photos are '<sha256(url)><ext>' files in cache_dir, as before the index existed. The
+    index (url -> file, size, last_used, renditions) is kept in memory and written to
+    index.json every INDEX_FLUSH_INTERVAL seconds and on flush(), so contains() never touches
+    the disk. On load it is reconciled with the directory: entries whose file is gone are
+    dropped and unindexed files are adopted the first time their URL is asked for. The total
+    size is kept under max_bytes by evicting the least recently used photos.
+
+    renderer, if given, is called with the original bytes when a photo is stored and returns
+    {rendition name: jpeg bytes} (see image_renditions.make_renditions); the renditions are
+    written next to the original and served by get(url, rendition).
+    """
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, renderer=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.renderer = renderer
+        self._lock = threading.Lock()
+        self._entries = {}       # url -> {"file", "size", "last_used", "renditions": {name: size}}
+        self._unindexed = {}     # file name -> size, files on disk we don't know the URL of yet
+        self._total_bytes = 0
+        self._dirty = False
+        self._last_flush = time.time()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0, "rendered": 0}
+        self._load_index()
+
+    def _file_name(self, url):
+        url_hash = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        _, ext = os.path.splitext(url)
+        if ext.lower() not in IMAGE_EXTENSIONS: ext = '.jpg'
+        return f"{url_hash}{ext}"
+
+    def _rendition_file(self, file_name, rendition):
+        return f"{os.path.splitext(file_name)[0]}.{rendition}.jpg"
+
+    def _is_original(self, file_name):
+        return file_name.count(".") == 1
+
+    def _path(self, file_name):
+        return os.path.join(self.cache_dir, file_name)
+
+    def path(self, url, rendition=None):
+        """Where url's photo (or one of its renditions) is, or would be, stored."""
+        file_name = self._file_name(url)
+        return self._path(self._rendition_file(file_name, rendition) if rendition else file_name)
+
+    def _entry_files(self, meta):
+        return [meta["file"]] + [self._rendition_file(meta["file"], r) for r in meta["renditions"]]
+
+    def _entry_size(self, meta):
+        return meta["size"] + sum(meta["renditions"].values())
+
+    def _load_index(self):
+        if not os.path.isdir(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+                logging.info(f"Created image cache directory: {self.cache_dir}")
+            except OSError as e: logging.error(f"Failed to create image cache directory '{self.cache_dir}': {e}")
+            return
+        try:
+            with open(self._path(INDEX_FILE), 'r', encoding='utf-8') as f: indexed = json.load(f)
+        except FileNotFoundError: indexed = {}
+        except Exception as e: logging.warning(f"Unreadable image cache index, rebuilding: {e!r}"); indexed = {}
+
+        on_disk = {}
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.startswith(INDEX_FILE) or not entry.is_file(): continue
+                try: on_disk[entry.name] = entry.stat().st_size
+                except OSError: pass
+        for url, meta in indexed.items():
+            size = on_disk.pop(meta.get("file"), None)
+            if size is None: continue
+            entry = {"file": meta["file"], "size": size, "last_used": meta.get("last_used", 0), "renditions": {}}
+            for rendition in meta.get("renditions", {}):
+                rendition_size = on_disk.pop(self._rendition_file(meta["file"], rendition), None)
+                if rendition_size is not None: entry["renditions"][rendition] = rendition_size
+            self._entries[url] = entry
+            self._total_bytes += self._entry_size(entry)
+        self._unindexed = on_disk
+        self._total_bytes += sum(on_disk.values())
+        self._dirty = bool(on_disk) or len(self._entries) != len(indexed)
+        logging.info(f"Image cache: {len(self._entries)} indexed + {len(on_disk)} unindexed files, "
+                     f"{self._total_bytes / 1024 / 1024:.1f} MB in {self.cache_dir}")
+
+    def _lookup_locked(self, url):
+        meta = self._entries.get(url)
+        if meta is None and self._unindexed:
+            file_name = self._file_name(url)
+            size = self._unindexed.pop(file_name, None)
+            if size is not None:
+                meta = self._entries[url] = {"file": file_name, "size": size, "last_used": 0, "renditions": {}}
+                for rendition in RENDITIONS:
+                    rendition_size = self._unindexed.pop(self._rendition_file(file_name, rendition), None)
+                    if rendition_size is not None: meta["renditions"][rendition] = rendition_size
+                self._dirty = True
+        return meta
+
+    def contains(self, url):
+        with self._lock: return self._lookup_locked(url) is not None
+
+    def get(self, url, rendition=None):
+        """Returns the stored photo bytes (or the named rendition), or None if url isn't cached.
+
+        Photos stored before a renderer was set get their renditions made on first request;
+        without a renderer the original is returned instead.
+        """
+        with self._lock:
+            meta = self._lookup_locked(url)
+            if meta is None:
+                self.stats["misses"] += 1
+                return None
+            meta["last_used"] = time.time(); self._dirty = True
+            file_name = meta["file"]
+            if rendition in meta["renditions"]: file_name = self._rendition_file(file_name, rendition)
+        try:
+            with open(self._path(file_name), 'rb') as f: data = f.read()
+        except OSError as e:
+            logging.warning(f"Image cache file missing for {url}: {e}")
+            with self._lock:
+                if self._entries.get(url) is meta: self._forget_locked(url)
+            return None
+        with self._lock: self.stats["hits"] += 1
+        if rendition and file_name == meta["file"] and self.renderer is not None:
+            renditions = self._write_renditions(url, data)
+            data = renditions.get(rendition, data)
+        return data
+
+    def put(self, url, data):
+        file_name = self._file_name(url)
+        try:
+            with open(self._path(file_name), 'wb') as f: f.write(data)
+            logging.debug(f"Saved image to cache: {file_name}")
+        except OSError as e:
+            logging.warning(f"Failed to write image cache '{file_name}': {e}")
+            return
+        with self._lock:
+            old = self._entries.get(url)
+            if old: self._total_bytes -= self._entry_size(old)
+            self._entries[url] = {"file": file_name, "size": len(data), "last_used": time.time(), "renditions": {}}
+            self._total_bytes += len(data)
+            self.stats["stored"] += 1
+            self._dirty = True
+        if self.renderer is not None: self._write_renditions(url, data)
+        with self._lock: self._evict_locked()
+        if time.time() - self._last_flush > INDEX_FLUSH_INTERVAL: self.flush()
+
+    def _write_renditions(self, url, data):
+        try: renditions = self.renderer(data)
+        except Exception as e:
+            logging.warning(f"Could not render {url}: {e!r}")
+            return {}
+        file_name = self._file_name(url)
+        written = {}
+        for rendition, rendition_data in renditions.items():
+            try:
+                with open(self._path(self._rendition_file(file_name, rendition)), 'wb') as f: f.write(rendition_data)
+                written[rendition] = len(rendition_data)
+            except OSError as e: logging.warning(f"Failed to write {rendition} of {url}: {e}")
+        with self._lock:
+            meta = self._entries.get(url)
+            if meta is None: return renditions # evicted meanwhile, the files go with the next GC
+            for rendition, size in written.items():
+                self._total_bytes += size - meta["renditions"].get(rendition, 0)
+                meta["renditions"][rendition] = size
+            self.stats["rendered"] += 1
+            self._dirty = True
+        return renditions
+
+    def _evict_locked(self):
+        if self._total_bytes <= self.max_bytes: return
+        # Files we can't attribute to a URL yet are the oldest by definition
+        for file_name in list(self._unindexed):
+            if self._total_bytes <= self.max_bytes: return
+            self._remove_file_locked(file_name, self._unindexed.pop(file_name))
+            self.stats["evicted"] += 1
+        for url, meta in sorted(self._entries.items(), key=lambda item: item[1]["last_used"]):
+            if self._total_bytes <= self.max_bytes: break
+            self._forget_locked(url)
+            for file_name in self._entry_files(meta): self._remove_file_locked(file_name, 0)
+            self.stats["evicted"] += 1
+
+    def _forget_locked(self, url):
+        meta = self._entries.pop(url)
+        self._total_bytes -= self._entry_size(meta)
+        self._dirty = True
+
+    def _remove_file_locked(self, file_name, size):
+        self._total_bytes -= size
+        try: os.remove(self._path(file_name))
+        except OSError: pass
+
+    def gc(self, referenced_urls):
+        """Deletes every stored photo whose URL isn't in referenced_urls. Returns (photos, bytes) removed."""
+        keep = set(referenced_urls)
+        keep_files = set()
+        for url in keep:
+            file_name = self._file_name(url)
+            keep_files.add(file_name); keep_files.update(self._rendition_file(file_name, r) for r in RENDITIONS)
+        removed = freed = 0
+        with self._lock:
+            for url in [u for u in self._entries if u not in keep]:
+                meta = self._entries[url]
+                self._forget_locked(url)
+                for file_name in self._entry_files(meta): self._remove_file_locked(file_name, 0)
+                removed += 1; freed += self._entry_size(meta)
+            for file_name in [f for f in self._unindexed if f not in keep_files]:
+                size = self._unindexed.pop(file_name)
+                self._remove_file_locked(file_name, size)
+                if self._is_original(file_name): removed += 1
+                freed += size
+            self._dirty = True
+        self.flush()
+        logging.info(f"Image cache GC removed {removed} photos ({freed / 1024 / 1024:.1f} MB)")
+        return removed, freed
+
+    def flush(self):
+        """Writes the index if it changed since the last write."""
+        with self._lock:
+            self._last_flush = time.time()
+            if not self._dirty: return
+            snapshot = {url: {**meta, "renditions": dict(meta["renditions"])} for url, meta in self._entries.items()}
+            self._dirty = False
+        tmp_path = self._path(INDEX_FILE + ".tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(snapshot, f)
+            os.replace(tmp_path, self._path(INDEX_FILE))
+        except OSError as e:
+            logging.warning(f"Failed to write image cache index: {e}")
+            with self._lock: self._dirty = True
+
+    def total_bytes(self):
+        return self._total_bytes
+
+    def __len__(self):
+        """Number of photos, renditions not counted."""
+        with self._lock: return len(self._entries) + sum(1 for f in self._unindexed if self._is_original(f))
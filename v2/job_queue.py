@@ -0,0 +1,127 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+
+IN_FLIGHT = object()  # registry marker for a key a worker is processing right now
+
+# put() outcomes
+QUEUED = "queued"
+COALESCED_QUEUED = "coalesced_queued"        # joined a job still waiting in the queue
+COALESCED_IN_FLIGHT = "coalesced_in_flight"  # joined a job a worker is already running
+
+_WAKE = (-1, -1, None, None)  # queue entry that makes a blocked take() look at the delayed jobs again
+
+
+class JobQueue:
+    """Priority queue of keyed jobs that coalesces duplicates.
+
+    The registry maps each key to its best queued priority, or IN_FLIGHT between take()
+    and finish(). Putting a registered key joins that job instead of adding a second one;
+    a better priority re-queues it and the older entry is skipped when it comes up.
+    Lower priorities are served first, equal priorities in insertion order.
+
+    A job can be held back until a not_before time (time.time() seconds), e.g. a retry
+    with backoff; it is registered meanwhile, so putting its key again joins it, and
+    putting it without not_before makes it eligible at once.
+    """
+
+    def __init__(self):
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._jobs = {}
+        self._delayed = {}      # key -> not_before, for registered jobs that aren't eligible yet
+        self._delay_heap = []   # (not_before, seq, key, item), stale entries are skipped
+        self._lock = threading.Lock()
+        self._busy = 0
+
+    def put(self, key, item, priority, not_before=None):
+        """Queues item under key. Returns QUEUED, COALESCED_QUEUED or COALESCED_IN_FLIGHT."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is IN_FLIGHT: return COALESCED_IN_FLIGHT
+            delayed_until = self._delayed.get(key)
+            if delayed_until is not None:
+                priority = min(priority, job)
+                if not_before is not None: not_before = min(not_before, delayed_until)
+                if not_before == delayed_until and priority == job: return COALESCED_QUEUED
+            elif job is not None:
+                if job <= priority: return COALESCED_QUEUED
+                not_before = None # already eligible
+            self._schedule_locked(key, item, priority, not_before)
+            return QUEUED if job is None else COALESCED_QUEUED
+
+    def retry(self, key, item, priority, not_before):
+        """Puts a job taken by take() back in the queue instead of finishing it."""
+        with self._lock:
+            if self._jobs.get(key) is not IN_FLIGHT: return
+            self._busy -= 1
+            self._schedule_locked(key, item, priority, not_before)
+
+    def _schedule_locked(self, key, item, priority, not_before):
+        self._jobs[key] = priority
+        if not_before is not None and not_before > time.time():
+            self._delayed[key] = not_before
+            heapq.heappush(self._delay_heap, (not_before, next(self._seq), key, item))
+            self._queue.put(_WAKE)
+        else:
+            self._delayed.pop(key, None)
+            self._queue.put((priority, next(self._seq), key, item))
+
+    def _promote_due(self):
+        """Moves delayed jobs whose time has come to the queue. Returns seconds until the next one, or None."""
+        with self._lock:
+            now = time.time()
+            while self._delay_heap and self._delay_heap[0][0] <= now:
+                not_before, _, key, item = heapq.heappop(self._delay_heap)
+                if self._delayed.get(key) == not_before:
+                    del self._delayed[key]
+                    self._queue.put((self._jobs[key], next(self._seq), key, item))
+            return self._delay_heap[0][0] - now if self._delay_heap else None
+
+    def prioritize(self, key, item, priority):
+        """Moves a queued job ahead. Returns False if key isn't waiting in the queue."""
+        with self._lock:
+            queued = self._jobs.get(key)
+            if queued is None or queued is IN_FLIGHT or key in self._delayed: return False
+            if priority < queued:
+                self._jobs[key] = priority
+                self._queue.put((priority, next(self._seq), key, item))
+        return True
+
+    def take(self):
+        """Blocks until the next job is available, marks it in flight and returns (key, item).
+
+        Every job taken must be released with finish(key) or retry().
+        """
+        while True:
+            try: priority, _, key, item = self._queue.get(timeout=self._promote_due())
+            except queue.Empty: continue
+            if key is None: continue
+            with self._lock:
+                if self._jobs.get(key) == priority and key not in self._delayed:
+                    self._jobs[key] = IN_FLIGHT
+                    self._busy += 1
+                    return key, item
+            # Stale entry, the job was moved ahead and has been taken already
+
+    def finish(self, key):
+        with self._lock:
+            if self._jobs.get(key) is IN_FLIGHT:
+                del self._jobs[key]
+                self._busy -= 1
+
+    def is_registered(self, key):
+        with self._lock: return key in self._jobs
+
+    def stats(self):
+        """(queued, busy) job counts; jobs held back until later aren't counted."""
+        with self._lock: return len(self._jobs) - self._busy - len(self._delayed), self._busy
+
+    def delayed(self):
+        """Number of jobs held back until a not_before time."""
+        with self._lock: return len(self._delayed)
+
+    def __len__(self):
+        with self._lock: return len(self._jobs)
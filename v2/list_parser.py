@@ -0,0 +1,168 @@
+import logging
+import re
+from functools import lru_cache
+
+from parser_backend import get_backend
+
+# Kept free of Qt and of any scraper state so it can run in a ProcessPoolExecutor.
+
+BASE_URL = "https://www.monthly-mansion.com"
+
+
+@lru_cache(maxsize=None)
+def _backend(name):
+    return get_backend(name)
+
+
+def extract_list_page(raw_bytes, page=0, backend_name="auto"):
+    """Parses one search result page.
+
+    Returns (box_count, listings) where listings holds one dict of Listing constructor
+    arguments per valid box. box_count also counts malformed boxes; the crawl relies on
+    it to tell an empty result page from a page of bad listings.
+    """
+    boxes = _backend(backend_name).parse(raw_bytes).select('.listArea .box')
+    listings = []
+    for idx, box in enumerate(boxes):
+        try:
+            fields = _parse_box(box, page, idx)
+        except Exception as e:
+            logging.error(f"[p{page}][#{idx}] Exception processing box: {e!r}", exc_info=True)
+            continue
+        if fields is not None:
+            listings.append(fields)
+    return len(boxes), listings
+
+
+def parse_list_page(raw_bytes, page=0, backend_name="auto"):
+    """Parses one search result page into a list of Listing field dicts (see extract_list_page)."""
+    return extract_list_page(raw_bytes, page, backend_name)[1]
+
+
+def _parse_box(box, page, idx):
+    """Extracts the Listing fields from one '.listArea .box' node, or returns None if the box is malformed."""
+    title_tag = box.select_one('.th02 a')
+    if not title_tag or title_tag.attr('href') is None:
+        logging.warning(f"[p{page}][#{idx}] Title tag or href not found. Skipping.")
+        return None
+    link  = BASE_URL + title_tag.attr('href')
+    title = title_tag.text()
+
+    detail_table_el = box.select_one('.detail table')
+    if not detail_table_el:
+        logging.warning(f"[p{page}][#{idx}] Detail table not found for '{title}'. Skipping.")
+        return None
+
+    # Initialize with defaults for critical fields
+    data = {} # Still populate for less critical or unexpected fields
+    addr_val = ''
+    stations_val = ''
+    area_str_val = '0' # Keep as string initially
+    layout_val = 'N/A'
+    build_val = ''
+    pay_method_val = ''
+
+    for tr_detail in detail_table_el.select('tr'):
+        th_tag = tr_detail.select_one('th')
+        td_tag = tr_detail.select_one('td')
+        if th_tag and td_tag:
+            k = th_tag.text()
+            v = td_tag.text(" / ")
+            data[k] = v # Populate data dict for general access
+
+            # Direct assignment for critical known fields
+            if k == '住所':
+                addr_val = v
+            elif k == '最寄り駅':
+                stations_val = v
+            elif k == '面積':
+                area_str_val = v
+            elif k in ['間取', '間取り', 'タイプ']:
+                layout_val = v
+            elif k == '築年月':
+                build_val = v
+            elif 'お支払い方法' in k:
+                pay_method_val = v
+
+    # Process directly extracted critical values
+    area_s = area_str_val.replace('m²','').strip().rstrip('〜')
+    try:
+        area = float(area_s) if area_s else 0.0
+    except ValueError:
+        logging.warning(f"[p{page}][#{idx}] Bad area value '{area_s}' for '{title}'. Skipping.")
+        return None
+    if area == 0.0 and area_str_val != '0': # Only skip if truly zero and not default
+        logging.warning(f"[p{page}][#{idx}] Area is 0 for '{title}' (original: '{area_str_val}'). Skipping.")
+        return None
+
+    # Use directly assigned values
+    addr = addr_val
+    stations = stations_val
+    layout = layout_val
+    build = build_val
+    pay_method = pay_method_val
+
+    rent_tbl = box.select_one('.rent table')
+    if not rent_tbl:
+        logging.warning(f"[p{page}][#{idx}] Rent table not found for '{title}'. Skipping.")
+        return None
+
+    row_m = rent_tbl.select_one('tr.m')
+    row_s = rent_tbl.select_one('tr.s')
+    row_generic = None
+    if not (row_m or row_s):
+         candidate_rows = rent_tbl.select('tr')
+         # Check if the first row looks like a header-value pair for rent
+         if candidate_rows and candidate_rows[0].select_one('th'):
+            row_generic = candidate_rows[0]
+
+    target_row = row_m or row_s or row_generic
+    if not target_row:
+        logging.warning(f"[p{page}][#{idx}] No m, s, or generic rent row for '{title}'. Skipping.")
+        return None
+
+    cols = target_row.select('td')
+    if len(cols) < 1:
+        logging.warning(f"[p{page}][#{idx}] Not enough columns in rent row for '{title}'. Skipping.")
+        return None
+
+    rent_txt = cols[0].text(" ").replace('〜','')
+    m = re.search(r'([\d,]+)円/月', rent_txt)
+    rent_val = None
+    if not m:
+        m_fallback = re.search(r'([\d,]+)円', rent_txt)
+        if m_fallback:
+            rent_val_str = m_fallback.group(1).replace(',','')
+            try:
+                 potential_rent = int(rent_val_str)
+                 if potential_rent > 20000: # heuristic check
+                      rent_val = potential_rent
+                      logging.debug(f"Used fallback rent parsing (no /月) for {title}: {rent_txt}")
+                 else:
+                      logging.warning(f"[p{page}][#{idx}] Rent parse (円/月 not found, fallback value {rent_val_str} too low): '{rent_txt}' for '{title}'. Skipping.")
+                      return None
+            except ValueError:
+                  logging.warning(f"[p{page}][#{idx}] Rent parse failed converting fallback '{rent_val_str}': '{rent_txt}' for '{title}'. Skipping.")
+                  return None
+        else:
+            logging.warning(f"[p{page}][#{idx}] Monthly rent parse fail (no 円/月 or 円): '{rent_txt}' for '{title}'. Skipping.")
+            return None
+    else:
+         try:
+            rent_val = int(m.group(1).replace(',',''))
+         except ValueError:
+            logging.warning(f"[p{page}][#{idx}] Rent parse failed converting '{m.group(1)}': '{rent_txt}' for '{title}'. Skipping.")
+            return None
+
+    if rent_val is None: # backup
+        logging.warning(f"[p{page}][#{idx}] Rent value ended up None after parsing: '{rent_txt}' for '{title}'. Skipping.")
+        return None
+
+    utils = cols[1].text() if len(cols) > 1 else "N/A"
+    clean = cols[2].text() if len(cols) > 2 else "N/A"
+
+    return {
+        "title": title, "link": link, "address": addr, "stations": stations, "area": area,
+        "layout": layout, "build": build, "pay_methods": pay_method,
+        "middle_rent": rent_val, "utilities": utils, "cleaning": clean,
+    }
@@ -1,9 +1,51 @@
 import logging
 import re
+import sys
 from datetime import datetime 
+from functools import lru_cache
+
+# Photo URLs on the site are stored without this prefix, see Listing.photo_urls
+PHOTO_URL_BASE = "https://www.monthly-mansion.com/"
+_NL_PHOTO_URL_BASE = "\n" + PHOTO_URL_BASE
+
+SHARED_APPLIANCE_LISTS = 4096 # distinct appliance lists kept for sharing, least recently used dropped first
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+@lru_cache(maxsize=SHARED_APPLIANCE_LISTS)
+def _shared_appliance_tuple(items):
+    return tuple(_intern(a) for a in items)
+
+
+def _shared_appliances(appliances):
+    return _shared_appliance_tuple(tuple(appliances))
+
+
+def clear_shared_values():
+    """Forgets the appliance lists kept for sharing, e.g. once all listings are dropped."""
+    _shared_appliance_tuple.cache_clear()
+
 
 class Listing:
-    """Represents a single property listing."""
+    """Represents a single property listing.
+
+    Slots instead of a __dict__ keep hundreds of thousands of listings small: the strings
+    that repeat across listings (layout, pay methods, fees, fetch status) are interned,
+    identical appliance lists share one tuple and the photo URLs are kept as one string. appliances and photo_urls still read and assign as lists.
+    """
+    __slots__ = ("title", "link", "address", "stations", "area", "layout", "build", "build_year", "date_added",
+                 "pay_methods", "middle_rent", "utilities", "cleaning", "_appliances", "remarks", "_photo_urls",
+                 "ppm2", "is_fav", "is_viewed", "details_fetched", "fetch_status", "detail_fetch_error_message",
+                 "latitude", "longitude", "detail_digest", "detail_attempts", "detail_retry_at")
+    # The keys of to_dict(), in order; to_row() / from_row() use the same order without the keys
+    CACHE_FIELDS = ("title", "link", "address", "stations", "area", "layout", "build", "build_year", "date_added",
+                    "pay_methods", "middle_rent", "utilities", "cleaning", "appliances", "remarks", "photo_urls",
+                    "ppm2", "is_fav", "is_viewed", "details_fetched", "fetch_status", "detail_fetch_error_message",
+                    "latitude", "longitude", "detail_digest", "detail_attempts", "detail_retry_at")
+
     def __init__(self, title, link, address, stations, area, layout, build,
                  pay_methods, middle_rent, utilities, cleaning,
                  appliances=None, remarks=None, photo_urls=None): 
@@ -13,17 +55,17 @@ class Listing:
         self.address      = address
         self.stations     = stations
         self.area         = float(area) if area else 0.0
-        self.layout       = layout
+        self.layout       = _intern(layout)
         self.build        = build 
-        self.pay_methods  = pay_methods
+        self.pay_methods  = _intern(pay_methods)
         try:
             self.middle_rent = int(middle_rent) if middle_rent is not None else 0
         except (ValueError, TypeError):
              logging.warning(f"Could not convert middle_rent '{middle_rent}' to int for {link}. Setting to 0.")
              self.middle_rent = 0
 
-        self.utilities    = utilities
-        self.cleaning     = cleaning
+        self.utilities    = _intern(utilities)
+        self.cleaning     = _intern(cleaning)
         self.appliances   = appliances if appliances is not None else []
         self.remarks      = remarks if remarks is not None else ""
         self.photo_urls   = photo_urls if photo_urls is not None else []
@@ -37,11 +79,33 @@ class Listing:
         self.detail_fetch_error_message = ""
         self.latitude = None
         self.longitude = None
-
+        self.detail_digest = None # detail_parser.detail_digest of the page the details were parsed from
+        self.detail_attempts = 0 # failed detail fetches since the last success
+        self.detail_retry_at = None # time.time() of the next automatic retry, None if none is scheduled
 
         self.build_year = self._parse_build_year(build)
         self.date_added = datetime.now() 
 
+    @property
+    def appliances(self):
+        return list(self._appliances)
+
+    @appliances.setter
+    def appliances(self, appliances):
+        self._appliances = _shared_appliances(appliances)
+
+    @property
+    def photo_urls(self):
+        """The photo URLs as a new list; assign a list to change them."""
+        if self._photo_urls is None: return []
+        return ("\n" + self._photo_urls).replace("\n~", _NL_PHOTO_URL_BASE)[1:].split("\n")
+
+    @photo_urls.setter
+    def photo_urls(self, photo_urls):
+        # One newline separated string with the site's own prefix shortened to "~" (URLs can't contain newlines);
+        # None for no photos, so [""] still reads back as [""]
+        self._photo_urls = ("\n" + "\n".join(photo_urls)).replace(_NL_PHOTO_URL_BASE, "\n~")[1:] if photo_urls else None
+
     #find build year
     def _parse_build_year(self, build_str):
         """Attempts to parse the year from the Japanese build date string."""
@@ -86,8 +150,33 @@ class Listing:
             "detail_fetch_error_message": self.detail_fetch_error_message,
             "latitude": float(self.latitude) if self.latitude is not None else None,
             "longitude": float(self.longitude) if self.longitude is not None else None,
+            "detail_digest": self.detail_digest,
+            "detail_attempts": self.detail_attempts,
+            "detail_retry_at": self.detail_retry_at,
         }
 
+    def to_row(self):
+        """The fields of to_dict() as a list in CACHE_FIELDS order, for the compact cache formats."""
+        return [self.title, self.link, self.address, self.stations, self.area, self.layout, self.build, self.build_year,
+                self.date_added.isoformat() if self.date_added else None, self.pay_methods, self.middle_rent,
+                self.utilities, self.cleaning, self.appliances, self.remarks, self.photo_urls, self.ppm2,
+                self.is_fav, self.is_viewed, self.details_fetched, self.fetch_status, self.detail_fetch_error_message,
+                self.latitude, self.longitude, self.detail_digest, self.detail_attempts, self.detail_retry_at]
+
+    @staticmethod
+    def from_row(row):
+        """Builds a Listing from a to_row() list as is, skipping the conversions and the build year parsing
+        of __init__ / from_dict. Only for cache files this program wrote."""
+        l = Listing.__new__(Listing)
+        (l.title, l.link, l.address, l.stations, l.area, l.layout, l.build, l.build_year, date_added_iso,
+         l.pay_methods, l.middle_rent, l.utilities, l.cleaning, l.appliances, l.remarks, l.photo_urls, l.ppm2,
+         l.is_fav, l.is_viewed, l.details_fetched, l.fetch_status, l.detail_fetch_error_message,
+         l.latitude, l.longitude, l.detail_digest, l.detail_attempts, l.detail_retry_at) = row
+        l.layout = _intern(l.layout); l.pay_methods = _intern(l.pay_methods)
+        l.utilities = _intern(l.utilities); l.cleaning = _intern(l.cleaning); l.fetch_status = _intern(l.fetch_status)
+        l.date_added = datetime.fromisoformat(date_added_iso) if date_added_iso else datetime.now()
+        return l
+
     @staticmethod
     def from_dict(d):
         try:
@@ -103,10 +192,13 @@ class Listing:
             l.is_fav = d.get("is_fav", False)
             l.is_viewed = d.get("is_viewed", False) 
             l.details_fetched = d.get("details_fetched", False)
-            l.fetch_status = d.get("fetch_status", "Pending Details" if not l.details_fetched else "Details OK")
+            l.fetch_status = _intern(d.get("fetch_status", "Pending Details" if not l.details_fetched else "Details OK"))
             l.detail_fetch_error_message = d.get("detail_fetch_error_message", "")
             l.latitude = d.get("latitude")
             l.longitude = d.get("longitude")
+            l.detail_digest = d.get("detail_digest")
+            l.detail_attempts = d.get("detail_attempts", 0)
+            l.detail_retry_at = d.get("detail_retry_at")
             l.build_year = d.get("build_year", l._parse_build_year(build_str)) 
             date_added_iso = d.get("date_added")
             if date_added_iso:
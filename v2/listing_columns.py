@@ -0,0 +1,202 @@
+import threading
+from collections.abc import Sequence
+from datetime import datetime
+
+import numpy as np
+
+# One float64 array per column, NaN where the listing's value is None
+COLUMNS = ("rent", "area", "ppm2", "build_year", "date_added", "latitude", "longitude")
+RENT, AREA = COLUMNS.index("rent"), COLUMNS.index("area")
+INITIAL_CAPACITY = 1024
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _row_values(l):
+    return (l.middle_rent, l.area, l.ppm2, l.build_year,
+            (l.date_added - _EPOCH).total_seconds() if l.date_added else None, l.latitude, l.longitude)
+
+
+class ListingSelection(Sequence):
+    """The listings at some rows of a ListingColumns, as a read-only sequence.
+
+    Listings are looked up when indexed, so a selection of 100k listings costs no list of
+    100k references. mask (the selected rows, unordered) and generation let
+    ListingColumns.stats() reuse the selection.
+    """
+
+    def __init__(self, listings, row_of, rows, mask, generation):
+        self._listings = listings # the columns' listing array when selected, not written for these rows again
+        self._row_of = row_of
+        self.rows = rows
+        self.mask = mask
+        self.generation = generation
+
+    def __len__(self): return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice): return self._listings[self.rows[index]].tolist()
+        return self._listings[self.rows[index]]
+
+    def __iter__(self): return iter(self._listings[self.rows].tolist())
+
+    def index(self, listing, start=0, stop=None):
+        row = self._row_of.get(listing.link)
+        positions = np.flatnonzero(self.rows == row) if row is not None else ()
+        for position in positions:
+            if (stop is None or position < stop) and position >= start and self[position] is listing: return int(position)
+        raise ValueError(f"{listing.link} is not in the selection")
+
+
+class ListingColumns:
+    """The numeric fields of the listings as NumPy columns, one row per listing, for filtering,
+    sorting and statistics without a Python loop over every listing.
+
+    Rows follow the order listings were added in, like all_listings_map, and are never
+    removed, only all cleared. update() writes a listing's current values to its row (or adds
+    one); ListingStore calls it from _persist_changes, which every change already goes
+    through. Row numbers returned by select() are valid while generation is unchanged.
+    The sort order of each column is kept until a value in that column changes, so a new
+    min area or max rent only has to mask the cached order.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generation = 0
+        self._reset(INITIAL_CAPACITY)
+
+    def _reset(self, capacity):
+        self.generation += 1
+        self._count = 0
+        self._row_of = {} # link -> row
+        self._layout_codes = {} # layout -> index into layout_names
+        self.layout_names = []
+        self._listings = np.empty(capacity, dtype=object)
+        self._values = np.full((len(COLUMNS), capacity), np.nan)
+        self._is_fav = np.zeros(capacity, dtype=bool)
+        self._layout = np.zeros(capacity, dtype=np.int32)
+        self._column_versions = [0] * len(COLUMNS) # bumped when a value in the column changes
+        self._orders = {} # (column index, reverse) -> (column version, rows in sort order)
+
+    def __len__(self): return self._count
+
+    def clear(self):
+        with self._lock: self._reset(INITIAL_CAPACITY)
+
+    def rebuild(self, listings):
+        """Replaces all rows with the given listings, in order."""
+        listings = list(listings)
+        with self._lock:
+            self._reset(max(INITIAL_CAPACITY, len(listings)))
+            self._append_locked(listings)
+
+    def update(self, listings):
+        """Writes the current values of the listings to their rows, adding rows for new links."""
+        with self._lock:
+            new = []
+            for l in listings:
+                row = self._row_of.get(l.link)
+                if row is None: new.append(l)
+                else: self._write_row_locked(row, l)
+            if new: self._append_locked(new)
+
+    def _append_locked(self, listings):
+        fresh = []
+        for l in listings:
+            row = self._row_of.get(l.link)
+            if row is not None:
+                if row < self._count: self._write_row_locked(row, l)
+                else: fresh[row - self._count] = l # the same link twice in one batch, the last one wins
+                continue
+            self._row_of[l.link] = self._count + len(fresh)
+            fresh.append(l)
+        if not fresh: return
+        start, end = self._count, self._count + len(fresh)
+        self._reserve_locked(end)
+        self._values[:, start:end] = np.array([_row_values(l) for l in fresh], dtype=float).T
+        self._is_fav[start:end] = [bool(l.is_fav) for l in fresh]
+        self._layout[start:end] = [self._layout_code(l.layout) for l in fresh]
+        self._listings[start:end] = fresh
+        self._count = end
+        self._column_versions = [v + 1 for v in self._column_versions]
+
+    def _write_row_locked(self, row, l):
+        values = np.array(_row_values(l), dtype=float)
+        old = self._values[:, row]
+        for column in np.flatnonzero((old != values) & ~(np.isnan(old) & np.isnan(values))): self._column_versions[column] += 1
+        self._values[:, row] = values
+        self._is_fav[row] = bool(l.is_fav)
+        self._layout[row] = self._layout_code(l.layout)
+        self._listings[row] = l
+
+    def _layout_code(self, layout):
+        code = self._layout_codes.get(layout)
+        if code is None:
+            code = self._layout_codes[layout] = len(self.layout_names)
+            self.layout_names.append(layout)
+        return code
+
+    def _reserve_locked(self, size):
+        capacity = len(self._listings)
+        if size <= capacity: return
+        while capacity < size: capacity *= 2
+        listings = np.empty(capacity, dtype=object); listings[:self._count] = self._listings[:self._count]
+        values = np.full((len(COLUMNS), capacity), np.nan); values[:, :self._count] = self._values[:, :self._count]
+        is_fav = np.zeros(capacity, dtype=bool); is_fav[:self._count] = self._is_fav[:self._count]
+        layout = np.zeros(capacity, dtype=np.int32); layout[:self._count] = self._layout[:self._count]
+        self._listings, self._values, self._is_fav, self._layout = listings, values, is_fav, layout
+
+    def select(self, min_area=0, max_rent=0, sort_column=None, reverse=False):
+        """Returns a ListingSelection of the listings with a rent and an area, area >= min_area
+        and rent <= max_rent (0 = no limit), ordered by sort_column.
+
+        Equal values keep their row order in both directions and missing values go last,
+        as the list.sort() this replaces did.
+        """
+        with self._lock:
+            n = self._count
+            rent, area = self._values[RENT, :n], self._values[AREA, :n]
+            mask = ~(np.isnan(rent) | np.isnan(area))
+            if min_area > 0: mask &= area >= min_area
+            if max_rent > 0: mask &= rent <= max_rent
+            if sort_column is None: rows = np.flatnonzero(mask)
+            else:
+                order = self._sort_order_locked(COLUMNS.index(sort_column), reverse)
+                rows = order[mask[order]]
+            return ListingSelection(self._listings, self._row_of, rows, mask, self.generation)
+
+    def _sort_order_locked(self, column, reverse):
+        version = self._column_versions[column]
+        cached = self._orders.get((column, reverse))
+        if cached is not None and cached[0] == version: return cached[1]
+        keys = self._values[column, :self._count]
+        keys = -keys if reverse else keys.copy()
+        keys[np.isnan(keys)] = np.inf
+        order = np.argsort(keys, kind='stable')
+        self._orders[(column, reverse)] = (version, order)
+        return order
+
+    def mask_for(self, listings):
+        """A mask of the rows of the given listings, skipping any that have none."""
+        with self._lock:
+            mask = np.zeros(self._count, dtype=bool)
+            rows = [self._row_of.get(l.link) for l in listings]
+        mask[[row for row in rows if row is not None]] = True
+        return mask
+
+    def stats(self, mask):
+        """Average rent, average area (of areas > 0) and layout counts over the rows in mask."""
+        with self._lock:
+            n = len(mask)
+            rent = self._values[RENT, :n][mask]; area = self._values[AREA, :n][mask]
+            counts = np.bincount(self._layout[:n][mask], minlength=len(self.layout_names))
+            names = list(self.layout_names)
+        rent = rent[~np.isnan(rent)]; area = area[area > 0]
+        return {"avg_rent": float(rent.mean()) if rent.size else None,
+                "avg_area": float(area.mean()) if area.size else None,
+                "layout_counts": {names[code]: int(count) for code, count in enumerate(counts) if count}}
+
+    def favourites(self):
+        with self._lock: return self._listings[np.flatnonzero(self._is_fav[:self._count])].tolist()
+
+    def fav_count(self):
+        with self._lock: return int(np.count_nonzero(self._is_fav[:self._count]))
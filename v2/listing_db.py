@@ -0,0 +1,96 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+LISTINGS_DB_FILE = "listings.db"
+DB_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+SCHEMA_VERSION = 1
+READ_BATCH = 1000
+
+
+def is_db_file(path):
+    """True if path names an SQLite listings database rather than a JSON cache file."""
+    return path.lower().endswith(DB_EXTENSIONS)
+
+
+class ListingDatabase:
+    """SQLite storage for the listings, one row per listing, written as listings change.
+
+    Each row holds Listing.to_dict() as JSON next to the columns that change on their own
+    (favourite, viewed, fetch state), so upserts are cheap and a crash loses nothing that
+    was already written. The database runs in WAL mode: the cache loader reads on its own
+    connection while workers and the GUI write. Rows come back in insertion order, like
+    the JSON cache file, which import_json / export_json read and write.
+    """
+
+    def __init__(self, path=LISTINGS_DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL") # WAL keeps committed rows across crashes, fsync on checkpoint
+        with self._conn:
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS listings (
+                link TEXT PRIMARY KEY,
+                is_fav INTEGER NOT NULL DEFAULT 0,
+                is_viewed INTEGER NOT NULL DEFAULT 0,
+                details_fetched INTEGER NOT NULL DEFAULT 0,
+                fetch_status TEXT,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL)""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS listings_fav ON listings(is_fav) WHERE is_fav")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def upsert(self, listing_dicts):
+        """Inserts or replaces the given Listing.to_dict() rows in one transaction."""
+        now = time.time()
+        rows = [(d["link"], int(bool(d.get("is_fav"))), int(bool(d.get("is_viewed"))), int(bool(d.get("details_fetched"))),
+                 d.get("fetch_status"), json.dumps(d, ensure_ascii=False), now) for d in listing_dicts]
+        if not rows: return
+        with self._lock, self._conn:
+            self._conn.executemany("""INSERT INTO listings (link, is_fav, is_viewed, details_fetched, fetch_status, data, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(link) DO UPDATE SET is_fav = excluded.is_fav, is_viewed = excluded.is_viewed,
+                    details_fetched = excluded.details_fetched, fetch_status = excluded.fetch_status,
+                    data = excluded.data, updated_at = excluded.updated_at""", rows)
+
+    def iter_dicts(self):
+        """Yields every stored listing dict in insertion order, reading on a separate connection."""
+        conn = sqlite3.connect(self.path)
+        try:
+            cursor = conn.execute("SELECT data FROM listings ORDER BY rowid")
+            while True:
+                rows = cursor.fetchmany(READ_BATCH)
+                if not rows: return
+                for (data,) in rows: yield json.loads(data)
+        finally: conn.close()
+
+    def count(self):
+        with self._lock: return self._conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+    def clear(self):
+        with self._lock, self._conn: self._conn.execute("DELETE FROM listings")
+
+    def checkpoint(self):
+        """Folds the WAL back into the database file."""
+        with self._lock: self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def import_json(self, json_path):
+        """Upserts the listings of a JSON cache file. Returns how many were imported."""
+        with open(json_path, 'r', encoding='utf-8') as f: data = json.load(f)
+        listing_dicts = [d for d in data if isinstance(d, dict) and d.get("link")] if isinstance(data, list) else []
+        self.upsert(listing_dicts)
+        logging.info(f"Imported {len(listing_dicts)} listings from {json_path} into {self.path}")
+        return len(listing_dicts)
+
+    def export_json(self, json_path):
+        """Writes every listing to a JSON cache file in the format save_listings_cache uses. Returns the count."""
+        listing_dicts = list(self.iter_dicts())
+        with open(json_path, 'w', encoding='utf-8') as f: json.dump(listing_dicts, f, ensure_ascii=False, indent=2)
+        logging.info(f"Exported {len(listing_dicts)} listings from {self.path} to {json_path}")
+        return len(listing_dicts)
+
+    def close(self):
+        with self._lock: self._conn.close()
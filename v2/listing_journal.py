@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+import threading
+
+JOURNAL_SUFFIX = ".journal"
+ROTATED_SUFFIX = ".compacting"
+
+
+class ListingJournal:
+    """Append-only log of listing changes kept next to a JSON listings cache file.
+
+    Every change is one line holding the listing's full Listing.to_dict(), so replaying
+    is "last line per link wins" and a torn last line after a crash is simply skipped.
+    Compaction rotates the journal away (rotate()), writes a new cache file from memory and
+    then deletes the rotated part (discard_rotated()); changes made meanwhile go to a fresh
+    journal. If compaction dies half way, replay() reads the rotated part too.
+    """
+
+    def __init__(self, cache_file):
+        self.path = cache_file + JOURNAL_SUFFIX
+        self.rotated_path = self.path + ROTATED_SUFFIX
+        self._lock = threading.Lock()
+        self._file = None
+        self._bytes = self._size(self.path)
+
+    def _size(self, path):
+        try: return os.path.getsize(path)
+        except OSError: return 0
+
+    def append(self, listing_dicts):
+        data = "".join(json.dumps(d, ensure_ascii=False) + "\n" for d in listing_dicts)
+        if not data: return
+        with self._lock:
+            if self._file is None: self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(data)
+            self._file.flush()
+            self._bytes += len(data.encode('utf-8'))
+
+    def pending_bytes(self):
+        """Size of the journal written since the last compaction started."""
+        return self._bytes
+
+    def has_entries(self):
+        return self._bytes > 0 or self._size(self.rotated_path) > 0
+
+    def replay(self):
+        """The journaled listings as {link: listing dict}, the latest entry per link."""
+        listings, skipped = {}, 0
+        for path in (self.rotated_path, self.path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try: listing_dict = json.loads(line)
+                        except ValueError: skipped += 1; continue
+                        if isinstance(listing_dict, dict) and listing_dict.get("link"): listings[listing_dict["link"]] = listing_dict
+            except FileNotFoundError: pass
+        if skipped: logging.warning(f"Skipped {skipped} unreadable lines in {self.path}")
+        return listings
+
+    def rotate(self):
+        """Moves the current entries aside for a compaction; later appends start a new journal."""
+        with self._lock:
+            self._close_locked()
+            if not os.path.exists(self.path): return
+            if os.path.exists(self.rotated_path):
+                # An earlier compaction didn't finish: keep its entries in front of the new ones
+                with open(self.path, 'r', encoding='utf-8') as src, open(self.rotated_path, 'a', encoding='utf-8') as dst: dst.write(src.read())
+                os.remove(self.path)
+            else: os.replace(self.path, self.rotated_path)
+            self._bytes = 0
+
+    def discard_rotated(self):
+        """Deletes the rotated entries once a cache file containing them has been written."""
+        with self._lock:
+            try: os.remove(self.rotated_path)
+            except FileNotFoundError: pass
+
+    def clear(self):
+        with self._lock:
+            self._close_locked()
+            for path in (self.path, self.rotated_path):
+                try: os.remove(path)
+                except FileNotFoundError: pass
+            self._bytes = 0
+
+    def _close_locked(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock: self._close_locked()
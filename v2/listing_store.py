@@ -0,0 +1,803 @@
+import threading
+import logging
+import gc
+import json
+import os
+import requests
+import random
+import re
+import time 
+from contextlib import contextmanager
+
+from listing import Listing, clear_shared_values
+from parser_backend import get_backend
+from rate_limiter import get_shared_limiter, is_throttle_status
+from async_engine import AIOHTTP_AVAILABLE, AsyncDetailFetcher
+from signals import Signal
+from job_queue import JobQueue, QUEUED
+from image_store import IMAGE_CACHE_DIR, ImageStore
+from detail_parser import detail_digest, extract_detail_page
+from listing_db import LISTINGS_DB_FILE, ListingDatabase, is_db_file
+from listing_journal import ListingJournal
+from listing_columns import ListingColumns, ListingSelection
+import cache_format
+from cache_format import LISTINGS_JSONL_FILE, LISTINGS_MSGPACK_FILE, MSGPACK_AVAILABLE
+
+BASE_URL   = "https://www.monthly-mansion.com"
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.1.1 Safari/605.1.15',
+]
+MAX_DETAIL_THREADS = 5 
+MAX_PHOTO_THREADS = 4
+# photo_mode: download photos right after the detail page, or only on demand
+PHOTO_MODE_EAGER = "eager"
+PHOTO_MODE_LAZY = "lazy"
+# Detail queue priorities, lowest first
+PRIORITY_OPEN = 0        # listing shown in the detail pane / selected
+PRIORITY_FAVOURITE = 1
+PRIORITY_NORMAL = 2
+# Failed detail fetches are retried after DETAIL_RETRY_DELAY, doubling per attempt up to the max
+MAX_DETAIL_ATTEMPTS = 5
+DETAIL_RETRY_DELAY = 60
+DETAIL_RETRY_MAX_DELAY = 3600
+LISTINGS_CACHE_FILE = "listings_cache.json"
+# Sort box entries -> listing_columns column
+SORT_COLUMNS = {"Price": "rent", "Area": "area", "Price per m²": "ppm2", "Build Year": "build_year", "Date Added": "date_added"}
+# The background cache load hands over listings in chunks that double from the first size up to the max
+CACHE_LOAD_FIRST_CHUNK = 200
+CACHE_LOAD_MAX_CHUNK = 20000
+
+CACHE_READ_BLOCK = 1024 * 1024
+# The cache file's change journal is folded into a new cache file once it grows past
+# JOURNAL_COMPACT_BYTES, or on the first change JOURNAL_COMPACT_INTERVAL seconds after the last compaction
+JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024
+JOURNAL_COMPACT_INTERVAL = 600
+
+_JSON_WS_RE = re.compile(r'[ \t\n\r]*')
+
+
+def _replay_over_snapshot(snapshot, journal):
+    # The cache file is the last snapshot; journaled listings replace their snapshot entry, new ones follow
+    journaled = journal.replay()
+    for record in snapshot:
+        if isinstance(record, Listing): link = record.link
+        else: link = record.get("link") if isinstance(record, dict) else None
+        yield journaled.pop(link, record) if link else record
+    if journaled: logging.info(f"Replayed {len(journaled)} new listings from {journal.path}")
+    yield from journaled.values()
+
+
+def _iter_json_cache(json_path):
+    """Yields the listing dicts of a JSON cache file with the changes in its journal applied."""
+    journal = ListingJournal(json_path)
+    if not os.path.isfile(json_path):
+        yield from _replay_over_snapshot((), journal)
+        return
+    with open(json_path, 'r', encoding='utf-8') as f: yield from _replay_over_snapshot(_iter_json_array(f), journal)
+
+
+def _iter_json_array(f, block_size=CACHE_READ_BLOCK):
+    """Yields the items of the JSON array in text file f one at a time, reading it in blocks,
+    so the first items are ready before the rest of the file has been read."""
+    decoder = json.JSONDecoder()
+    buf = f.read(block_size); eof = not buf
+    pos = _JSON_WS_RE.match(buf).end()
+    if not buf.startswith('[', pos):
+        data = json.loads(buf + f.read())
+        if isinstance(data, list): yield from data
+        return
+    pos += 1
+    while True:
+        pos = _JSON_WS_RE.match(buf, pos).end()
+        try:
+            if pos == len(buf) and not eof: raise json.JSONDecodeError("need more data", buf, pos)
+            if buf.startswith(']', pos): return
+            item, end = decoder.raw_decode(buf, pos)
+            end = _JSON_WS_RE.match(buf, end).end()
+            if end == len(buf) and not eof: raise json.JSONDecodeError("need more data", buf, end)
+        except json.JSONDecodeError:
+            if eof: raise
+            more = f.read(block_size); eof = not more
+            buf = buf[pos:] + more; pos = 0
+            continue
+        yield item
+        if not buf.startswith(',', end): return
+        pos = end + 1
+
+
+@contextmanager
+def _gc_paused():
+    """Turns the cyclic garbage collector off while a cache file is read or written. The
+    listings have no reference cycles, but creating hundreds of thousands of them makes
+    it scan every live object again and again, which nearly doubles the load time."""
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try: yield
+    finally:
+        if was_enabled: gc.enable()
+
+
+class ListingStore:
+    """The known listings, their detail/photo fetching and the listings cache file, without Qt.
+
+    data_manager.DataManager is the Qt front end the GUI uses; cli.py uses this class directly.
+    """
+    listing_details_fetched = Signal()
+    listings_updated = Signal()
+    fetch_status_update = Signal()
+    listing_photos_fetched = Signal()
+    cache_chunk_loaded = Signal()
+    cache_loaded = Signal()
+
+    def __init__(self, parser_backend=None, http_cache=None, rate_limiter=None, fetch_engine="threads",
+                 cache_file=LISTINGS_CACHE_FILE, photo_mode=PHOTO_MODE_EAGER, image_store=None, load_cache=True):
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_shared_limiter()
+        self.parser_backend = parser_backend if parser_backend is not None else get_backend()
+        self.http_cache = http_cache # optional http_cache.HttpCache, lets unchanged detail pages skip re-parsing
+        self.targeted_detail_parsing = True # parse only the detail page regions we read, see detail_parser
+        self.cache_file = cache_file
+        # A .db / .sqlite cache_file is a listing_db.ListingDatabase, written row by row as listings change
+        self.listing_db = ListingDatabase(cache_file) if is_db_file(cache_file) else None
+        # A JSON or compact (cache_format) cache_file gets a listing_journal.ListingJournal of the changes since it was last written
+        self.listing_journal = ListingJournal(cache_file) if self.listing_db is None else None
+        self._compaction_lock = threading.Lock()
+        self._compactor = None
+        self._last_compaction = time.time()
+        self.image_store = image_store if image_store is not None else ImageStore()
+        self.all_listings_map = {}
+        # Numeric columns of all_listings_map for get_filtered_listings / calculate_statistics, see _synced_columns()
+        self.listing_columns = ListingColumns()
+        self.fetch_counters = {"detail_pages": 0, "not_modified": 0, "photos": 0, "photo_bytes": 0,
+                               "coalesced_queued": 0, "coalesced_in_flight": 0, "changed": 0, "unchanged": 0}
+        self._refresh_baseline = dict(self.fetch_counters)
+        self._counters_lock = threading.Lock()
+        # Detail pages and photos are two stages, each a JobQueue drained by its own fixed pool
+        # (threads, or the async fetcher's slots). Detail jobs are keyed by link, photo jobs by
+        # URL, so a request for something already queued or in flight joins the existing job.
+        self._detail_jobs = JobQueue()
+        self._detail_workers = []
+        self.photo_mode = photo_mode # PHOTO_MODE_LAZY: photos only for opened, favourited or prefetched listings
+        self._photo_jobs = JobQueue()
+        self._photo_workers = []
+        self._photo_pending = {} # link -> photo jobs still to finish
+        self._photo_pending_lock = threading.Lock()
+        self.detail_fetch_stop_event = threading.Event()
+        self.async_fetcher = None # fetch_engine="asyncio": details and photos run on one event loop instead of a thread per listing
+        if fetch_engine == "asyncio":
+            if AIOHTTP_AVAILABLE: self.async_fetcher = AsyncDetailFetcher(self)
+            else: logging.warning("aiohttp is not installed. Falling back to threaded detail fetching.")
+        # load_cache=False leaves loading to the owner, e.g. load_listings_cache_in_background()
+        self._cache_loader = None
+        self._cache_load_lock = threading.Lock()
+        self._loaded_chunks = [] # read by the loader, not yet merged into all_listings_map
+        self._cache_loading = self._cache_load_done = False
+        self.cache_chunk_loaded.connect(self.merge_loaded_listings)
+        if load_cache: self.load_listings_cache() 
+
+    def _get_headers(self):
+        return {'User-Agent': random.choice(USER_AGENTS)}
+
+    def add_or_update_listing(self, basic_listing: Listing, recheck_details: bool):
+        listing_to_fetch = self._upsert_listing(basic_listing, recheck_details)
+        self._persist_changes([self.all_listings_map[basic_listing.link]])
+        if listing_to_fetch: self._queue_detail_fetches([listing_to_fetch])
+        self.listings_updated.emit()
+
+    def add_or_update_listings(self, batch, recheck_details: bool):
+        """Bulk version of add_or_update_listing: one upsert pass, one detail-queue push and one listings_updated."""
+        listings_to_fetch = []
+        for basic_listing in batch:
+            listing_to_fetch = self._upsert_listing(basic_listing, recheck_details)
+            if listing_to_fetch: listings_to_fetch.append(listing_to_fetch)
+        self._persist_changes([self.all_listings_map[basic_listing.link] for basic_listing in batch])
+        if listings_to_fetch: self._queue_detail_fetches(listings_to_fetch)
+        logging.debug(f"Upserted batch of {len(batch)} listings, {len(listings_to_fetch)} queued for details.")
+        self.listings_updated.emit()
+
+    def _upsert_listing(self, basic_listing: Listing, recheck_details: bool):
+        """Merges a freshly scraped listing into the map. Returns the stored listing if it needs a detail fetch."""
+        existing_listing = self.all_listings_map.get(basic_listing.link)
+        needs_detail_fetch = False
+        is_new = False 
+
+        if existing_listing:
+            original_date_added = existing_listing.date_added
+            original_is_viewed = existing_listing.is_viewed
+
+            existing_listing.title = basic_listing.title; existing_listing.address = basic_listing.address
+            existing_listing.stations = basic_listing.stations; existing_listing.area = basic_listing.area
+            existing_listing.layout = basic_listing.layout; existing_listing.build = basic_listing.build
+            existing_listing.build_year = existing_listing._parse_build_year(basic_listing.build)
+            existing_listing.pay_methods = basic_listing.pay_methods; existing_listing.middle_rent = basic_listing.middle_rent
+            existing_listing.utilities = basic_listing.utilities; existing_listing.cleaning = basic_listing.cleaning
+            existing_listing.ppm2 = basic_listing.ppm2
+
+            existing_listing.date_added = original_date_added; existing_listing.is_viewed = original_is_viewed
+
+            if not existing_listing.details_fetched or recheck_details: needs_detail_fetch = True
+            listing_to_process = existing_listing
+            logging.debug(f"Updating existing listing: {basic_listing.link}")
+        else:
+            self.all_listings_map[basic_listing.link] = basic_listing
+            basic_listing.fetch_status = "Pending Details"
+            needs_detail_fetch = True
+            is_new = True
+            listing_to_process = basic_listing
+            logging.debug(f"Adding new listing: {basic_listing.link}")
+
+        if needs_detail_fetch:
+            if is_new or not listing_to_process.details_fetched or recheck_details:
+                 # A listing waiting for a retry joins the scheduled job and keeps its error status
+                 if listing_to_process.detail_retry_at is None: listing_to_process.fetch_status = "Pending Details"
+                 return listing_to_process
+        return None
+
+    def _queue_detail_fetches(self, listings, priority=None):
+        """Puts listings on the detail queue. priority defaults to favourites first, then the rest.
+
+        Listings with a retry scheduled (detail_retry_at) are held back until then.
+        """
+        self._ensure_detail_workers()
+        for listing in listings:
+            outcome = self._detail_jobs.put(listing.link, listing, self._detail_priority(listing, priority), not_before=listing.detail_retry_at)
+            if outcome != QUEUED: self._count(outcome)
+
+    def _detail_priority(self, listing, priority=None):
+        if priority is not None: return priority
+        return PRIORITY_FAVOURITE if listing.is_fav else PRIORITY_NORMAL
+
+    def resume_detail_queue(self):
+        """Queues the detail fetches saved with the listings: pending ones and failed ones waiting for a retry.
+
+        Not done while loading the cache, so the owner can connect to the fetch signals first.
+        Returns the number of listings queued.
+        """
+        listings = [l for l in self.all_listings_map.values() if l.fetch_status == "Pending Details" or l.detail_retry_at is not None]
+        if listings:
+            logging.info(f"Resuming {len(listings)} detail fetches from the listings cache.")
+            self.clear_detail_fetch_stop()
+            self._queue_detail_fetches(listings)
+        return len(listings)
+
+    def _detail_fetch_failed(self, listing, error, status_code=None):
+        """Marks a failed detail fetch. Network errors, throttling and server errors are retried with
+        exponential backoff until MAX_DETAIL_ATTEMPTS; other HTTP errors (e.g. 404) aren't.
+
+        Called by the worker holding the job, which goes back on the queue instead of finishing.
+        """
+        listing.fetch_status = "Detail Fetch Error"
+        listing.detail_attempts += 1
+        if (status_code is not None and not is_throttle_status(status_code)) or listing.detail_attempts >= MAX_DETAIL_ATTEMPTS:
+            listing.detail_retry_at = None
+            listing.detail_fetch_error_message = str(error)
+            return
+        delay = min(DETAIL_RETRY_DELAY * 2 ** (listing.detail_attempts - 1), DETAIL_RETRY_MAX_DELAY)
+        listing.detail_retry_at = time.time() + delay
+        listing.detail_fetch_error_message = f"{error} (attempt {listing.detail_attempts}/{MAX_DETAIL_ATTEMPTS}, retrying in {delay}s)"
+        self._detail_jobs.retry(listing.link, listing, self._detail_priority(listing), listing.detail_retry_at)
+
+    def prioritize_detail_fetch(self, listing_link, priority=PRIORITY_OPEN):
+        """Moves a queued listing ahead (e.g. the one just opened). Returns False if it isn't queued."""
+        listing = self.get_listing_by_link(listing_link)
+        return listing is not None and self._detail_jobs.prioritize(listing_link, listing, priority)
+
+    def _take_detail_job(self):
+        """Blocks until the next listing to fetch is available, marks it in flight and returns it.
+
+        Every job taken must be released with _finish_detail_job.
+        """
+        return self._detail_jobs.take()[1]
+
+    def _finish_detail_job(self, listing):
+        self._detail_jobs.finish(listing.link)
+
+    def _ensure_detail_workers(self):
+        if self._detail_workers: return
+        if self.async_fetcher:
+            self._detail_workers = [self.async_fetcher.start_feeder()]
+            return
+        for n in range(MAX_DETAIL_THREADS):
+            worker = threading.Thread(target=self._detail_worker, daemon=True, name=f"detail-worker-{n}")
+            worker.start()
+            self._detail_workers.append(worker)
+
+    def _detail_worker(self):
+        while True:
+            listing = self._take_detail_job()
+            try: self._fetch_listing_details_task(listing)
+            except Exception as e: logging.error(f"Detail worker error for {listing.link}: {e!r}", exc_info=True)
+            finally: self._finish_detail_job(listing)
+
+    def detail_queue_stats(self):
+        """Queue depth, worker usage, retries waiting and coalesced duplicate requests of the detail pool."""
+        queued, busy = self._detail_jobs.stats()
+        workers = self.async_fetcher.max_in_flight if self.async_fetcher else MAX_DETAIL_THREADS
+        with self._counters_lock: coalesced = self.fetch_counters["coalesced_queued"] + self.fetch_counters["coalesced_in_flight"]
+        return {"queued": queued, "busy": busy, "workers": workers, "retrying": self._detail_jobs.delayed(), "duplicates_avoided": coalesced}
+
+    def queue_photo_downloads(self, listing, priority=None):
+        """Queues the listing's photos that aren't on disk yet. Returns how many were queued."""
+        if not listing or not listing.photo_urls: return 0
+        if priority is None: priority = PRIORITY_FAVOURITE if listing.is_fav else PRIORITY_NORMAL
+        self._ensure_photo_workers()
+        missing = [url for url in listing.photo_urls if not self.image_store.contains(url)]
+        queued = 0
+        with self._photo_pending_lock:
+            for url in missing:
+                outcome = self._photo_jobs.put(url, listing, priority)
+                if outcome == QUEUED:
+                    self._photo_pending[listing.link] = self._photo_pending.get(listing.link, 0) + 1
+                    queued += 1
+        return queued
+
+    def prefetch_photos(self, listings, priority=PRIORITY_NORMAL):
+        """Explicit photo prefetch, e.g. for a lazy photo mode. Listings without details yet are skipped."""
+        return sum(self.queue_photo_downloads(l, priority) for l in listings if l.details_fetched)
+
+    def _wants_photos(self, listing):
+        return self.photo_mode == PHOTO_MODE_EAGER or listing.is_fav
+
+    def _ensure_photo_workers(self):
+        if self._photo_workers: return
+        if self.async_fetcher:
+            self._photo_workers = [self.async_fetcher.start_photo_feeder()]
+            return
+        for n in range(MAX_PHOTO_THREADS):
+            worker = threading.Thread(target=self._photo_worker, daemon=True, name=f"photo-worker-{n}")
+            worker.start()
+            self._photo_workers.append(worker)
+
+    def _photo_worker(self):
+        while True:
+            url, listing = self._photo_jobs.take()
+            try: self._download_photo(listing, url)
+            except Exception as e: logging.error(f"Photo worker error for {url}: {e!r}", exc_info=True)
+            finally: self._finish_photo_job(listing, url)
+
+    def _download_photo(self, listing, url):
+        if self.detail_fetch_stop_event.is_set() or self.image_store.contains(url): return
+        try:
+            img_resp = self._limited_get(url, self._get_headers(), timeout=15)
+            self.image_store.put(url, img_resp.content)
+            self._count("photos"); self._count("photo_bytes", len(img_resp.content))
+        except requests.exceptions.RequestException as img_e: logging.warning(f"Image download failed for {url}: {img_e!r}")
+        except InterruptedError: logging.info(f"Photo fetch interrupted for {listing.link}")
+
+    def _finish_photo_job(self, listing, url):
+        """Releases a photo job; emits listing_photos_fetched once the listing has none left."""
+        with self._photo_pending_lock:
+            self._photo_jobs.finish(url)
+            remaining = self._photo_pending.get(listing.link, 1) - 1
+            if remaining > 0: self._photo_pending[listing.link] = remaining
+            else: self._photo_pending.pop(listing.link, None)
+        if remaining <= 0: self.listing_photos_fetched.emit(listing)
+
+    def is_photo_pending(self, url):
+        return self._photo_jobs.is_registered(url)
+
+    def photo_queue_stats(self):
+        queued, busy = self._photo_jobs.stats()
+        workers = self.async_fetcher.max_photos_in_flight if self.async_fetcher else MAX_PHOTO_THREADS
+        return {"queued": queued, "busy": busy, "workers": workers}
+
+    def _limited_get(self, url, headers, timeout, use_cache=False):
+        """GET through the shared rate limiter (and the HTTP cache if asked). Raises InterruptedError if stopped while waiting."""
+        if not self.rate_limiter.acquire(self.detail_fetch_stop_event): raise InterruptedError("Stop event set while waiting for rate limiter")
+        try:
+            if use_cache and self.http_cache: resp = self.http_cache.get(url, headers=headers, timeout=timeout)
+            else: resp = requests.get(url, headers=headers, timeout=timeout)
+            resp.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            self.rate_limiter.record_response(e.response.status_code, e.response.headers.get('Retry-After')); raise
+        except requests.exceptions.RequestException:
+            self.rate_limiter.record_throttle(); raise
+        self.rate_limiter.record_success()
+        return resp
+
+    def _fetch_listing_details_task(self, listing: Listing):
+        if self.detail_fetch_stop_event.is_set():
+            logging.debug(f"Skipping detail fetch for {listing.link} as stop event is set.")
+            if listing.fetch_status != "Details OK":
+                 listing.fetch_status = "Detail Fetch Error"; listing.detail_fetch_error_message = "Operation stopped"
+                 self._persist_changes([listing])
+                 self.listing_details_fetched.emit(listing)
+            return
+
+        try:
+            logging.info(f"Fetching full details for: {listing.link}")
+            self.fetch_status_update.emit(f"Fetching details: {listing.title[:30]}...")
+            headers = self._get_headers()
+            resp = self._limited_get(listing.link, headers, timeout=25, use_cache=True)
+            self._process_detail_page(listing, resp)
+            listing.details_fetched = True; listing.fetch_status = "Details OK"; listing.detail_fetch_error_message = ""
+            listing.detail_attempts = 0; listing.detail_retry_at = None
+
+        except InterruptedError: listing.fetch_status = "Detail Fetch Error"; listing.detail_fetch_error_message = "Operation stopped"
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"Net error details {listing.link}: {e!r}")
+            self._detail_fetch_failed(listing, e, e.response.status_code if e.response is not None else None)
+        except Exception as e: logging.error(f"Error parsing details {listing.link}: {e!r}", exc_info=True); listing.fetch_status = "Detail Parse Error"; listing.detail_fetch_error_message = str(e)
+        finally: self._persist_changes([listing]); self.fetch_status_update.emit(""); self.listing_details_fetched.emit(listing)
+
+    def _persist_changes(self, listings):
+        """Writes changed listings through to the listings database, or appends them to the JSON cache's journal.
+
+        The JSON cache file itself is only rewritten by compact_listings_journal(), started
+        on a background thread here once the journal is big or old enough.
+        """
+        if not listings: return
+        self.listing_columns.update(listings)
+        try:
+            if self.listing_db is not None: self.listing_db.upsert([l.to_dict() for l in listings])
+            else: self.listing_journal.append([l.to_dict() for l in listings])
+        except Exception as e: logging.warning(f"Could not write {len(listings)} listings to {self.cache_file}: {e!r}")
+        if self.listing_journal is not None and self._compaction_due(): self._start_compaction()
+
+    def _compaction_due(self):
+        if self._cache_loading or (self._compactor is not None and self._compactor.is_alive()): return False
+        return (self.listing_journal.pending_bytes() >= JOURNAL_COMPACT_BYTES or
+                time.time() - self._last_compaction >= JOURNAL_COMPACT_INTERVAL)
+
+    def _start_compaction(self):
+        with self._compaction_lock:
+            if self._compactor is not None and self._compactor.is_alive(): return
+            self._compactor = threading.Thread(target=self.compact_listings_journal, daemon=True, name="journal-compactor")
+            self._compactor.start()
+
+    def _count(self, name, n=1):
+        with self._counters_lock: self.fetch_counters[name] += n
+
+    def wait_for_details(self, stop_event=None, poll_interval=0.5):
+        """Blocks until no listing is waiting for its details (or stop_event is set)."""
+        return self._wait_until(lambda: not any(l.fetch_status == "Pending Details" for l in list(self.all_listings_map.values())),
+                                stop_event, poll_interval)
+
+    def wait_for_photos(self, stop_event=None, poll_interval=0.5):
+        """Blocks until the photo stage has no queued or running downloads (or stop_event is set)."""
+        return self._wait_until(lambda: len(self._photo_jobs) == 0, stop_event, poll_interval)
+
+    def _wait_until(self, done, stop_event, poll_interval):
+        while not done():
+            if stop_event is not None:
+                if stop_event.wait(poll_interval): return False
+            else: time.sleep(poll_interval)
+        return True
+
+    def _process_detail_page(self, listing: Listing, resp):
+        """Applies a fetched detail page to listing, unless it is unchanged since the last fetch.
+
+        An HTTP 304 or a page whose detail_digest matches the stored one is counted as
+        unchanged and neither parsed nor sent to the photo stage. Runs on a worker.
+        """
+        self._count("detail_pages")
+        if getattr(resp, 'not_modified', False) and listing.details_fetched:
+            self._count("not_modified"); self._count("unchanged")
+            logging.info(f"Details unchanged since last fetch (304), skipping re-parse: {listing.link}")
+            return
+        digest, fragment = detail_digest(resp.content)
+        if listing.details_fetched and digest == listing.detail_digest:
+            self._count("unchanged")
+            logging.info(f"Details unchanged since last fetch, skipping re-parse: {listing.link}")
+            return
+        if listing.details_fetched: self._count("changed")
+        self._apply_detail_page(listing, resp.content, fragment)
+        listing.detail_digest = digest
+        if self._wants_photos(listing): self.queue_photo_downloads(listing)
+        logging.info(f"✓ Full details fetched for: {listing.title}")
+
+    def refresh_report(self):
+        """Re-checked detail pages since the last trigger_refresh_all_details: {"changed": n, "unchanged": n}."""
+        with self._counters_lock:
+            return {name: self.fetch_counters[name] - self._refresh_baseline[name] for name in ("changed", "unchanged")}
+
+    def _apply_detail_page(self, listing: Listing, content, fragment=None):
+        """Parses a detail page into listing (photos, appliances, remarks, coordinates). Returns the photo URLs."""
+        fields = extract_detail_page(content, self.parser_backend.name, BASE_URL, targeted=self.targeted_detail_parsing,
+                                     fragment=fragment)
+        listing.photo_urls = fields["photo_urls"]
+        listing.appliances = fields["appliances"]; listing.remarks = fields["remarks"]
+        listing.latitude = fields["latitude"]; listing.longitude = fields["longitude"]
+        return listing.photo_urls
+
+    def gc_image_cache(self):
+        """Removes cached photos no known listing refers to any more. Returns (files, bytes) removed."""
+        self.wait_for_cache_load() # listings still being loaded are known too
+        referenced = [url for l in list(self.all_listings_map.values()) for url in l.photo_urls]
+        return self.image_store.gc(referenced)
+
+    def stop_detail_fetching(self):
+         logging.info("Signalling detail fetch threads to stop.")
+         self.detail_fetch_stop_event.set()
+
+    def clear_detail_fetch_stop(self):
+         self.detail_fetch_stop_event.clear()
+
+    def trigger_single_detail_fetch(self, listing_link):
+        listing = self.get_listing_by_link(listing_link)
+        if listing:
+            logging.info(f"Triggering manual detail fetch for {listing.link}")
+            listing.fetch_status = "Pending Details"; listing.detail_fetch_error_message = ""
+            listing.details_fetched = False
+            listing.detail_attempts = 0; listing.detail_retry_at = None
+            self._persist_changes([listing])
+            self.listings_updated.emit() 
+            self._queue_detail_fetches([listing])
+            return True
+        else: logging.warning(f"Could not trigger fetch for non-existent link: {listing_link}"); return False
+
+    def trigger_refresh_all_details(self):
+        """Queues all known listings for detail fetching."""
+        logging.info(f"Triggering detail refresh for all {len(self.all_listings_map)} listings.")
+        self.clear_detail_fetch_stop() # ensure fetches can run, bug fix
+        with self._counters_lock: self._refresh_baseline = dict(self.fetch_counters)
+        count = 0
+        for listing in self.all_listings_map.values():
+             # details_fetched is kept so unchanged pages (HTTP 304 or same digest) keep their parsed details
+             listing.fetch_status = "Pending Details"
+             listing.detail_fetch_error_message = ""
+             listing.detail_attempts = 0; listing.detail_retry_at = None
+             count += 1
+        self._persist_changes(list(self.all_listings_map.values()))
+        self._queue_detail_fetches(list(self.all_listings_map.values()))
+        self.listings_updated.emit() 
+        logging.info(f"Queued {count} listings for detail refresh.")
+
+    def get_all_listings(self): return list(self.all_listings_map.values())
+    def get_listing_by_link(self, link): return self.all_listings_map.get(link)
+    def get_known_links(self): return set(self.all_listings_map.keys())
+
+    def toggle_favourite(self, listing_link):
+         listing = self.get_listing_by_link(listing_link)
+         if listing:
+             listing.is_fav = not listing.is_fav; logging.debug(f"Toggled fav {listing.link} to {listing.is_fav}")
+             if listing.is_fav:
+                 self.prioritize_detail_fetch(listing.link, PRIORITY_FAVOURITE)
+                 if listing.details_fetched: self.queue_photo_downloads(listing, PRIORITY_FAVOURITE)
+             self._persist_changes([listing])
+             self.listings_updated.emit(); return True
+         return False
+
+    def set_viewed(self, listing, viewed=True):
+        if listing.is_viewed == viewed: return
+        listing.is_viewed = viewed
+        self._persist_changes([listing])
+
+    def _synced_columns(self):
+        """listing_columns, rebuilt if listings were put into all_listings_map without _persist_changes()."""
+        if len(self.listing_columns) != len(self.all_listings_map):
+            self.listing_columns.rebuild(list(self.all_listings_map.values()))
+        return self.listing_columns
+
+    def get_filtered_listings(self, min_area, max_rent, sort_key_text, sort_reverse):
+        """The listings with area >= min_area and rent <= max_rent (0 = no limit), sorted by the sort box entry,
+        as a listing_columns.ListingSelection (a read-only sequence).
+
+        Listings without a value for the sort key go last in both directions.
+        """
+        return self._synced_columns().select(min_area, max_rent, SORT_COLUMNS.get(sort_key_text), sort_reverse)
+
+    def get_favourites(self):
+        favs = self._synced_columns().favourites()
+        favs.sort(key=lambda x: x.title)
+        return favs
+
+    def calculate_statistics(self, filtered_list):
+        columns = self._synced_columns()
+        total_scraped = len(self.all_listings_map); displayed_count = len(filtered_list)
+        fav_count = columns.fav_count(); avg_rent_str = "N/A"; avg_area_str = "N/A"; layout_counts = {}
+        if displayed_count > 0:
+            if isinstance(filtered_list, ListingSelection) and filtered_list.generation == columns.generation: mask = filtered_list.mask
+            else: mask = columns.mask_for(filtered_list)
+            stats = columns.stats(mask)
+            avg_rent_str = f"¥{stats['avg_rent']:,.0f}" if stats["avg_rent"] is not None else "N/A"
+            avg_area_str = f"{stats['avg_area']:.1f} m²" if stats["avg_area"] is not None else "N/A"
+            layout_counts = stats["layout_counts"]
+        return {"total_scraped": total_scraped, "displayed_count": displayed_count, "fav_count": fav_count, "avg_rent": avg_rent_str, "avg_area": avg_area_str, "layout_counts": layout_counts}
+
+    def load_listings_cache(self):
+        """Reads the whole cache file into all_listings_map before returning. Returns False if it couldn't be read."""
+        self.all_listings_map.clear(); self.listing_columns.clear()
+        if not self._cache_file_exists():
+            logging.info(f"Listings cache file {self.cache_file} not found.")
+            return False
+        self._cache_loading = True; self._cache_load_done = False
+        loaded = self._read_cache_file(CACHE_LOAD_MAX_CHUNK, notify=False)
+        self.merge_loaded_listings()
+        return loaded
+
+    def load_listings_cache_in_background(self):
+        """Reads the cache file on a thread, so the owner can show the listings while the rest loads.
+
+        The loader hands over growing chunks and emits cache_chunk_loaded after each, which
+        runs merge_loaded_listings (queued to the GUI thread for DataManager). Every merge
+        emits listings_updated; cache_loaded(count) follows the last one. Listings scraped
+        meanwhile are newer and are kept over their cached copies.
+        """
+        if not self._cache_file_exists():
+            logging.info(f"Listings cache file {self.cache_file} not found.")
+            self.cache_loaded.emit(len(self.all_listings_map))
+            return
+        self._cache_loading = True; self._cache_load_done = False
+        self._cache_loader = threading.Thread(target=self._read_cache_file, args=(CACHE_LOAD_FIRST_CHUNK, True),
+                                              daemon=True, name="cache-loader")
+        self._cache_loader.start()
+
+    def _read_cache_file(self, chunk_size, notify):
+        with _gc_paused(): return self._read_cache_records(chunk_size, notify)
+
+    def _read_cache_records(self, chunk_size, notify):
+        loaded_count = 0; pending_count = 0; chunk = []
+        try:
+            for listing_dict in self._iter_cache_records():
+                if isinstance(listing_dict, Listing): l_obj = listing_dict # trusted row of a compact cache file
+                else: l_obj = Listing.from_dict(listing_dict) if isinstance(listing_dict, dict) else None
+                if l_obj and l_obj.link:
+                    chunk.append(l_obj)
+                    if l_obj.fetch_status == "Pending Details" or l_obj.detail_retry_at is not None: pending_count += 1
+                    loaded_count += 1
+                else: logging.warning(f"Skipped invalid listing data from cache: {listing_dict.get('link', 'NO LINK') if isinstance(listing_dict, dict) else listing_dict!r}")
+                if len(chunk) >= chunk_size:
+                    self._hand_over_chunk(chunk, notify)
+                    chunk = []; chunk_size = min(chunk_size * 2, CACHE_LOAD_MAX_CHUNK)
+            # The pending fetches are queued by resume_detail_queue() once the owner is ready
+            logging.info(f"Loaded {loaded_count} listings from cache. Found {pending_count} pending detail fetches.")
+            return True
+        except Exception as e:
+            logging.error(f"Failed to load listings cache {self.cache_file}: {e!r}")
+            return False
+        finally: self._hand_over_chunk(chunk, notify, last=True)
+
+    def _cache_file_exists(self):
+        if self.listing_db is not None: return os.path.isfile(self.cache_file)
+        return os.path.isfile(self.cache_file) or self.listing_journal.has_entries()
+
+    def _iter_cache_records(self):
+        if self.listing_db is not None:
+            yield from self.listing_db.iter_dicts()
+            return
+        snapshot = self._iter_snapshot() if os.path.isfile(self.cache_file) else ()
+        yield from _replay_over_snapshot(snapshot, self.listing_journal)
+
+    def _iter_snapshot(self):
+        if cache_format.is_compact_file(self.cache_file):
+            yield from cache_format.iter_listings(self.cache_file)
+            return
+        with open(self.cache_file, 'r', encoding='utf-8') as f: yield from _iter_json_array(f)
+
+    def _hand_over_chunk(self, chunk, notify, last=False):
+        with self._cache_load_lock:
+            if chunk: self._loaded_chunks.append(chunk)
+            if last: self._cache_load_done = True
+        if notify: self.cache_chunk_loaded.emit()
+
+    def merge_loaded_listings(self):
+        """Adds the listings the cache loader has read so far to all_listings_map."""
+        with self._cache_load_lock:
+            chunks, self._loaded_chunks = self._loaded_chunks, []
+            finished = self._cache_loading and self._cache_load_done
+            if finished: self._cache_loading = False
+        for chunk in chunks:
+            new_listings = {l.link: l for l in chunk if l.link not in self.all_listings_map}
+            self.all_listings_map.update(new_listings)
+            self.listing_columns.update(new_listings.values())
+        if chunks or finished: self.listings_updated.emit()
+        if finished: self.cache_loaded.emit(len(self.all_listings_map))
+
+    def wait_for_cache_load(self):
+        """Blocks until a background cache load has read the whole file and merges what's left."""
+        if self._cache_loader is not None: self._cache_loader.join()
+        self.merge_loaded_listings()
+
+    def save_listings_cache(self, compact=True):
+        """Makes sure every change is on disk.
+
+        Changes are already in the database or the journal as they happen. compact=True also
+        writes the JSON cache file from memory and empties the journal; compact=False only
+        closes the journal, which is enough to replay it on the next start.
+        """
+        self.wait_for_cache_load() # a partly loaded map would drop the rest of the file
+        self.image_store.flush()
+        if self.listing_db is not None:
+            # Rows are written as listings change; fold the WAL into the database file
+            try: self.listing_db.checkpoint()
+            except Exception as e: logging.warning(f"Could not checkpoint {self.cache_file}: {e!r}")
+            return
+        if self._compactor is not None: self._compactor.join()
+        if compact: self.compact_listings_journal()
+        self.listing_journal.close()
+
+    def compact_listings_journal(self):
+        """Writes all_listings_map to the JSON cache file and drops the journal entries it now contains.
+
+        The journal is rotated before the listings are copied, so every rotated entry is
+        already in memory and anything changed meanwhile lands in the new journal. The file
+        is written next to the cache and swapped in, so a crash leaves the old snapshot and
+        the rotated journal to replay. Returns False if the file couldn't be written.
+        """
+        with self._compaction_lock:
+            if self._cache_loading: return False # a partly loaded map would drop the rest of the file
+            self._last_compaction = time.time()
+            if not self.all_listings_map and not self._cache_file_exists(): return True
+            try: self.listing_journal.rotate()
+            except OSError as e: logging.warning(f"Could not rotate {self.listing_journal.path}: {e!r}"); return False
+            listings = list(self.all_listings_map.values())
+            tmp_file = self.cache_file + ".tmp"
+            try:
+                with _gc_paused(): self._write_snapshot(tmp_file, listings)
+                os.replace(tmp_file, self.cache_file)
+            except TypeError as e: logging.error(f"TypeError during JSON serialization for cache: {e}."); return False
+            except Exception as e: logging.warning(f"Could not save listings cache: {e!r}"); return False
+            self.listing_journal.discard_rotated()
+            logging.info(f"Saved {len(listings)} listings to {self.cache_file}")
+            return True
+
+    def _write_snapshot(self, path, listings):
+        if cache_format.is_compact_file(self.cache_file):
+            cache_format.write_listings(path, listings)
+            return
+        data_to_save = [l_obj.to_dict() for l_obj in listings]
+        with open(path, 'w', encoding='utf-8') as f: json.dump(data_to_save, f, ensure_ascii=False, indent=2)
+
+
+    def clear_cache_file_and_memory(self):
+        self.wait_for_cache_load()
+        cleared_file = False
+        if self.listing_db is not None:
+            try: self.listing_db.clear(); logging.info(f"Cleared listings database: {self.cache_file}"); cleared_file = True
+            except Exception as e: logging.warning(f"Failed to clear listings database: {e!r}")
+        else:
+            if self._compactor is not None: self._compactor.join()
+            try: self.listing_journal.clear()
+            except OSError as e: logging.warning(f"Failed to delete listings journal: {e}")
+            if os.path.exists(self.cache_file):
+                try: os.remove(self.cache_file); logging.info(f"Cleared listings cache file: {self.cache_file}"); cleared_file = True
+                except OSError as e: logging.warning(f"Failed to delete listings cache file: {e}"); cleared_file = False
+        self.all_listings_map.clear(); self.listing_columns.clear(); clear_shared_values()
+        self.listings_updated.emit()
+        return cleared_file
+
+    def import_json_cache(self, json_path):
+        """Copies the listings of a JSON cache file, with the changes still in its journal, into
+        the listings database or compact cache file.
+
+        Listings already in the store are kept over the imported copies. Returns how many
+        were imported, or 0 if the store's cache is a JSON file itself.
+        """
+        if not os.path.isfile(json_path) and not ListingJournal(json_path).has_entries(): return 0
+        try:
+            if self.listing_db is None and not cache_format.is_compact_file(self.cache_file): return 0
+            # Read through the JSON cache's journal, which holds whatever changed since its last compacted save
+            listing_dicts = [d for d in _iter_json_cache(json_path) if isinstance(d, dict) and d.get("link")]
+            if self.listing_db is not None:
+                self.listing_db.upsert(listing_dicts)
+                logging.info(f"Imported {len(listing_dicts)} listings from {json_path} into {self.cache_file}")
+                return len(listing_dicts)
+            self.wait_for_cache_load()
+            imported = [l for l in (Listing.from_dict(d) for d in listing_dicts) if l and l.link]
+            for l_obj in imported: self.all_listings_map.setdefault(l_obj.link, l_obj)
+            self.compact_listings_journal()
+            logging.info(f"Imported {len(imported)} listings from {json_path} into {self.cache_file}")
+            return len(imported)
+        except Exception as e:
+            logging.error(f"Failed to import {json_path}: {e!r}")
+            return 0
+
+    def export_json_cache(self, json_path):
+        """Writes every listing to a JSON cache file. Returns the count."""
+        if self.listing_db is not None: return self.listing_db.export_json(json_path)
+        self.wait_for_cache_load()
+        listing_dicts = [l_obj.to_dict() for l_obj in self.all_listings_map.values()]
+        with open(json_path, 'w', encoding='utf-8') as f: json.dump(listing_dicts, f, ensure_ascii=False, indent=2)
+        logging.info(f"Exported {len(listing_dicts)} listings from {self.cache_file} to {json_path}")
+        return len(listing_dicts)
+
+    def get_photo_data(self, listing: Listing, rendition=None):
+        """The listing's cached photos (None where missing), or their image_store.THUMBNAIL / DISPLAY renditions."""
+        photo_data = []
+        if not listing or not listing.photo_urls: return photo_data
+        for url in listing.photo_urls:
+            img_bytes = self.image_store.get(url, rendition)
+            if img_bytes is None: logging.debug(f"Image not in cache: {url}")
+            photo_data.append(img_bytes) 
+        return photo_data
\ No newline at end of file
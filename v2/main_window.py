@@ -1,11 +1,12 @@
 import logging
+import os
 from functools import partial
 import webbrowser
 import csv 
 import json 
 
-from PyQt5.QtCore import Qt, pyqtSlot, QModelIndex, QPoint
-from PyQt5.QtGui  import QPixmap, QColor
+from PyQt5.QtCore import Qt, pyqtSlot, QModelIndex, QPoint, QTimer
+from PyQt5.QtGui  import QPixmap, QColor, QImage
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QLabel, QMessageBox, QPushButton, QHBoxLayout, QSpinBox,
     QFileDialog, QSplitter, QScrollArea, QGroupBox, QFormLayout,
@@ -16,10 +17,20 @@ from PyQt5.QtWebEngineWidgets import QWebEngineView
 
 from listing import Listing
 from listing_model import ListingModel
-from scraper import Scraper, LAYOUT_PARAM_MAP
+from scraper import Scraper, AsyncScraper, LAYOUT_PARAM_MAP, MAX_PAGE_CONCURRENCY
 from settings_manager import SettingsManager
-from data_manager import DataManager
+from data_manager import (DataManager, PRIORITY_OPEN, PHOTO_MODE_EAGER, PHOTO_MODE_LAZY, LISTINGS_CACHE_FILE, LISTINGS_DB_FILE,
+                          LISTINGS_JSONL_FILE, LISTINGS_MSGPACK_FILE, MSGPACK_AVAILABLE)
 from map_manager import MapManager
+from parser_backend import get_backend
+from http_cache import HttpCache
+from image_store import ImageStore, THUMBNAIL, DISPLAY
+from image_renditions import make_renditions, THUMBNAIL_HEIGHT
+from photo_loader import PhotoLoader
+from rate_limiter import configure_shared_limiter
+from async_engine import AIOHTTP_AVAILABLE
+
+LOADING_PIXMAP = object() # _current_listing_pixmaps marker while photo_loader decodes that photo
 
 class MainWindow(QWidget):
     def __init__(self):
@@ -29,7 +40,29 @@ class MainWindow(QWidget):
 
 
         self.settings_manager = SettingsManager()
-        self.data_manager = DataManager()
+        self.parser_backend = get_backend(self.settings_manager.get_setting("parser_backend"))
+        logging.info(f"Using HTML parser backend: {self.parser_backend.name}")
+        self.rate_limiter = configure_shared_limiter(rate=self.settings_manager.get_setting("request_rate"),
+                                                     max_rate=self.settings_manager.get_setting("max_request_rate"))
+        self.http_cache = None
+        if self.settings_manager.get_setting("http_cache_enabled"):
+            self.http_cache = HttpCache(ttl=self.settings_manager.get_setting("http_cache_ttl"),
+                                        max_bytes=self.settings_manager.get_setting("http_cache_max_mb") * 1024 * 1024)
+        fetch_engine = self.settings_manager.get_setting("fetch_engine")
+        backend = self.settings_manager.get_setting("listings_backend")
+        cache_file = {"sqlite": LISTINGS_DB_FILE, "jsonl": LISTINGS_JSONL_FILE, "msgpack": LISTINGS_MSGPACK_FILE}.get(backend, LISTINGS_CACHE_FILE)
+        if cache_file == LISTINGS_MSGPACK_FILE and not MSGPACK_AVAILABLE:
+            logging.warning("msgpack is not installed. Keeping the listings in listings_cache.jsonl instead.")
+            cache_file = LISTINGS_JSONL_FILE
+        first_start = cache_file != LISTINGS_CACHE_FILE and not os.path.exists(cache_file)
+        image_store = ImageStore(max_bytes=self.settings_manager.get_setting("image_cache_max_mb") * 1024 * 1024, renderer=make_renditions)
+        self.data_manager = DataManager(parser_backend=self.parser_backend, http_cache=self.http_cache, fetch_engine=fetch_engine,
+                                        photo_mode=self.settings_manager.get_setting("photo_mode"), image_store=image_store,
+                                        cache_file=cache_file, load_cache=False)
+        if first_start: self.data_manager.import_json_cache(LISTINGS_CACHE_FILE) # keep the listings when switching backends
+        self.photo_loader = PhotoLoader(image_store)
+        self._photo_generation = 0
+        self._thumb_labels = []
 
         self.currently_displayed_listing = None
         self.current_photo_index = 0
@@ -47,11 +80,16 @@ class MainWindow(QWidget):
         self.map_manager = MapManager(self.mapView) 
         self.map_manager.connect_show_details_signal(self.display_listing_details_by_link) 
 
-        self.scraper = Scraper()
+        scraper_cls = AsyncScraper if fetch_engine == "asyncio" and AIOHTTP_AVAILABLE else Scraper
+        self.scraper = scraper_cls(parser_backend=self.parser_backend, http_cache=self.http_cache)
 
         self._connect_signals()
 
         self._update_models_and_stats() 
+        # The cached listings fill the lists in chunks while the window is already up
+        self.searchBtn.setEnabled(False); self.refreshAllDetailsBtn.setEnabled(False); self.gcImageCacheBtn.setEnabled(False)
+        self.statusLabel.setText("Loading cached listings…")
+        self.data_manager.load_listings_cache_in_background()
 
     def _setup_ui(self):
         main_layout = QVBoxLayout(self)
@@ -76,9 +114,20 @@ class MainWindow(QWidget):
         self.searchBtn = QPushButton("Search")
         self.skipCachedCheckbox = QCheckBox("Only fetch new (skip cached in list)"); self.skipCachedCheckbox.setChecked(self.settings_manager.get_setting("skip_cached_search"))
         self.recheckDetailsCheckbox = QCheckBox("Re-check details for cached listings"); self.recheckDetailsCheckbox.setChecked(self.settings_manager.get_setting("recheck_details"))
+        self.knownPageStop = QSpinBox(); self.knownPageStop.setRange(0, 50); self.knownPageStop.setSpecialValueText("Off"); self.knownPageStop.setValue(self.settings_manager.get_setting("known_page_stop"))
+        self.knownPageStop.setToolTip("With 'Only fetch new': stop after this many pages in a row contain only known listings")
+        self.pageConcurrency = QSpinBox(); self.pageConcurrency.setRange(1, MAX_PAGE_CONCURRENCY); self.pageConcurrency.setValue(self.settings_manager.get_setting("page_concurrency"))
         filters_form.addRow("Min Area (m²):", self.minArea); filters_form.addRow("Max Rent (¥):",  self.maxRent)
         filters_form.addRow("Layouts (for Search):", layout_checkboxes_widget); filters_form.addRow(self.skipCachedCheckbox)
-        filters_form.addRow(self.recheckDetailsCheckbox); filters_form.addRow("Sort:", self.sortCombo)
+        filters_form.addRow("Stop After Known Pages:", self.knownPageStop)
+        self.shardedCrawlCheckbox = QCheckBox("Split search per ward and layout"); self.shardedCrawlCheckbox.setChecked(self.settings_manager.get_setting("sharded_crawl"))
+        self.shardedCrawlCheckbox.setToolTip("Crawl one query per ward and layout in parallel and merge the results")
+        filters_form.addRow(self.recheckDetailsCheckbox); filters_form.addRow("Parallel Pages:", self.pageConcurrency)
+        filters_form.addRow(self.shardedCrawlCheckbox)
+        self.lazyPhotosCheckbox = QCheckBox("Download photos only when opened"); self.lazyPhotosCheckbox.setChecked(self.settings_manager.get_setting("photo_mode") == PHOTO_MODE_LAZY)
+        self.lazyPhotosCheckbox.setToolTip("Fetch photos for listings you open, favourite or prefetch, instead of for every listing")
+        filters_form.addRow(self.lazyPhotosCheckbox)
+        filters_form.addRow("Sort:", self.sortCombo)
         filters_form.addRow("", self.sortDesc); filters_form.addRow(self.searchBtn)
         self.filters_gb.setLayout(filters_form)
         left_pane_layout.addWidget(self.filters_gb)
@@ -121,6 +170,8 @@ class MainWindow(QWidget):
         self.refreshAllDetailsBtn = QPushButton("Refresh All Details")
         maint_layout.addRow(self.clearListingsCacheBtn); maint_layout.addRow(self.clearAppSettingsBtn)
         maint_layout.addRow(self.refreshAllDetailsBtn)
+        self.gcImageCacheBtn = QPushButton("Clean Up Image Cache"); self.gcImageCacheBtn.setToolTip("Delete cached photos of listings that are no longer known")
+        maint_layout.addRow(self.gcImageCacheBtn)
         left_pane_layout.addWidget(self.maint_gb)
 
         self.top_splitter.addWidget(self.left_pane_widget)
@@ -146,7 +197,8 @@ class MainWindow(QWidget):
         self.exportSelectedCsvAction = self.export_menu.addAction("Export Selected to CSV")
         self.exportSelectedJsonAction = self.export_menu.addAction("Export Selected to JSON")
         export_menu_btn.setMenu(self.export_menu)
-        bottom_bar_layout.addWidget(self.statusLabel); bottom_bar_layout.addStretch()
+        self.rateLabel = QLabel(); self.rateLabel.setToolTip("Current shared request rate (adapts to throttling) and detail queue")
+        bottom_bar_layout.addWidget(self.statusLabel); bottom_bar_layout.addStretch(); bottom_bar_layout.addWidget(self.rateLabel)
         bottom_bar_layout.addWidget(export_menu_btn)
         bottom_bar_layout.addWidget(self.starBtn); bottom_bar_layout.addWidget(self.stopBtn)
         main_layout.addLayout(bottom_bar_layout)
@@ -161,12 +213,16 @@ class MainWindow(QWidget):
         self.sortDesc.stateChanged.connect(self._update_models_and_stats)
         self.searchBtn.clicked.connect(self.start_scraping)
         self.stopBtn.clicked.connect(self.scraper.stop)
-        self.scraper.new_listing.connect(self.handle_new_listing_scraped)
+        self.scraper.listings_batch.connect(self.handle_new_listings_scraped)
         self.scraper.finished.connect(self.on_scraper_finished)
         self.scraper.error.connect(self.on_scraper_error)
         self.scraper.progress.connect(self.update_status_label)
         self.data_manager.listing_details_fetched.connect(self.on_listing_details_fetched)
+        self.data_manager.listing_photos_fetched.connect(self.on_listing_photos_fetched)
+        self.photo_loader.image_ready.connect(self._on_photo_image_ready)
+        self.lazyPhotosCheckbox.toggled.connect(self._on_lazy_photos_toggled)
         self.data_manager.listings_updated.connect(self._update_models_and_stats)
+        self.data_manager.cache_loaded.connect(self.on_cache_loaded)
         self.data_manager.fetch_status_update.connect(self.update_status_label)
         self.resultsListView.clicked.connect(self.on_results_list_item_clicked)
         self.favListView.clicked.connect(self.on_fav_list_item_clicked)
@@ -176,6 +232,7 @@ class MainWindow(QWidget):
         self.clearListingsCacheBtn.clicked.connect(self._ui_clear_listings_cache)
         self.clearAppSettingsBtn.clicked.connect(self._ui_clear_app_settings)
         self.refreshAllDetailsBtn.clicked.connect(self._ui_refresh_all_details)
+        self.gcImageCacheBtn.clicked.connect(self._ui_gc_image_cache)
         self.exportFilteredCsvAction.triggered.connect(lambda: self.export_data('csv', 'filtered'))
         self.exportFilteredJsonAction.triggered.connect(lambda: self.export_data('json', 'filtered'))
         self.exportFavCsvAction.triggered.connect(lambda: self.export_data('csv', 'favourites'))
@@ -185,6 +242,9 @@ class MainWindow(QWidget):
         self.refreshMapBtn.clicked.connect(self._render_map_view_action)
         self.toggleMaximizeMapBtn.clicked.connect(self._toggle_maximize_map)
         self.main_tabs.currentChanged.connect(self._on_main_tab_changed)
+        self._refresh_in_progress = False # set by Refresh All Details until the detail queue drains
+        self.rate_timer = QTimer(self); self.rate_timer.timeout.connect(self._update_rate_label); self.rate_timer.start(1000)
+        self._update_rate_label()
 
     def _on_main_tab_changed(self, index):
         is_map_tab_current = (self.main_tabs.widget(index) == self.mapViewWidget)
@@ -236,17 +296,36 @@ class MainWindow(QWidget):
         self.data_manager.clear_detail_fetch_stop()
         logging.debug(f"Start scraper: Layouts={selected_layouts}, SkipCached={skip_cached}")
         self.statusLabel.setText("Starting search…"); self.stopBtn.setEnabled(True); self.searchBtn.setEnabled(False)
-        self.scraper.start(selected_layouts, known_links, skip_cached)
+        self.scraper.start(selected_layouts, known_links, skip_cached, page_concurrency=self.pageConcurrency.value(),
+                           parse_workers=self.settings_manager.get_setting("parse_workers"),
+                           known_page_stop=self.knownPageStop.value(), expected_pages=self.settings_manager.get_setting("last_crawl_pages"),
+                           sharded=self.shardedCrawlCheckbox.isChecked(), shard_concurrency=self.settings_manager.get_setting("shard_concurrency"))
 
-    @pyqtSlot(Listing)
-    def handle_new_listing_scraped(self, basic_listing):
+    @pyqtSlot(list)
+    def handle_new_listings_scraped(self, basic_listings):
         recheck = self.recheckDetailsCheckbox.isChecked()
-        self.data_manager.add_or_update_listing(basic_listing, recheck)
+        self.data_manager.add_or_update_listings(basic_listings, recheck)
+
+    @pyqtSlot(int)
+    def on_cache_loaded(self, count):
+        self.searchBtn.setEnabled(True); self.refreshAllDetailsBtn.setEnabled(True); self.gcImageCacheBtn.setEnabled(True)
+        self.statusLabel.setText(f"Loaded {count} cached listings.")
+        # Fetches left pending or waiting for a retry last session start once everything is loaded
+        self.data_manager.resume_detail_queue()
 
     @pyqtSlot()
     def on_scraper_finished(self):
         logging.info("Scraper finished.")
-        self.statusLabel.setText(f"Search finished. {len(self.data_manager.get_all_listings())} total known.")
+        crawl_stats = self.scraper.last_crawl_stats
+        status = f"Search finished. {len(self.data_manager.get_all_listings())} total known."
+        if crawl_stats.get("shards", 1) > 1:
+            status += f" {crawl_stats['shards']} shards, {crawl_stats['pages_fetched']} pages."
+        elif crawl_stats.get("reached_end"):
+            self.settings_manager.settings["last_crawl_pages"] = crawl_stats["result_pages"]
+        elif crawl_stats.get("stopped_early"):
+            saved = crawl_stats["pages_saved"]
+            status += f" Delta crawl stopped after {crawl_stats['pages_fetched']} pages" + (f" (~{saved} pages saved)." if saved is not None else ".")
+        self.statusLabel.setText(status)
         self.stopBtn.setEnabled(False); self.searchBtn.setEnabled(True)
         self._update_models_and_stats()
 
@@ -260,11 +339,21 @@ class MainWindow(QWidget):
     @pyqtSlot(Listing)
     def on_listing_details_fetched(self, listing):
         if self.currently_displayed_listing and self.currently_displayed_listing.link == listing.link:
+            if listing.details_fetched: self.data_manager.queue_photo_downloads(listing, PRIORITY_OPEN)
             if self.detailLayout: self.render_detail_pane(listing)
             else: logging.warning("Detail layout None during detail fetch update.")
         self.resultsModel.dataChangedForItem(listing)
         self.favModel.dataChangedForItem(listing)
 
+    @pyqtSlot(Listing)
+    def on_listing_photos_fetched(self, listing):
+        if self.currently_displayed_listing and self.currently_displayed_listing.link == listing.link and self.detailLayout:
+            self.render_detail_pane(listing)
+
+    @pyqtSlot(bool)
+    def _on_lazy_photos_toggled(self, checked):
+        self.data_manager.photo_mode = PHOTO_MODE_LAZY if checked else PHOTO_MODE_EAGER
+
     @pyqtSlot()
     def _update_models_and_stats(self):
         min_area = self.minArea.value(); max_rent = self.maxRent.value()
@@ -313,6 +402,10 @@ class MainWindow(QWidget):
         retry_action.setEnabled(listing.fetch_status != "Details OK")
         retry_action.triggered.connect(lambda: self.handle_retry_fetch_action(listing.link))
         context_menu.addAction(retry_action)
+        prefetch_action = QAction("Prefetch Photos", self)
+        prefetch_action.setEnabled(listing.details_fetched and bool(listing.photo_urls))
+        prefetch_action.triggered.connect(lambda: self.handle_prefetch_photos_action(listing))
+        context_menu.addAction(prefetch_action)
         mark_viewed_action = QAction("Mark as Viewed" if not listing.is_viewed else "Mark as Unviewed", self)
         mark_viewed_action.triggered.connect(lambda: self.handle_mark_viewed_action(listing))
         context_menu.addAction(mark_viewed_action)
@@ -323,8 +416,12 @@ class MainWindow(QWidget):
         if self.data_manager.trigger_single_detail_fetch(listing_link): self.statusLabel.setText(f"Retrying details for {listing_link}...")
         else: QMessageBox.warning(self, "Retry Failed", "Could not find listing.")
 
+    def handle_prefetch_photos_action(self, listing):
+        queued = self.data_manager.prefetch_photos([listing])
+        self.statusLabel.setText(f"Queued {queued} photos for {listing.title[:30]}." if queued else "Photos already downloaded.")
+
     def handle_mark_viewed_action(self, listing):
-        listing.is_viewed = not listing.is_viewed
+        self.data_manager.set_viewed(listing, not listing.is_viewed)
         logging.info(f"Context menu: Marked {listing.link} as viewed={listing.is_viewed}")
         self.resultsModel.dataChangedForItem(listing); self.favModel.dataChangedForItem(listing)
 
@@ -335,6 +432,12 @@ class MainWindow(QWidget):
             else: QMessageBox.warning(self, "Cache Clear Error", "Could not delete cache file (memory cleared).")
             self.clear_detail_pane(); self.statusLabel.setText("Cache cleared.")
 
+    @pyqtSlot()
+    def _ui_gc_image_cache(self):
+        removed, freed = self.data_manager.gc_image_cache()
+        self.statusLabel.setText(f"Image cache: removed {removed} unused photos ({freed / 1024 / 1024:.1f} MB), "
+                                 f"{self.data_manager.image_store.total_bytes() / 1024 / 1024:.1f} MB in use.")
+
     @pyqtSlot()
     def _ui_clear_app_settings(self):
         if QMessageBox.question(self, "Confirm", "Delete settings file?", QMessageBox.Yes | QMessageBox.No) == QMessageBox.Yes:
@@ -353,6 +456,7 @@ class MainWindow(QWidget):
             self.statusLabel.setText(f"Queueing {num_listings} for detail refresh..."); QApplication.processEvents() # Use QApplication here
             self.data_manager.trigger_refresh_all_details()
             self.statusLabel.setText(f"Queued {num_listings} listings. Check logs/status.")
+            self._refresh_in_progress = True
 
     def _reset_ui_to_defaults(self):
         defaults = self.settings_manager.settings
@@ -364,6 +468,10 @@ class MainWindow(QWidget):
         self.sortDesc.setChecked(defaults.get("sort_desc", False))
         self.skipCachedCheckbox.setChecked(defaults.get("skip_cached_search", False))
         self.recheckDetailsCheckbox.setChecked(defaults.get("recheck_details", False))
+        self.pageConcurrency.setValue(defaults.get("page_concurrency", 3))
+        self.knownPageStop.setValue(defaults.get("known_page_stop", 0))
+        self.shardedCrawlCheckbox.setChecked(defaults.get("sharded_crawl", False))
+        self.lazyPhotosCheckbox.setChecked(defaults.get("photo_mode", PHOTO_MODE_EAGER) == PHOTO_MODE_LAZY)
 
     def clear_detail_pane(self):
         while self.detailLayout.count() > 0:
@@ -377,13 +485,17 @@ class MainWindow(QWidget):
                     if sub_widget: sub_widget.deleteLater()
         self.mainPhotoLabel=None; self.photoNavWidget=None; self.photosThumbScrollArea=None; self.prevPhotoBtn=None; self.nextPhotoBtn=None
         self.currently_displayed_listing=None; self.current_photo_index=0
+        self._photo_generation = self.photo_loader.start(); self._thumb_labels = [] # drops photo loads for the previous listing
         if hasattr(self, 'starBtn') and self.starBtn: self.starBtn.setEnabled(False); self.starBtn.setText("✩")
 
     def render_detail_pane(self, listing):
+        newly_opened = listing is not None and (self.currently_displayed_listing is None or self.currently_displayed_listing.link != listing.link)
         self.clear_detail_pane();
         if not listing: return
         self.currently_displayed_listing = listing; self.current_photo_index = 0
-        if not listing.is_viewed: listing.is_viewed = True; self.resultsModel.dataChangedForItem(listing); self.favModel.dataChangedForItem(listing)
+        if listing.fetch_status == "Pending Details": self.data_manager.prioritize_detail_fetch(listing.link)
+        elif newly_opened and listing.details_fetched: self.data_manager.queue_photo_downloads(listing, PRIORITY_OPEN)
+        if not listing.is_viewed: self.data_manager.set_viewed(listing); self.resultsModel.dataChangedForItem(listing); self.favModel.dataChangedForItem(listing)
 
         title_label = QLabel(f"<h2>{listing.title}</h2>"); self.detailLayout.addWidget(title_label)
         info_parts = [ f"<b>Address:</b> {listing.address}" + (f" (Lat: {listing.latitude:.4f}, Lon: {listing.longitude:.4f})" if listing.latitude is not None else ""),
@@ -397,20 +509,19 @@ class MainWindow(QWidget):
         info_parts.append(f"<b>Link:</b> <a href='{listing.link}'>{listing.link}</a>")
         info_label = QLabel("<br>".join(info_parts)); info_label.setWordWrap(True); info_label.setOpenExternalLinks(True); info_label.setTextInteractionFlags(Qt.TextBrowserInteraction); self.detailLayout.addWidget(info_label)
 
-        photo_data_list = self.data_manager.get_photo_data(listing)
-        if photo_data_list:
+        # Photos are read and decoded by photo_loader in the background and filled in as they arrive
+        if listing.photo_urls:
             self.mainPhotoLabel = QLabel(); self.mainPhotoLabel.setAlignment(Qt.AlignCenter); self.mainPhotoLabel.setMinimumHeight(200); self.detailLayout.addWidget(self.mainPhotoLabel)
             photo_nav_layout = QHBoxLayout(); self.prevPhotoBtn = QToolButton(); self.prevPhotoBtn.setText("◀ Prev"); self.nextPhotoBtn = QToolButton(); self.nextPhotoBtn.setText("Next ▶"); self.prevPhotoBtn.clicked.connect(self._show_prev_photo); self.nextPhotoBtn.clicked.connect(self.show_next_photo); photo_nav_layout.addStretch(); photo_nav_layout.addWidget(self.prevPhotoBtn); photo_nav_layout.addWidget(self.nextPhotoBtn); photo_nav_layout.addStretch(); self.photoNavWidget = QWidget(); self.photoNavWidget.setLayout(photo_nav_layout); self.detailLayout.addWidget(self.photoNavWidget)
-            self.photosThumbScrollArea = QScrollArea(); thumb_widget = QWidget(); thumb_layout = QHBoxLayout(thumb_widget); thumb_layout.setContentsMargins(5,5,5,5); self._current_listing_pixmaps = []
-            for i, data in enumerate(photo_data_list):
-                pixmap = None
-                if data: pix = QPixmap(); pix.loadFromData(data); pixmap = pix if not pix.isNull() else None
-                self._current_listing_pixmaps.append(pixmap)
-                if pixmap:
-                    thumb_pix = pixmap.scaledToHeight(80, Qt.SmoothTransformation); thumb_label = QLabel(); thumb_label.setPixmap(thumb_pix); thumb_label.setFixedSize(thumb_pix.width(), thumb_pix.height()); thumb_label.setCursor(Qt.PointingHandCursor); thumb_label.setStyleSheet("QLabel { border: 1px solid lightgrey; } QLabel:hover { border: 1px solid blue; }"); thumb_label.mousePressEvent = partial(self._show_photo_by_index, i); thumb_layout.addWidget(thumb_label)
-                else: placeholder_label = QLabel(f"Img {i+1}\n(Error)"); placeholder_label.setFixedSize(80, 80); placeholder_label.setAlignment(Qt.AlignCenter); placeholder_label.setStyleSheet("border: 1px dashed grey; color: grey;"); thumb_layout.addWidget(placeholder_label)
-            thumb_widget.adjustSize(); self.photosThumbScrollArea.setWidget(thumb_widget); self.photosThumbScrollArea.setWidgetResizable(True); self.photosThumbScrollArea.setFixedHeight(thumb_widget.sizeHint().height() + self.photosThumbScrollArea.horizontalScrollBar().sizeHint().height() + 10); self.detailLayout.addWidget(self.photosThumbScrollArea)
-            self._display_current_photo()
+            self.photosThumbScrollArea = QScrollArea(); thumb_widget = QWidget(); thumb_layout = QHBoxLayout(thumb_widget); thumb_layout.setContentsMargins(5,5,5,5)
+            self._current_listing_pixmaps = [None] * len(listing.photo_urls) # display pixmaps, loaded when shown
+            self._thumb_labels = []
+            for i in range(len(listing.photo_urls)):
+                placeholder_label = QLabel(f"Img {i+1}\n(Loading)"); placeholder_label.setFixedSize(THUMBNAIL_HEIGHT, THUMBNAIL_HEIGHT); placeholder_label.setAlignment(Qt.AlignCenter); placeholder_label.setStyleSheet("border: 1px dashed grey; color: grey;"); thumb_layout.addWidget(placeholder_label)
+                self._thumb_labels.append(placeholder_label)
+            thumb_widget.adjustSize(); self.photosThumbScrollArea.setWidget(thumb_widget); self.photosThumbScrollArea.setWidgetResizable(True); self.photosThumbScrollArea.setFixedHeight(THUMBNAIL_HEIGHT + 12 + self.photosThumbScrollArea.horizontalScrollBar().sizeHint().height() + 10); self.detailLayout.addWidget(self.photosThumbScrollArea)
+            self._display_current_photo() # queues the first display photo ahead of the thumbnails
+            for i, url in enumerate(listing.photo_urls): self.photo_loader.request(self._photo_generation, i, url, THUMBNAIL)
         elif listing.details_fetched and not listing.photo_urls: self.detailLayout.addWidget(QLabel("<i>No photos available.</i>"))
         elif listing.fetch_status == "Pending Details": self.detailLayout.addWidget(QLabel("<i>Photos loading...</i>"))
         elif "Error" in listing.fetch_status: self.detailLayout.addWidget(QLabel(f"<i style='color:red;'>Could not load photos: {listing.detail_fetch_error_message}</i>"))
@@ -431,13 +542,36 @@ class MainWindow(QWidget):
             if hasattr(self,'nextPhotoBtn') and self.nextPhotoBtn: self.nextPhotoBtn.setEnabled(False)
             return
         pix = self._current_listing_pixmaps[self.current_photo_index]
-        if pix and not pix.isNull():
+        if pix is None:
+            self._current_listing_pixmaps[self.current_photo_index] = LOADING_PIXMAP
+            self.photo_loader.request(self._photo_generation, self.current_photo_index, self.currently_displayed_listing.photo_urls[self.current_photo_index], DISPLAY)
+        if pix is None or pix is LOADING_PIXMAP: self.mainPhotoLabel.setText("Loading photo...")
+        elif not pix.isNull():
             detail_area_width = self.detailArea.viewport().width() if self.detailArea else 400
-            scaled_pix = pix.scaledToWidth(max(detail_area_width - 40, 100), Qt.SmoothTransformation); self.mainPhotoLabel.setPixmap(scaled_pix)
+            target_width = max(detail_area_width - 40, 100)
+            scaled_pix = pix.scaledToWidth(target_width, Qt.SmoothTransformation) if pix.width() > target_width else pix; self.mainPhotoLabel.setPixmap(scaled_pix)
+        elif self.data_manager.is_photo_pending(self.currently_displayed_listing.photo_urls[self.current_photo_index]): self.mainPhotoLabel.setText("Photo downloading...")
         else: self.mainPhotoLabel.setText("Error loading image")
         if hasattr(self,'prevPhotoBtn') and self.prevPhotoBtn: self.prevPhotoBtn.setEnabled(self.current_photo_index > 0)
         if hasattr(self,'nextPhotoBtn') and self.nextPhotoBtn: self.nextPhotoBtn.setEnabled(self.current_photo_index < num_photos - 1)
 
+    @pyqtSlot(int, int, str, QImage)
+    def _on_photo_image_ready(self, generation, index, rendition, image):
+        if generation != self._photo_generation or not self.currently_displayed_listing: return
+        if rendition == DISPLAY:
+            if not (0 <= index < len(self._current_listing_pixmaps)): return
+            self._current_listing_pixmaps[index] = QPixmap.fromImage(image)
+            if index == self.current_photo_index: self._display_current_photo()
+            return
+        if not (0 <= index < len(self._thumb_labels)): return
+        thumb_label = self._thumb_labels[index]
+        if image.isNull():
+            pending = self.data_manager.is_photo_pending(self.currently_displayed_listing.photo_urls[index])
+            thumb_label.setText(f"Img {index+1}\n(" + ("Loading" if pending else "Error") + ")"); return
+        thumb_pix = QPixmap.fromImage(image)
+        if thumb_pix.height() > THUMBNAIL_HEIGHT: thumb_pix = thumb_pix.scaledToHeight(THUMBNAIL_HEIGHT, Qt.SmoothTransformation)
+        thumb_label.setPixmap(thumb_pix); thumb_label.setFixedSize(thumb_pix.width(), thumb_pix.height()); thumb_label.setCursor(Qt.PointingHandCursor); thumb_label.setStyleSheet("QLabel { border: 1px solid lightgrey; } QLabel:hover { border: 1px solid blue; }"); thumb_label.mousePressEvent = partial(self._show_photo_by_index, index)
+
     def _show_photo_by_index(self, index, event=None):
         if not self.currently_displayed_listing or not hasattr(self, '_current_listing_pixmaps'): return
         if 0 <= index < len(self._current_listing_pixmaps): self.current_photo_index = index; self._display_current_photo()
@@ -502,17 +636,32 @@ class MainWindow(QWidget):
         except Exception as e: QMessageBox.critical(self, "Export Error", f"Could not export {file_format.upper()}: {e}"); logging.error(f"{file_format.upper()} Export failed: {e!r}")
 
     def save_current_settings(self):
-        current_settings = { "min_area": self.minArea.value(), "max_rent": self.maxRent.value(), "layouts_checked": {cb.text(): cb.isChecked() for cb in self.layoutCheckboxes}, "sort_combo_idx": self.sortCombo.currentIndex(), "sort_desc": self.sortDesc.isChecked(), "skip_cached_search": self.skipCachedCheckbox.isChecked(), "recheck_details": self.recheckDetailsCheckbox.isChecked()}
+        current_settings = { "min_area": self.minArea.value(), "max_rent": self.maxRent.value(), "layouts_checked": {cb.text(): cb.isChecked() for cb in self.layoutCheckboxes}, "sort_combo_idx": self.sortCombo.currentIndex(), "sort_desc": self.sortDesc.isChecked(), "skip_cached_search": self.skipCachedCheckbox.isChecked(), "recheck_details": self.recheckDetailsCheckbox.isChecked(), "page_concurrency": self.pageConcurrency.value(), "known_page_stop": self.knownPageStop.value(), "sharded_crawl": self.shardedCrawlCheckbox.isChecked(), "photo_mode": self.data_manager.photo_mode}
         self.settings_manager.save_settings(current_settings)
 
     def closeEvent(self, event):
         logging.info("Close event triggered.")
-        self.scraper.stop(); self.data_manager.stop_detail_fetching()
-        self.save_current_settings(); self.data_manager.save_listings_cache()
+        self.scraper.stop(); self.data_manager.stop_detail_fetching(); self.photo_loader.shutdown()
+        # Changes are journaled as they happen; the cache file is rewritten by the next compaction
+        self.save_current_settings(); self.data_manager.save_listings_cache(compact=False)
         if hasattr(self, 'map_manager') and self.map_manager: self.map_manager.cleanup_map_file()
         logging.info("Shutdown routines complete.")
         event.accept()
 
+    @pyqtSlot()
+    def _update_rate_label(self):
+        limiter_state = self.rate_limiter.snapshot()
+        text = f"Rate: {limiter_state['rate']:.1f} req/s"
+        if limiter_state["blocked_for"] > 0: text += f" (paused {limiter_state['blocked_for']:.0f}s)"
+        queue_state = self.data_manager.detail_queue_stats()
+        if queue_state["queued"] or queue_state["busy"]: text += f" | Details: {queue_state['queued']} queued, {queue_state['busy']}/{queue_state['workers']} busy, {queue_state['duplicates_avoided']} duplicates avoided"
+        elif self._refresh_in_progress:
+            self._refresh_in_progress = False
+            report = self.data_manager.refresh_report()
+            self.statusLabel.setText(f"Detail refresh done: {report['changed']} changed, {report['unchanged']} unchanged.")
+        if queue_state["retrying"]: text += f" | {queue_state['retrying']} retries scheduled"
+        self.rateLabel.setText(text)
+
     @pyqtSlot(str)
     def update_status_label(self, message):
         if hasattr(self, 'statusLabel') and self.statusLabel: self.statusLabel.setText(message)
@@ -0,0 +1,146 @@
+import logging
+from bs4 import BeautifulSoup, UnicodeDammit
+
+try:
+    import lxml  # noqa: F401  (only needed as a BeautifulSoup tree builder)
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    LexborHTMLParser = None
+    SELECTOLAX_AVAILABLE = False
+
+PAGE_ENCODING = "EUC-JP"
+# Fastest first, "auto" picks the first one that is installed
+BACKEND_PREFERENCE = ["selectolax", "lxml", "html.parser"]
+
+
+def decode_page(content, encoding=PAGE_ENCODING):
+    """Decodes raw page bytes, falling back to BeautifulSoup's detection if the declared encoding is wrong."""
+    try:
+        return content.decode(encoding)
+    except UnicodeDecodeError:
+        return UnicodeDammit(content, [encoding]).unicode_markup
+
+
+class SoupNode:
+    """Thin wrapper around a BeautifulSoup tag exposing the small API the scrapers use."""
+    __slots__ = ("_tag",)
+
+    def __init__(self, tag):
+        self._tag = tag
+
+    def select(self, css):
+        return [SoupNode(t) for t in self._tag.select(css)]
+
+    def select_one(self, css):
+        t = self._tag.select_one(css)
+        return SoupNode(t) if t is not None else None
+
+    def text(self, separator="", strip=True):
+        return self._tag.get_text(separator, strip=strip)
+
+    def attr(self, name):
+        return self._tag.get(name)
+
+    def find_by_text(self, tag_name, text):
+        t = self._tag.find(tag_name, string=text)
+        return SoupNode(t) if t is not None else None
+
+    def next_sibling(self, tag_name):
+        t = self._tag.find_next_sibling(tag_name)
+        return SoupNode(t) if t is not None else None
+
+
+class LexborNode:
+    """Same API as SoupNode on top of a selectolax (lexbor) node."""
+    __slots__ = ("_node",)
+    _SKIP_TEXT_IN = ("script", "style")
+
+    def __init__(self, node):
+        self._node = node
+
+    def select(self, css):
+        return [LexborNode(n) for n in self._node.css(css)]
+
+    def select_one(self, css):
+        n = self._node.css_first(css)
+        return LexborNode(n) if n is not None else None
+
+    def text(self, separator="", strip=True):
+        # Mirrors BeautifulSoup.get_text: strip each string and drop the empty ones
+        # (selectolax's own strip keeps separators for whitespace-only nodes).
+        parts = []
+        for n in self._node.traverse(include_text=True):
+            if not n.is_text_node or (n.parent is not None and n.parent.tag in self._SKIP_TEXT_IN):
+                continue
+            s = n.text_content or ""
+            if strip:
+                s = s.strip()
+                if not s: continue
+            parts.append(s)
+        return separator.join(parts)
+
+    def attr(self, name):
+        return self._node.attributes.get(name)
+
+    def find_by_text(self, tag_name, text):
+        for n in self._node.css(tag_name):
+            if n.text(deep=True) == text:
+                return LexborNode(n)
+        return None
+
+    def next_sibling(self, tag_name):
+        n = self._node.next
+        while n is not None:
+            if n.tag == tag_name:
+                return LexborNode(n)
+            n = n.next
+        return None
+
+
+class SoupBackend:
+    """BeautifulSoup with a configurable tree builder ('html.parser' or 'lxml')."""
+
+    def __init__(self, features="html.parser"):
+        self.name = features
+        self.features = features
+
+    def parse(self, content, encoding=PAGE_ENCODING):
+        if isinstance(content, bytes):
+            if self.features != "html.parser":
+                # lxml trusts from_encoding blindly, so decode up front like the other backends
+                return SoupNode(BeautifulSoup(decode_page(content, encoding), self.features))
+            return SoupNode(BeautifulSoup(content, self.features, from_encoding=encoding))
+        return SoupNode(BeautifulSoup(content, self.features))
+
+
+class SelectolaxBackend:
+    """selectolax's lexbor engine, by far the fastest option for our pages."""
+    name = "selectolax"
+
+    def parse(self, content, encoding=PAGE_ENCODING):
+        if isinstance(content, bytes):
+            content = decode_page(content, encoding)
+        return LexborNode(LexborHTMLParser(content).root)
+
+
+def available_backends():
+    available = {"selectolax": SELECTOLAX_AVAILABLE, "lxml": LXML_AVAILABLE, "html.parser": True}
+    return [name for name in BACKEND_PREFERENCE if available[name]]
+
+
+def get_backend(name="auto"):
+    """Returns a parser backend by name, falling back to html.parser if it is not installed."""
+    if not name or name == "auto":
+        name = available_backends()[0]
+    if name not in available_backends():
+        logging.warning(f"HTML parser backend '{name}' is not available. Falling back to html.parser.")
+        name = "html.parser"
+    if name == "selectolax":
+        return SelectolaxBackend()
+    return SoupBackend(name)
@@ -0,0 +1,55 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtGui import QImage
+
+PHOTO_LOADER_THREADS = 2
+
+
+class PhotoLoader(QObject):
+    """Reads photos from an ImageStore and decodes them into QImages off the GUI thread.
+
+    Each listing shown in the detail pane is a new generation: start() cancels whatever is
+    still queued for the previous one, and results of a stale generation are dropped before
+    they reach the GUI. image_ready carries a null QImage if the photo isn't cached or
+    can't be decoded.
+    """
+    image_ready = pyqtSignal(int, int, str, QImage)  # generation, photo index, rendition, image
+
+    def __init__(self, image_store, max_workers=PHOTO_LOADER_THREADS):
+        super().__init__()
+        self.image_store = image_store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="photo-loader")
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._futures = []
+
+    def start(self):
+        """Cancels outstanding loads and returns the generation number for new requests."""
+        with self._lock:
+            self._generation += 1
+            for future in self._futures: future.cancel()
+            self._futures = []
+            return self._generation
+
+    def cancel(self):
+        self.start()
+
+    def request(self, generation, index, url, rendition):
+        with self._lock:
+            if generation != self._generation: return
+            self._futures = [f for f in self._futures if not f.done()]
+            self._futures.append(self._executor.submit(self._load, generation, index, url, rendition))
+
+    def _load(self, generation, index, url, rendition):
+        if generation != self._generation: return
+        data = self.image_store.get(url, rendition)
+        if generation != self._generation: return
+        image = QImage.fromData(data) if data else QImage()
+        if generation != self._generation: return
+        self.image_ready.emit(generation, index, rendition, image)
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+DEFAULT_RATE = 4.0           # requests per second to start with
+MIN_RATE = 0.2
+MAX_RATE = 20.0
+DEFAULT_BURST = 4
+INCREASE_STEP = 0.2          # additive increase per successful request
+DECREASE_FACTOR = 0.5        # multiplicative decrease per throttling response
+DECREASE_COOLDOWN = 1.0      # concurrent failures within this window count as one
+THROTTLE_STATUSES = (403, 429)
+STOP_POLL_INTERVAL = 0.1     # how often acquire_async checks the stop event while waiting
+
+
+def is_throttle_status(status_code):
+    return status_code in THROTTLE_STATUSES or status_code >= 500
+
+
+def parse_retry_after(value):
+    """Returns the Retry-After header value in seconds (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None: retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        logging.warning(f"Unparseable Retry-After header: {value!r}")
+        return None
+
+
+class AdaptiveRateLimiter:
+    """Token bucket shared by every request path, with AIMD rate control.
+
+    Each request takes a token first. Throttling responses (403/429/5xx) and network errors
+    halve the rate, a Retry-After pauses all paths until it has passed, and every success
+    adds INCREASE_STEP back up to max_rate.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, min_rate=MIN_RATE, max_rate=MAX_RATE, burst=DEFAULT_BURST):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self._rate = min(max(rate, min_rate), max_rate)
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "throttled": 0, "waited_seconds": 0.0}
+
+    @property
+    def current_rate(self):
+        return self._rate
+
+    def _refill_locked(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self._rate)
+        self._last_refill = now
+
+    def _reserve(self):
+        """Takes a token and returns 0, or returns how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill_locked(now)
+            if now < self._blocked_until:
+                wait = self._blocked_until - now
+            elif self._tokens >= 1:
+                self._tokens -= 1
+                self.stats["acquired"] += 1
+                return 0
+            else:
+                wait = (1 - self._tokens) / self._rate
+            self.stats["waited_seconds"] += wait
+            return wait
+
+    def acquire(self, stop_event=None):
+        """Blocks until a request may be sent. Returns False if stop_event was set while waiting."""
+        while True:
+            wait = self._reserve()
+            if not wait: return True
+            if stop_event is not None:
+                if stop_event.wait(wait): return False
+            else:
+                time.sleep(wait)
+
+    async def acquire_async(self, stop_event=None):
+        """acquire() for coroutines: sleeps on the event loop instead of blocking a thread."""
+        while True:
+            wait = self._reserve()
+            if not wait: return True
+            # A threading.Event can't be awaited, so poll it while waiting
+            while wait > 0:
+                if stop_event is not None and stop_event.is_set(): return False
+                await asyncio.sleep(min(wait, STOP_POLL_INTERVAL))
+                wait -= STOP_POLL_INTERVAL
+
+    def record_success(self):
+        with self._lock:
+            self._rate = min(self.max_rate, self._rate + INCREASE_STEP)
+
+    def record_throttle(self, retry_after=None):
+        """Registers a throttling response or network failure, optionally with a Retry-After delay in seconds."""
+        with self._lock:
+            now = time.monotonic()
+            self.stats["throttled"] += 1
+            if now - self._last_decrease >= DECREASE_COOLDOWN:
+                self._rate = max(self.min_rate, self._rate * DECREASE_FACTOR)
+                self._last_decrease = now
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+            logging.info(f"Rate limiter: throttled, rate now {self._rate:.2f} req/s" + (f", pausing {retry_after:.0f}s (Retry-After)" if retry_after else ""))
+
+    def record_response(self, status_code, retry_after_header=None):
+        if is_throttle_status(status_code):
+            self.record_throttle(parse_retry_after(retry_after_header))
+        elif status_code < 400:
+            self.record_success()
+
+    def snapshot(self):
+        with self._lock:
+            return {"rate": self._rate, "blocked_for": max(0.0, self._blocked_until - time.monotonic()), **self.stats}
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_limiter():
+    """The process-wide limiter used by the scraper, detail and photo fetches."""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = AdaptiveRateLimiter()
+        return _shared_limiter
+
+
+def configure_shared_limiter(**kwargs):
+    """Replaces the process-wide limiter, e.g. with settings from the UI."""
+    global _shared_limiter
+    with _shared_lock:
+        _shared_limiter = AdaptiveRateLimiter(**kwargs)
+        return _shared_limiter
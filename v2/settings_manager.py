@@ -13,6 +13,22 @@ DEFAULT_SETTINGS = {
     "sort_desc": False,
     "skip_cached_search": False,
     "recheck_details": False,
+    "page_concurrency": 3,
+    "parser_backend": "auto",
+    "parse_workers": 0,
+    "http_cache_enabled": True,
+    "http_cache_ttl": 0,
+    "http_cache_max_mb": 200,
+    "known_page_stop": 0,
+    "last_crawl_pages": 0,
+    "sharded_crawl": False,
+    "shard_concurrency": 4,
+    "fetch_engine": "threads",
+    "listings_backend": "json",  # "sqlite": listings.db, written as listings change; "jsonl" / "msgpack": compact cache file (restart to switch)
+    "photo_mode": "eager",
+    "image_cache_max_mb": 1024,
+    "request_rate": 4.0,
+    "max_request_rate": 20.0,
 }
 
 class SettingsManager:
@@ -0,0 +1,35 @@
+class Signal:
+    """Qt-free stand-in for pyqtSignal, used by the headless core classes.
+
+    Declared at class level like pyqtSignal; connect() registers a callable and emit()
+    calls every connected callable directly in the emitting thread. The Qt wrappers
+    (Scraper, DataManager) shadow these with real pyqtSignals.
+    """
+
+    def __set_name__(self, owner, name):
+        self._attr = f"_signal_{name}"
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        bound = obj.__dict__.get(self._attr)
+        if bound is None:
+            bound = obj.__dict__.setdefault(self._attr, BoundSignal())
+        return bound
+
+
+class BoundSignal:
+    __slots__ = ("_slots",)
+
+    def __init__(self):
+        self._slots = []
+
+    def connect(self, slot):
+        self._slots.append(slot)
+
+    def disconnect(self, slot):
+        self._slots.remove(slot)
+
+    def emit(self, *args):
+        for slot in list(self._slots):
+            slot(*args)
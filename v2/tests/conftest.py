@@ -0,0 +1,12 @@
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import rate_limiter
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limiter():
+    # The limiter is process-wide; throttling in one test must not slow down the next
+    yield rate_limiter.configure_shared_limiter()
@@ -0,0 +1,91 @@
+import pytest
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from PyQt5.QtCore import QCoreApplication
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest.importorskip("aiohttp")
+
+import crawler
+from scraper import AsyncScraper
+from data_manager import DataManager
+from listing import Listing
+
+MOCK_HTML_DIR = os.path.join(os.path.dirname(__file__), 'mock_html')
+
+def read_mock_html(filename):
+    with open(os.path.join(MOCK_HTML_DIR, filename), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+@pytest.fixture
+def local_server():
+    """Serves {path_with_query: bytes} on 127.0.0.1; anything else is a 404."""
+    routes = {}
+    requested = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requested.append(self.path)
+            body = routes.get(self.path)
+            self.send_response(200 if body is not None else 404)
+            self.send_header('Content-Type', 'text/html; charset=EUC-JP')
+            self.end_headers()
+            self.wfile.write(body or b"")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", routes, requested
+    server.shutdown()
+
+
+# Test Case 1: The asyncio scraper emits the same listings as the threaded one
+def test_async_scraper_crawls_pages(qtbot, local_server, monkeypatch):
+    if QCoreApplication.instance() is None:
+        QCoreApplication(sys.argv if hasattr(sys, 'argv') else [])
+    base_url, routes, requested = local_server
+    monkeypatch.setattr(crawler, "BASE_URL", base_url)
+    async_scraper = AsyncScraper()
+    for page_no, filename in enumerate(['page_with_listings.html', 'page_with_one_listing.html', 'page_empty.html', 'page_empty.html'], start=1):
+        routes[async_scraper._build_url(page_no, layout_params=["1K", "1DK", "1R"])[len(base_url):]] = read_mock_html(filename).encode('euc_jp', errors='xmlcharrefreplace')
+
+    listings_received = []
+    async_scraper.new_listing.connect(listings_received.append)
+
+    with qtbot.waitSignal(async_scraper.finished, timeout=10000) as blocker:
+        async_scraper.start(layout_params=["1K", "1DK", "1R"], known_links=set(), skip_cached=False, page_concurrency=3)
+
+    blocker.wait()
+
+    assert [l.title for l in listings_received] == ["Test Apartment 1", "Test Apartment 2", "Test Apartment 3 Minimal", "Solo Test Apartment"]
+    assert async_scraper.last_crawl_stats["reached_end"]
+    assert len(requested) >= 4
+
+
+# Test Case 2: Detail pages and photos are fetched on the event loop and reported through the usual signal
+def test_async_detail_fetcher(qtbot, local_server, monkeypatch, tmp_path):
+    if QCoreApplication.instance() is None:
+        QCoreApplication(sys.argv if hasattr(sys, 'argv') else [])
+    monkeypatch.chdir(tmp_path)
+    base_url, routes, _ = local_server
+    detail_html = read_mock_html('detail_page.html').replace('https://cdn.example.com', base_url)
+    routes["/tokyo/rent/1001"] = detail_html.encode('euc_jp')
+    routes["/img/1001/01.jpg"] = b"jpg-1"; routes["/img/1001/02.jpg"] = b"jpg-2"; routes["/img/1001/03.png"] = b"png-3"
+    monkeypatch.setattr("listing_store.BASE_URL", base_url)
+
+    data_manager = DataManager(fetch_engine="asyncio")
+    listing = Listing("Test Apartment 1", base_url + "/tokyo/rent/1001", "Test Address 1", "", 25.0, "1K", "", "", 80000, "", "")
+
+    with qtbot.waitSignals([data_manager.listing_details_fetched, data_manager.listing_photos_fetched], timeout=10000):
+        data_manager._queue_detail_fetches([listing])
+
+    assert listing.fetch_status == "Details OK"
+    assert listing.remarks == "Quiet neighbourhood.\nNo pets allowed.\nTwo minutes to the supermarket."
+    assert data_manager.get_photo_data(listing) == [b"jpg-1", b"jpg-2", b"png-3"]
+    data_manager.async_fetcher.close()
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cache_format
+from listing import Listing
+from listing_store import ListingStore
+from image_store import ImageStore
+
+BASE_URL = "https://www.monthly-mansion.com"
+
+
+def make_listing(n):
+    l = Listing(f"Apartment {n}", f"{BASE_URL}/tokyo/rent/{n}", f"東京都新宿区{n}", "JR山手線 新宿駅 徒歩5分", 25.5, "1K",
+                "2015年3月", "Card", 80000 + n, "5,000円", "10,000円", ["エアコン"], "Quiet", [f"{BASE_URL}/img/{n}/01.jpg"])
+    l.details_fetched = True; l.fetch_status = "Details OK"; l.latitude = 35.69; l.longitude = 139.7; l.is_fav = n == 1
+    return l
+
+
+def compact_paths(tmp_path):
+    paths = [tmp_path / "listings_cache.jsonl"]
+    if cache_format.MSGPACK_AVAILABLE: paths.append(tmp_path / "listings_cache.msgpack")
+    return paths
+
+
+# Test Case 1: to_row / from_row carry exactly the to_dict fields, in CACHE_FIELDS order
+def test_row_round_trip():
+    listing = make_listing(1)
+    assert tuple(listing.to_dict()) == Listing.CACHE_FIELDS
+    assert Listing.from_row(listing.to_row()).to_dict() == listing.to_dict()
+    assert dict(zip(Listing.CACHE_FIELDS, listing.to_row())) == listing.to_dict()
+
+
+# Test Case 2: Compact files round-trip through the store, and load the same listings as the JSON cache
+def test_store_round_trip(tmp_path):
+    listings = [make_listing(n) for n in range(50)]
+    for path in compact_paths(tmp_path):
+        store = ListingStore(cache_file=str(path), image_store=ImageStore(cache_dir=str(tmp_path / "images")))
+        store.all_listings_map = {l.link: l for l in listings}
+        store.save_listings_cache()
+        reloaded = ListingStore(cache_file=str(path), image_store=ImageStore(cache_dir=str(tmp_path / "images")))
+        assert [l.to_dict() for l in reloaded.get_all_listings()] == [l.to_dict() for l in listings]
+        assert path.stat().st_size < len(json.dumps([l.to_dict() for l in listings], ensure_ascii=False, indent=2).encode('utf-8')) / 2
+
+
+# Test Case 3: Files from another field layout go through from_dict; files from a newer schema are refused
+def test_schema_versions(tmp_path):
+    path = tmp_path / "old.jsonl"
+    header = {"format": "listings", "version": 1, "fields": ["title", "link", "build", "middle_rent"]}
+    path.write_text(json.dumps(header) + "\n" + json.dumps(["Old", f"{BASE_URL}/tokyo/rent/7", "1999年", 70000]) + "\n", encoding='utf-8')
+    (record,) = cache_format.iter_listings(str(path))
+    listing = Listing.from_dict(record)
+    assert listing.build_year == 1999 and listing.fetch_status == "Pending Details" and listing.middle_rent == 70000
+
+    path.write_text(json.dumps(dict(header, version=cache_format.SCHEMA_VERSION + 1)) + "\n", encoding='utf-8')
+    with pytest.raises(ValueError): list(cache_format.iter_listings(str(path)))
@@ -0,0 +1,71 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cli
+from crawler import BASE_URL, Crawler
+
+MOCK_HTML_DIR = os.path.join(os.path.dirname(__file__), 'mock_html')
+V2_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HTML_HEADERS = {'Content-Type': 'text/html; charset=EUC-JP'}
+
+def read_mock_html(filename):
+    with open(os.path.join(MOCK_HTML_DIR, filename), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+# Test Case 1: The headless modules don't pull in Qt or folium
+def test_cli_imports_without_qt():
+    code = "import sys, cli; print(sorted(m for m in sys.modules if m.startswith(('PyQt5', 'folium'))))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=V2_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+# Test Case 2: A full run crawls, fetches details and photos, writes the output and prints stage stats
+def test_cli_crawl_writes_output(requests_mock, monkeypatch, tmp_path, capsys):
+    monkeypatch.chdir(tmp_path)
+    crawler = Crawler()
+    crawler.layout_params = ["1K"]
+    requests_mock.get(crawler._build_url(page=1), text=read_mock_html('page_with_listings.html'), headers=HTML_HEADERS)
+    requests_mock.get(crawler._build_url(page=2), text=read_mock_html('page_empty.html'), headers=HTML_HEADERS)
+    requests_mock.get(crawler._build_url(page=3), text=read_mock_html('page_empty.html'), headers=HTML_HEADERS)
+    detail_html = read_mock_html('detail_page.html')
+    def detail_page(request, context):
+        # Own photo URLs per listing so every photo is downloaded exactly once
+        return detail_html.replace("/img/1001/", f"/img/{request.path.rsplit('/', 1)[1]}/").encode('euc_jp')
+    requests_mock.get(re.compile(re.escape(BASE_URL) + r"/tokyo/rent/\d+$"), content=detail_page, headers=HTML_HEADERS)
+    requests_mock.get(re.compile(r".*/img/.*"), content=b"jpg")
+
+    output = tmp_path / "out.json"
+    assert cli.main(["--output", str(output), "--layouts", "1K", "--no-http-cache", "--engine", "threads"]) == 0
+
+    saved = json.loads(output.read_text(encoding='utf-8'))
+    assert sorted(d["link"].rsplit('/', 1)[1] for d in saved) == ["1001", "1002", "1003"]
+    assert all(d["fetch_status"] == "Details OK" for d in saved)
+    stats = capsys.readouterr().out
+    assert re.search(r"^list pages\s+3\b", stats, re.M)
+    assert re.search(r"^detail pages\s+3\b", stats, re.M)
+    assert re.search(r"^photos\s+9\b", stats, re.M)
+
+
+# Test Case 3: A JSON cache can be moved into an SQLite database or a compact file and back
+def test_cli_import_export_json(monkeypatch, tmp_path, capsys):
+    monkeypatch.chdir(tmp_path)
+    cached = [{"title": f"Apartment {n}", "link": f"{BASE_URL}/tokyo/rent/{n}", "area": 25.0, "middle_rent": 80000,
+               "details_fetched": True, "fetch_status": "Details OK", "is_fav": n == 2} for n in range(3)]
+    (tmp_path / "old.json").write_text(json.dumps(cached, ensure_ascii=False), encoding='utf-8')
+
+    assert cli.main(["--output", "listings.db", "--import-json", "old.json"]) == 0
+    assert cli.main(["--output", "listings.db", "--export-json", "new.json"]) == 0
+    exported = json.loads((tmp_path / "new.json").read_text(encoding='utf-8'))
+    assert [(d["link"], d["is_fav"], d["fetch_status"]) for d in exported] == [(d["link"], d["is_fav"], d["fetch_status"]) for d in cached]
+    assert "imported 3 listings" in capsys.readouterr().out
+    assert cli.main(["--output", "listings.jsonl", "--import-json", "old.json"]) == 0
+    assert cli.main(["--output", "listings.jsonl", "--export-json", "compact.json"]) == 0
+    compact = json.loads((tmp_path / "compact.json").read_text(encoding='utf-8'))
+    assert [(d["link"], d["is_fav"], d["fetch_status"]) for d in compact] == [(d["link"], d["is_fav"], d["fetch_status"]) for d in cached]
+    assert cli.main(["--output", "plain.json", "--export-json", "x.json"]) == 2
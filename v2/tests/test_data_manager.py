@@ -0,0 +1,261 @@
+import pytest
+import os
+import re
+import threading
+import sys
+from PyQt5.QtCore import QCoreApplication
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from data_manager import DataManager
+from listing import Listing
+from scraper import BASE_URL
+
+@pytest.fixture
+def data_manager(monkeypatch, tmp_path):
+    if QCoreApplication.instance() is None:
+        QCoreApplication(sys.argv if hasattr(sys, 'argv') else [])
+    # DataManager keeps its caches in the working directory
+    monkeypatch.chdir(tmp_path)
+    return DataManager()
+
+MOCK_HTML_DIR = os.path.join(os.path.dirname(__file__), 'mock_html')
+
+def read_detail_page(listing):
+    """The mock detail page with photo URLs of the listing's own."""
+    with open(os.path.join(MOCK_HTML_DIR, 'detail_page.html'), 'r', encoding='utf-8') as f:
+        return f.read().replace("/img/1001/", f"/img/{listing.link.rsplit('/', 1)[1]}/")
+
+def make_listing(n, rent=80000, area=25.0, layout="1K"):
+    return Listing(f"Apartment {n}", f"{BASE_URL}/tokyo/rent/{n}", f"Address {n}", "Station", area, layout,
+                   "2015年3月", "Card", rent, "5,000円", "10,000円")
+
+
+# Test Case 1: A scraped page is upserted in one pass with one model refresh
+def test_add_or_update_listings_batch(data_manager, monkeypatch):
+    queued = []
+    monkeypatch.setattr(data_manager, "_queue_detail_fetches", lambda listings: queued.append(list(listings)))
+    updates = []
+    data_manager.listings_updated.connect(lambda: updates.append(1))
+
+    existing = make_listing(1, rent=70000)
+    existing.details_fetched = True; existing.fetch_status = "Details OK"; existing.is_viewed = True
+    data_manager.all_listings_map[existing.link] = existing
+
+    data_manager.add_or_update_listings([make_listing(1, rent=75000), make_listing(2), make_listing(3)], recheck_details=False)
+
+    assert len(updates) == 1
+    assert [[l.link for l in batch] for batch in queued] == [[make_listing(2).link, make_listing(3).link]]
+    assert len(data_manager.all_listings_map) == 3
+    # Existing listing is updated in place and keeps its local state
+    assert data_manager.all_listings_map[existing.link] is existing
+    assert existing.middle_rent == 75000 and existing.is_viewed and existing.fetch_status == "Details OK"
+
+
+# Test Case 2: recheck_details queues already fetched listings again
+def test_add_or_update_listings_recheck(data_manager, monkeypatch):
+    queued = []
+    monkeypatch.setattr(data_manager, "_queue_detail_fetches", lambda listings: queued.extend(listings))
+    existing = make_listing(1)
+    existing.details_fetched = True; existing.fetch_status = "Details OK"
+    data_manager.all_listings_map[existing.link] = existing
+
+    data_manager.add_or_update_listings([make_listing(1)], recheck_details=True)
+
+    assert queued == [existing]
+    assert existing.fetch_status == "Pending Details"
+
+
+# Test Case 3: An unchanged detail page (HTTP 304) keeps the parsed details without re-parsing
+def test_detail_fetch_not_modified_skips_parse(data_manager, requests_mock, monkeypatch, tmp_path):
+    from http_cache import HttpCache
+    data_manager.http_cache = HttpCache(cache_dir=str(tmp_path / "http_cache"))
+    listing = make_listing(1)
+    requests_mock.get(listing.link, content="<html><table><tr><th>備考</th><td>Quiet</td></tr></table></html>".encode('euc_jp'),
+                      headers={"ETag": '"v1"'})
+    data_manager._fetch_listing_details_task(listing)
+    assert listing.remarks == "Quiet" and listing.fetch_status == "Details OK"
+
+    requests_mock.get(listing.link, status_code=304)
+    listing.fetch_status = "Pending Details"
+    monkeypatch.setattr(data_manager.parser_backend, "parse", lambda *a, **k: pytest.fail("unchanged page was re-parsed"))
+    data_manager._fetch_listing_details_task(listing)
+    assert listing.fetch_status == "Details OK" and listing.remarks == "Quiet"
+
+
+# Test Case 4: The detail queue serves the open listing first, then favourites, then the rest
+def test_detail_queue_priorities(data_manager, monkeypatch):
+    monkeypatch.setattr(data_manager, "_ensure_detail_workers", lambda: None)
+    listings = [make_listing(n) for n in range(1, 6)]
+    listings[3].is_fav = True
+    for l in listings: data_manager.all_listings_map[l.link] = l
+
+    data_manager._queue_detail_fetches(listings)
+    data_manager._queue_detail_fetches([listings[0]]) # already queued, not added twice
+    assert data_manager.prioritize_detail_fetch(listings[4].link)
+    assert data_manager.detail_queue_stats()["queued"] == 5
+
+    taken = [data_manager._take_detail_job() for _ in range(5)]
+    assert [l.link for l in taken] == [listings[i].link for i in (4, 3, 0, 1, 2)]
+    assert data_manager.detail_queue_stats()["queued"] == 0
+    assert not data_manager.prioritize_detail_fetch(listings[0].link)
+
+
+# Test Case 5: Requests for a listing that is already queued or being fetched join that job
+def test_detail_jobs_coalesce(data_manager, monkeypatch):
+    monkeypatch.setattr(data_manager, "_ensure_detail_workers", lambda: None)
+    first, second = make_listing(1), make_listing(2)
+    data_manager._queue_detail_fetches([first, second])
+    data_manager._queue_detail_fetches([first])  # queued: joins the waiting job
+    taken = data_manager._take_detail_job()
+    assert taken.link == first.link
+    data_manager._queue_detail_fetches([first])  # in flight: not queued again
+    assert data_manager.detail_queue_stats() == {"queued": 1, "busy": 1, "workers": 5, "retrying": 0, "duplicates_avoided": 2}
+    assert data_manager.fetch_counters["coalesced_queued"] == 1
+    assert data_manager.fetch_counters["coalesced_in_flight"] == 1
+
+    data_manager._finish_detail_job(taken)
+    data_manager._queue_detail_fetches([first])  # finished, so a later refresh fetches it again
+    assert data_manager.detail_queue_stats()["queued"] == 2
+    assert data_manager.detail_queue_stats()["busy"] == 0
+
+
+# Test Case 6: Photos are their own stage; in lazy mode only opened/favourite/prefetched listings get them
+def test_photo_stage_lazy_mode(data_manager, requests_mock, monkeypatch):
+    from listing_store import PHOTO_MODE_LAZY
+    queued_photos = []
+    monkeypatch.setattr(data_manager, "_ensure_photo_workers", lambda: None)
+    data_manager.photo_mode = PHOTO_MODE_LAZY
+    listing, favourite = make_listing(1), make_listing(2)
+    favourite.is_fav = True
+    for l in (listing, favourite):
+        requests_mock.get(l.link, content=read_detail_page(l).encode('euc_jp'))
+        data_manager._fetch_listing_details_task(l)
+        assert l.fetch_status == "Details OK" and len(l.photo_urls) == 3
+    assert requests_mock.call_count == 2  # detail pages only, no photos inline
+    assert data_manager.photo_queue_stats()["queued"] == 3  # the favourite's photos
+
+    assert data_manager.prefetch_photos([listing]) == 3
+    assert data_manager.prefetch_photos([listing]) == 0  # already queued
+
+    requests_mock.get(re.compile(r".*/img/.*"), content=b"jpg")
+    data_manager.listing_photos_fetched.connect(queued_photos.append)
+    while data_manager.photo_queue_stats()["queued"]:
+        url, owner = data_manager._photo_jobs.take()
+        data_manager._download_photo(owner, url)
+        data_manager._finish_photo_job(owner, url)
+    assert [l.link for l in queued_photos] == [favourite.link, listing.link]
+    assert data_manager.get_photo_data(listing) == [b"jpg"] * 3
+    assert data_manager.fetch_counters["photos"] == 6
+
+
+# Test Case 7: A re-checked page whose detail regions hash the same is neither parsed nor sent to the photo stage
+def test_detail_digest_skips_unchanged(data_manager, requests_mock, monkeypatch):
+    monkeypatch.setattr(data_manager, "_queue_detail_fetches", lambda listings: None)
+    photo_checks = []
+    monkeypatch.setattr(data_manager, "queue_photo_downloads", lambda l, priority=None: photo_checks.append(l))
+    listing, edited = make_listing(1), make_listing(2)
+    for l in (listing, edited):
+        data_manager.all_listings_map[l.link] = l
+        requests_mock.get(l.link, content=read_detail_page(l).encode('euc_jp'))
+        data_manager._fetch_listing_details_task(l)
+    assert listing.detail_digest and listing.detail_digest != edited.detail_digest
+
+    data_manager.trigger_refresh_all_details()
+    del photo_checks[:]
+    # Only the listing's remarks change; the other page just gets a new ad
+    requests_mock.get(listing.link, content=read_detail_page(listing).replace("</body>", "<div class=\"ad\">New!</div></body>").encode('euc_jp'))
+    requests_mock.get(edited.link, content=read_detail_page(edited).replace("<th>備考</th><td>", "<th>備考</th><td>Renovated. ").encode('euc_jp'))
+    apply_detail_page = data_manager._apply_detail_page
+    parsed = []
+    monkeypatch.setattr(data_manager, "_apply_detail_page", lambda l, *a: parsed.append(l) or apply_detail_page(l, *a))
+    for l in (listing, edited): data_manager._fetch_listing_details_task(l)
+
+    assert parsed == [edited] and edited.remarks.startswith("Renovated.")
+    assert listing.fetch_status == edited.fetch_status == "Details OK"
+    assert photo_checks == [edited]
+    assert data_manager.refresh_report() == {"changed": 1, "unchanged": 1}
+    assert Listing.from_dict(listing.to_dict()).detail_digest == listing.detail_digest
+
+
+# Test Case 8: Failed fetches go back on the queue with backoff, and the queue is resumed after a restart
+def test_detail_retry_backoff_and_resume(data_manager, requests_mock, monkeypatch):
+    import time
+    import types
+    import requests
+    import job_queue
+    from listing_store import DETAIL_RETRY_DELAY
+    monkeypatch.setattr(data_manager, "_ensure_detail_workers", lambda: None)
+    gone, listing = make_listing(1), make_listing(2)
+    requests_mock.get(gone.link, status_code=404)
+    requests_mock.get(listing.link, exc=requests.exceptions.ConnectionError("offline"))
+    for l in (gone, listing): data_manager.all_listings_map[l.link] = l
+    data_manager._queue_detail_fetches([gone, listing])
+    for _ in range(2):
+        l = data_manager._take_detail_job()
+        data_manager._fetch_listing_details_task(l)
+        data_manager._finish_detail_job(l)
+
+    assert gone.fetch_status == listing.fetch_status == "Detail Fetch Error"
+    assert gone.detail_retry_at is None  # a 404 won't get better
+    assert listing.detail_attempts == 1 and "retrying in" in listing.detail_fetch_error_message
+    assert DETAIL_RETRY_DELAY - 5 < listing.detail_retry_at - time.time() <= DETAIL_RETRY_DELAY
+    assert data_manager.detail_queue_stats()["queued"] == 0 and data_manager.detail_queue_stats()["retrying"] == 1
+    data_manager.save_listings_cache()
+
+    restarted = DataManager()
+    assert len(restarted._detail_jobs) == 0  # nothing is queued while constructing
+    monkeypatch.setattr(restarted, "_ensure_detail_workers", lambda: None)
+    assert restarted.resume_detail_queue() == 1
+    assert restarted.detail_queue_stats()["retrying"] == 1
+
+    real_time = time.time
+    monkeypatch.setattr(job_queue, "time", types.SimpleNamespace(time=lambda: real_time() + DETAIL_RETRY_DELAY))
+    l = restarted._take_detail_job()
+    assert l.link == listing.link and l.detail_attempts == 1
+    restarted._fetch_listing_details_task(l)
+    restarted._finish_detail_job(l)
+    assert l.detail_attempts == 2 and 2 * DETAIL_RETRY_DELAY - 5 < l.detail_retry_at - real_time() <= 2 * DETAIL_RETRY_DELAY
+
+
+# Test Case 9: The cache loads in the background in chunks; listings scraped meanwhile win over cached copies
+def test_background_cache_load(data_manager, monkeypatch):
+    cached = [make_listing(n) for n in range(1000)]
+    for l in cached: l.details_fetched = True; l.fetch_status = "Details OK"; data_manager.all_listings_map[l.link] = l
+    data_manager.save_listings_cache()
+
+    manager = DataManager(load_cache=False)
+    assert manager.get_all_listings() == []
+    monkeypatch.setattr(manager, "_queue_detail_fetches", lambda listings: None)
+    sizes, loaded = [], []
+    manager.listings_updated.connect(lambda: sizes.append(len(manager.all_listings_map)))
+    manager.cache_loaded.connect(loaded.append)
+    scraped = make_listing(5, rent=99000)
+    manager.add_or_update_listings([scraped], recheck_details=False)
+    manager.load_listings_cache_in_background()
+    manager.wait_for_cache_load()
+    QCoreApplication.processEvents()
+
+    assert len(manager.all_listings_map) == 1000 and loaded == [1000]
+    assert manager.get_listing_by_link(scraped.link) is scraped
+    assert manager.get_listing_by_link(cached[999].link).fetch_status == "Details OK"
+    assert sizes[-1] == 1000
+
+
+# Test Case 10: Cleaning up the image cache mid-load waits for the load, keeping photos of listings not merged yet
+def test_gc_image_cache_waits_for_cache_load(data_manager, monkeypatch):
+    cached = [make_listing(n) for n in range(3)]
+    for l in cached: l.photo_urls = [f"{BASE_URL}/img/{l.link.rsplit('/', 1)[1]}/01.jpg"]; data_manager.all_listings_map[l.link] = l
+    data_manager.save_listings_cache()
+
+    manager = DataManager(load_cache=False)
+    monkeypatch.setattr(manager, "_queue_detail_fetches", lambda listings: None)
+    for l in cached: manager.image_store.put(l.photo_urls[0], b"xx")
+    manager.image_store.put(f"{BASE_URL}/img/gone/01.jpg", b"xx")
+    release, read_cache_file = threading.Event(), manager._read_cache_file
+    monkeypatch.setattr(manager, "_read_cache_file", lambda *args: release.wait() and read_cache_file(*args))
+    manager.load_listings_cache_in_background()
+    threading.Timer(0.2, release.set).start()  # the loader is still reading when GC starts
+
+    assert manager.gc_image_cache() == (1, 2)
+    assert all(manager.image_store.contains(l.photo_urls[0]) for l in cached)
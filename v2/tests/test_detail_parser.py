@@ -0,0 +1,71 @@
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import detail_parser
+from detail_parser import extract_detail_page
+from parser_backend import available_backends
+
+MOCK_HTML_DIR = os.path.join(os.path.dirname(__file__), 'mock_html')
+
+def read_mock_html(filename):
+    with open(os.path.join(MOCK_HTML_DIR, filename), 'r', encoding='utf-8') as f:
+        return f.read()
+
+EXPECTED = {
+    "photo_urls": [detail_parser.BASE_URL + "/img/1001/01.jpg", detail_parser.BASE_URL + "/img/1001/02.jpg",
+                   "https://cdn.example.com/img/1001/03.png"],
+    "appliances": ["エアコン", "冷蔵庫", "洗濯機"],
+    "remarks": "Quiet neighbourhood.\nNo pets allowed.\nTwo minutes to the supermarket.",
+    "latitude": 35.7295, "longitude": 139.7109,
+}
+
+
+# Test Case 1: The targeted extractor gives the same fields as the full-tree parse
+@pytest.mark.parametrize("backend_name", available_backends())
+def test_targeted_matches_full_parse(backend_name):
+    page = read_mock_html('detail_page.html').encode('euc_jp')
+    assert extract_detail_page(page, backend_name, targeted=False) == EXPECTED
+    assert extract_detail_page(page, backend_name, targeted=True) == EXPECTED
+
+
+# Test Case 2: Decoys in scripts and comments are skipped, other tables are left out of the parse
+def test_targeted_skips_scripts_and_unrelated_regions(monkeypatch):
+    html = read_mock_html('detail_page.html').replace(
+        '<div class="header">',
+        '<!-- <table><tr><th>備考</th><td>old remarks</td></tr></table> -->'
+        '<script>var t = "<th>備考</th><td>fake</td></table>";</script>'
+        '<table class="nav"><tr><th>エリア</th><td>池袋</td></tr></table><div class="header">')
+    fragment = detail_parser._targeted_fragment(html)
+    assert "エリア" not in fragment and "fake" not in fragment and "old remarks" not in fragment
+    assert extract_detail_page(html.encode('euc_jp'), "html.parser") == EXPECTED
+
+
+# Test Case 3: Pages the regions can't be cut out of are parsed whole
+def test_targeted_falls_back_to_full_parse():
+    nested = read_mock_html('detail_page.html').replace('<td>Test Address 1</td>', '<td><table><tr><td>x</td></tr></table></td>')
+    assert detail_parser._targeted_fragment(nested) is None
+    assert extract_detail_page(nested.encode('euc_jp'), "html.parser") == EXPECTED
+    assert detail_parser._targeted_fragment("<html><body><p>Listing removed</p></body></html>") is None
+
+
+# Test Case 4: On markup the cut-out could get wrong, the targeted extractor still matches the full parse
+ODD_MARKUP = {
+    "spaced_th": ('<th>備考</th>', '<th> 備考 </th>'),
+    "th_with_attributes": ('<th>設備</th>', '<th class="label">設備</th>'),
+    "th_with_span": ('<th>備考</th>', '<th><span>備考</span></th>'),
+    "thumbnails_outside_photo": ('<ul class="thumbnail">', '</div><ul class="thumbnail">'),
+    "nested_thumbnail_list": ('<li><a href="/img/1001/02.jpg">', '<li><ul><li>new</li></ul></li><li><a href="/img/1001/02.jpg">'),
+    "other_photo_class": ('<div class="photo">', '<div class="photo-gallery"><ul class="thumbnail"><li><a href="/img/x.jpg">x</a></li></ul></div><div class="photo">'),
+    "single_quoted_class": ('<ul class="thumbnail">', "<ul class='thumbnail'>"),
+}
+
+@pytest.mark.parametrize("case", sorted(ODD_MARKUP))
+def test_targeted_matches_full_parse_on_odd_markup(case):
+    old, new = ODD_MARKUP[case]
+    html = read_mock_html('detail_page.html').replace(old, new, 1)
+    page = html.encode('euc_jp')
+    for backend_name in available_backends():
+        assert extract_detail_page(page, backend_name, targeted=True) == extract_detail_page(page, backend_name, targeted=False)
@@ -0,0 +1,56 @@
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from http_cache import HttpCache
+
+URL = "https://www.monthly-mansion.com/tokyo/rent/1001"
+
+
+# Test Case 1: Validators are stored and a 304 returns the stored body
+def test_conditional_request_and_not_modified(tmp_path, requests_mock):
+    cache = HttpCache(cache_dir=str(tmp_path))
+    requests_mock.get(URL, content=b"<html>v1</html>", headers={"ETag": '"abc"', "Last-Modified": "Mon, 01 Sep 2025 00:00:00 GMT"})
+    first = cache.get(URL)
+    assert first.content == b"<html>v1</html>" and not first.not_modified
+
+    requests_mock.get(URL, status_code=304)
+    # A new instance reads the index back from disk
+    second = HttpCache(cache_dir=str(tmp_path)).get(URL)
+    assert second.not_modified and second.content == b"<html>v1</html>"
+    sent = requests_mock.last_request.headers
+    assert sent["If-None-Match"] == '"abc"'
+    assert sent["If-Modified-Since"] == "Mon, 01 Sep 2025 00:00:00 GMT"
+
+
+# Test Case 2: Within the TTL no request is made at all
+def test_ttl_serves_from_disk(tmp_path, requests_mock):
+    cache = HttpCache(cache_dir=str(tmp_path), ttl=3600)
+    requests_mock.get(URL, content=b"body")
+    cache.get(URL)
+    again = cache.get(URL)
+    assert again.from_cache and again.content == b"body"
+    assert requests_mock.call_count == 1
+
+
+# Test Case 3: Least recently used entries are evicted above the size cap
+def test_size_cap_evicts_lru(tmp_path, requests_mock):
+    cache = HttpCache(cache_dir=str(tmp_path), ttl=3600, max_bytes=250)
+    for n in range(3):
+        requests_mock.get(f"{URL}{n}", content=bytes(100))
+        cache.get(f"{URL}{n}")
+    assert cache.total_bytes() == 200
+    assert cache.stats["evicted"] == 1
+    assert not os.path.exists(os.path.join(str(tmp_path), f"{cache._key(URL + '0')}.body"))
+
+
+# Test Case 4: Errors are raised like requests would and nothing is stored
+def test_http_error_not_cached(tmp_path, requests_mock):
+    import requests
+    cache = HttpCache(cache_dir=str(tmp_path), ttl=3600)
+    requests_mock.get(URL, status_code=429)
+    with pytest.raises(requests.exceptions.HTTPError):
+        cache.get(URL)
+    assert cache.total_bytes() == 0
@@ -0,0 +1,87 @@
+import pytest
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from image_store import ImageStore, THUMBNAIL, DISPLAY
+
+URL = "https://www.monthly-mansion.com/img/1001/"
+
+
+# Test Case 1: Stored photos are found from the index, also by a new instance
+def test_put_get_and_index_reload(tmp_path, monkeypatch):
+    store = ImageStore(cache_dir=str(tmp_path))
+    store.put(URL + "01.jpg", b"jpg-1")
+    assert store.contains(URL + "01.jpg") and not store.contains(URL + "02.jpg")
+    assert store.get(URL + "01.jpg") == b"jpg-1"
+    store.flush()
+
+    reloaded = ImageStore(cache_dir=str(tmp_path))
+    monkeypatch.setattr(os.path, "exists", lambda *a: pytest.fail("contains() touched the disk"))
+    assert reloaded.contains(URL + "01.jpg")
+    assert reloaded.total_bytes() == 5
+
+
+# Test Case 2: Above the byte budget the least recently used photos go first
+def test_byte_budget_evicts_lru(tmp_path):
+    store = ImageStore(cache_dir=str(tmp_path), max_bytes=250)
+    for n in range(3):
+        store.put(f"{URL}{n}.jpg", bytes(100))
+        if n == 1: store.get(f"{URL}0.jpg")  # 0 is now more recent than 1
+    assert store.total_bytes() == 200
+    assert store.contains(f"{URL}0.jpg") and not store.contains(f"{URL}1.jpg")
+    assert not os.path.exists(store.path(f"{URL}1.jpg"))
+    assert store.stats["evicted"] == 1
+
+
+# Test Case 3: Photos cached before the index existed are adopted, and GC drops unreferenced ones
+def test_unindexed_files_adopted_and_gc(tmp_path):
+    old = ImageStore(cache_dir=str(tmp_path))
+    for name in ("01.jpg", "02.jpg", "03.png"):
+        with open(old.path(URL + name), 'wb') as f: f.write(b"xx")
+
+    store = ImageStore(cache_dir=str(tmp_path))
+    assert len(store) == 3 and store.total_bytes() == 6
+    assert store.get(URL + "01.jpg") == b"xx"
+
+    assert store.gc([URL + "01.jpg", URL + "03.png"]) == (1, 2)
+    assert sorted(os.listdir(tmp_path)) == sorted(["index.json", os.path.basename(store.path(URL + "01.jpg")),
+                                                   os.path.basename(store.path(URL + "03.png"))])
+    assert ImageStore(cache_dir=str(tmp_path)).contains(URL + "03.png")
+
+
+# Test Case 4: Renditions are stored next to the original, counted in the budget and backfilled on request
+def test_renditions_stored_and_backfilled(tmp_path):
+    renders = []
+    def renderer(data):
+        renders.append(data)
+        return {THUMBNAIL: b"t", DISPLAY: b"dd"}
+
+    ImageStore(cache_dir=str(tmp_path)).put(URL + "01.jpg", b"old-photo")  # cached before renditions existed
+    store = ImageStore(cache_dir=str(tmp_path), renderer=renderer)
+    assert store.get(URL + "01.jpg", THUMBNAIL) == b"t"
+    store.put(URL + "02.jpg", b"new-photo")
+    assert renders == [b"old-photo", b"new-photo"]
+    assert os.path.exists(store.path(URL + "02.jpg", DISPLAY))
+    assert store.get(URL + "02.jpg", DISPLAY) == b"dd" and len(renders) == 2
+    assert store.total_bytes() == 2 * 3 + 9 + 9
+
+    store.flush()
+    assert ImageStore(cache_dir=str(tmp_path)).get(URL + "02.jpg", THUMBNAIL) == b"t"
+    assert store.gc([]) == (2, 24) and os.listdir(tmp_path) == ["index.json"]
+
+
+# Test Case 5: The Qt renderer makes an 80 px high thumbnail and caps the display width
+def test_qt_renditions():
+    QtGui = pytest.importorskip("PyQt5.QtGui")
+    from PyQt5.QtCore import QBuffer, QByteArray, QIODevice
+    from image_renditions import make_renditions, THUMBNAIL_HEIGHT, DISPLAY_WIDTH
+    image = QtGui.QImage(2000, 1000, QtGui.QImage.Format_ARGB32); image.fill(0x80ff0000)
+    data = QByteArray(); buffer = QBuffer(data); buffer.open(QIODevice.WriteOnly); image.save(buffer, "PNG")
+
+    renditions = make_renditions(bytes(data))
+    thumb, display = QtGui.QImage.fromData(renditions[THUMBNAIL]), QtGui.QImage.fromData(renditions[DISPLAY])
+    assert (thumb.width(), thumb.height()) == (2 * THUMBNAIL_HEIGHT, THUMBNAIL_HEIGHT)
+    assert (display.width(), display.height()) == (DISPLAY_WIDTH, DISPLAY_WIDTH // 2)
+    assert make_renditions(b"not an image") == {}
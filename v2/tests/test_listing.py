@@ -0,0 +1,59 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from listing import Listing
+
+BASE_URL = "https://www.monthly-mansion.com"
+
+
+def make_dict(n):
+    return {"title": f"Apartment {n}", "link": f"{BASE_URL}/tokyo/rent/{n}", "stations": "JR山手線 新宿駅 徒歩5分",
+            "area": 25.0, "layout": "1K", "build": "2015年3月", "pay_methods": "Card", "middle_rent": 80000,
+            "appliances": ["エアコン", "冷蔵庫"], "fetch_status": "Details OK", "details_fetched": True,
+            "photo_urls": [f"{BASE_URL}/img/{n}/01.jpg", "https://cdn.example.com/a.jpg", f"{BASE_URL}/img/{n}/02.jpg"]}
+
+
+# Test Case 1: to_dict / from_dict round-trip unchanged, with appliances and photo_urls still plain lists
+def test_dict_contract():
+    listing = Listing.from_dict(json.loads(json.dumps(make_dict(1), ensure_ascii=False)))
+    d = listing.to_dict()
+    assert Listing.from_dict(d).to_dict() == d
+    assert d["photo_urls"] == make_dict(1)["photo_urls"] and d["appliances"] == ["エアコン", "冷蔵庫"]
+    assert Listing("t", "l", "", "", 0, "", "", "", 0, "", "").to_dict()["photo_urls"] == []
+
+    listing.photo_urls = [f"{BASE_URL}/img/1/03.jpg"]; listing.appliances = []
+    assert listing.photo_urls == [f"{BASE_URL}/img/1/03.jpg"] and listing.appliances == []
+    with pytest.raises(AttributeError): listing.not_a_field = 1  # __slots__, no per-listing __dict__
+
+
+# Test Case 2: Repeated values are shared between listings loaded from separate JSON documents
+def test_repeated_values_are_shared():
+    first, second = (Listing.from_dict(json.loads(json.dumps(make_dict(n), ensure_ascii=False))) for n in (1, 2))
+    assert first.layout is second.layout
+    assert first.pay_methods is second.pay_methods and first.fetch_status is second.fetch_status
+    assert first._appliances is second._appliances
+    assert BASE_URL not in first._photo_urls
+
+
+# Test Case 3: Photo URL lists with empty entries read back unchanged, also through to_row / from_row
+@pytest.mark.parametrize("photo_urls", [[], [""], ["", ""], [f"{BASE_URL}/img/1/01.jpg", ""]])
+def test_photo_urls_round_trip(photo_urls):
+    listing = Listing.from_dict(dict(make_dict(1), photo_urls=photo_urls))
+    assert listing.photo_urls == photo_urls
+    assert Listing.from_row(json.loads(json.dumps(listing.to_row(), ensure_ascii=False))).photo_urls == photo_urls
+
+
+# Test Case 4: Appliance lists stay shared while the cache is bounded and can be cleared
+def test_shared_appliances_bounded():
+    import listing as listing_module
+    listing_module.clear_shared_values()
+    for n in range(listing_module.SHARED_APPLIANCE_LISTS + 10):
+        Listing.from_dict(dict(make_dict(n), appliances=[f"Appliance {n}"]))
+    assert listing_module._shared_appliance_tuple.cache_info().currsize == listing_module.SHARED_APPLIANCE_LISTS
+    listing_module.clear_shared_values()
+    assert listing_module._shared_appliance_tuple.cache_info().currsize == 0
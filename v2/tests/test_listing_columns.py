@@ -0,0 +1,89 @@
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from listing import Listing
+from listing_columns import ListingSelection
+from listing_store import ListingStore
+from image_store import ImageStore
+
+BASE_URL = "https://www.monthly-mansion.com"
+SORT_KEYS = {"Price": lambda l: l.middle_rent, "Area": lambda l: l.area, "Price per m²": lambda l: l.ppm2,
+             "Build Year": lambda l: l.build_year, "Date Added": lambda l: l.date_added, "-- none --": None}
+
+
+def make_store(tmp_path, monkeypatch):
+    store = ListingStore(cache_file=str(tmp_path / "listings_cache.json"), image_store=ImageStore(cache_dir=str(tmp_path / "images")))
+    monkeypatch.setattr(store, "_queue_detail_fetches", lambda listings, priority=None: None)
+    return store
+
+
+def make_listings(count, seed=7):
+    rng = random.Random(seed)
+    listings = []
+    for n in range(count):
+        l = Listing(f"Apartment {n}", f"{BASE_URL}/tokyo/rent/{n}", "", "", rng.choice([18.0, 20.5, 25.0, 31.2]),
+                    rng.choice(["1R", "1K", "1DK"]), rng.choice(["", "1999年", "2015年3月"]), "", rng.choice([70000, 80000, 95000]), "", "")
+        l.date_added = datetime(2026, 1, 1) + timedelta(hours=rng.randint(0, 5))
+        if n % 9 == 0: l.ppm2 = None
+        l.is_fav = n % 4 == 0
+        listings.append(l)
+    return listings
+
+
+def reference_filter(listings, min_area, max_rent, sort_key, reverse):
+    """What get_filtered_listings did with a Python loop and list.sort(): missing values last."""
+    result = [l for l in listings if (min_area <= 0 or l.area >= min_area) and (max_rent <= 0 or l.middle_rent <= max_rent)]
+    key = SORT_KEYS[sort_key]
+    if key:
+        present = [l for l in result if key(l) is not None]
+        present.sort(key=key, reverse=reverse)
+        result = present + [l for l in result if key(l) is None]
+    return result
+
+
+# Test Case 1: Filtering and sorting match the Python implementation, ties and missing values included
+def test_filter_and_sort_match_reference(tmp_path, monkeypatch):
+    store = make_store(tmp_path, monkeypatch)
+    listings = make_listings(300)
+    store.add_or_update_listings(listings, recheck_details=False)
+    for sort_key in SORT_KEYS:
+        for reverse in (False, True):
+            for min_area, max_rent in ((0, 0), (20, 0), (0, 80000), (25, 90000)):
+                selection = store.get_filtered_listings(min_area, max_rent, sort_key, reverse)
+                assert list(selection) == reference_filter(listings, min_area, max_rent, sort_key, reverse)
+
+    stats = store.calculate_statistics(store.get_filtered_listings(20, 80000, "Price", False))
+    expected = reference_filter(listings, 20, 80000, "-- none --", False)
+    assert stats["displayed_count"] == len(expected) and stats["fav_count"] == sum(l.is_fav for l in listings)
+    assert stats["avg_rent"] == f"¥{sum(l.middle_rent for l in expected) / len(expected):,.0f}"
+    assert stats["avg_area"] == f"{sum(l.area for l in expected) / len(expected):.1f} m²"
+    assert stats["layout_counts"] == {layout: sum(l.layout == layout for l in expected) for layout in {l.layout for l in expected}}
+    assert store.calculate_statistics(list(expected)) == stats  # a plain list works too
+    assert store.get_favourites() == sorted((l for l in listings if l.is_fav), key=lambda l: l.title)
+
+
+# Test Case 2: Changes reach the columns through _persist_changes; listings put into the map directly are picked up
+def test_columns_follow_changes(tmp_path, monkeypatch):
+    store = make_store(tmp_path, monkeypatch)
+    listings = make_listings(50)
+    store.add_or_update_listings(listings, recheck_details=False)
+    cheapest = store.get_filtered_listings(0, 0, "Price", False)
+    assert isinstance(cheapest, ListingSelection)
+
+    priciest = cheapest[len(cheapest) - 1]
+    update = Listing(priciest.title, priciest.link, "", "", priciest.area, priciest.layout, "", "", 10000, "", "")
+    store.add_or_update_listing(update, recheck_details=False)
+    store.toggle_favourite(priciest.link)
+    selection = store.get_filtered_listings(0, 0, "Price", False)
+    assert selection[0] is priciest and selection.index(priciest) == 0
+    assert (priciest in store.get_favourites()) == priciest.is_fav
+
+    extra = make_listings(51)[50]
+    store.all_listings_map[extra.link] = extra
+    assert extra in list(store.get_filtered_listings(0, 0, "-- none --", False))
+    store.clear_cache_file_and_memory()
+    assert len(store.get_filtered_listings(0, 0, "Price", True)) == 0
@@ -0,0 +1,59 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from listing import Listing
+from listing_db import ListingDatabase
+from listing_store import ListingStore
+from image_store import ImageStore
+
+BASE_URL = "https://www.monthly-mansion.com"
+
+
+def make_listing(n, rent=80000):
+    return Listing(f"Apartment {n}", f"{BASE_URL}/tokyo/rent/{n}", f"Address {n}", "Station", 25.0, "1K",
+                   "2015年3月", "Card", rent, "5,000円", "10,000円")
+
+
+def make_store(path, monkeypatch=None):
+    store = ListingStore(cache_file=str(path), image_store=ImageStore(cache_dir=str(path) + ".images"))
+    if monkeypatch: monkeypatch.setattr(store, "_queue_detail_fetches", lambda listings, priority=None: None)
+    return store
+
+
+# Test Case 1: Upserts replace rows in place, rows come back in insertion order, JSON import/export round-trips
+def test_upsert_order_and_json_round_trip(tmp_path):
+    db = ListingDatabase(str(tmp_path / "listings.db"))
+    db.upsert([make_listing(n).to_dict() for n in (3, 1, 2)])
+    db.upsert([make_listing(1, rent=99000).to_dict()])
+    assert [d["link"][-1] for d in db.iter_dicts()] == ["3", "1", "2"]
+    assert [d["middle_rent"] for d in db.iter_dicts()] == [80000, 99000, 80000]
+
+    db.export_json(str(tmp_path / "export.json"))
+    other = ListingDatabase(str(tmp_path / "other.sqlite"))
+    assert other.import_json(str(tmp_path / "export.json")) == 3
+    assert list(other.iter_dicts()) == list(db.iter_dicts())
+    assert json.loads((tmp_path / "export.json").read_text(encoding='utf-8'))[1]["middle_rent"] == 99000
+
+
+# Test Case 2: With a database cache every change is written as it happens, no save needed
+def test_store_writes_changes_through(tmp_path, monkeypatch):
+    path = tmp_path / "listings.db"
+    store = make_store(path, monkeypatch)
+    store.add_or_update_listings([make_listing(1), make_listing(2)], recheck_details=False)
+    store.toggle_favourite(make_listing(2).link)
+    store.set_viewed(store.get_listing_by_link(make_listing(1).link))
+    listing = store.get_listing_by_link(make_listing(1).link)
+    listing.remarks = "Quiet"; listing.details_fetched = True; listing.fetch_status = "Details OK"
+    store._persist_changes([listing])
+
+    reopened = make_store(path)  # as after a crash: save_listings_cache() never ran
+    first, second = reopened.get_listing_by_link(make_listing(1).link), reopened.get_listing_by_link(make_listing(2).link)
+    assert first.is_viewed and first.remarks == "Quiet" and first.fetch_status == "Details OK"
+    assert second.is_fav and second.fetch_status == "Pending Details"
+    assert [l.link for l in reopened.get_all_listings()] == [make_listing(1).link, make_listing(2).link]
+
+    reopened.clear_cache_file_and_memory()
+    assert make_store(path).get_all_listings() == []
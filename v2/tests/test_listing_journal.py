@@ -0,0 +1,105 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import listing_store
+from listing import Listing
+from listing_journal import ListingJournal
+from listing_store import ListingStore
+from image_store import ImageStore
+
+BASE_URL = "https://www.monthly-mansion.com"
+
+
+def make_listing(n, rent=80000):
+    return Listing(f"Apartment {n}", f"{BASE_URL}/tokyo/rent/{n}", f"Address {n}", "Station", 25.0, "1K",
+                   "2015年3月", "Card", rent, "5,000円", "10,000円")
+
+
+def make_store(path, monkeypatch):
+    store = ListingStore(cache_file=str(path), image_store=ImageStore(cache_dir=str(path) + ".images"))
+    monkeypatch.setattr(store, "_queue_detail_fetches", lambda listings, priority=None: None)
+    return store
+
+
+def cached_links(path):
+    return [d["link"] for d in json.loads(path.read_text(encoding='utf-8'))]
+
+
+# Test Case 1: Changes survive a crash without a save; the journal replays over the snapshot, a torn last line is skipped
+def test_journal_replays_after_crash(tmp_path, monkeypatch):
+    path = tmp_path / "listings_cache.json"
+    store = make_store(path, monkeypatch)
+    store.add_or_update_listings([make_listing(1), make_listing(2)], recheck_details=False)
+    store.save_listings_cache()
+    assert not os.path.exists(store.listing_journal.path)
+
+    store.add_or_update_listings([make_listing(3)], recheck_details=False)
+    store.toggle_favourite(make_listing(2).link)
+    store.set_viewed(store.get_listing_by_link(make_listing(1).link))
+    store.listing_journal.close()
+    with open(store.listing_journal.path, 'a', encoding='utf-8') as f: f.write('{"link": "' + BASE_URL + '/tokyo/re')
+    assert cached_links(path) == [make_listing(1).link, make_listing(2).link]  # the snapshot wasn't rewritten
+
+    reopened = make_store(path, monkeypatch)
+    assert [l.link for l in reopened.get_all_listings()] == [make_listing(n).link for n in (1, 2, 3)]
+    assert reopened.get_listing_by_link(make_listing(1).link).is_viewed
+    assert reopened.get_listing_by_link(make_listing(2).link).is_fav
+
+
+# Test Case 2: Compaction folds the journal into the cache file, starting on its own past the size threshold
+def test_compaction(tmp_path, monkeypatch):
+    path = tmp_path / "listings_cache.json"
+    monkeypatch.setattr(listing_store, "JOURNAL_COMPACT_BYTES", 2000)
+    store = make_store(path, monkeypatch)
+    store.add_or_update_listings([make_listing(1)], recheck_details=False)
+    assert store._compactor is None and not path.exists()
+
+    store.add_or_update_listings([make_listing(n) for n in range(2, 6)], recheck_details=False)
+    store._compactor.join()
+    assert cached_links(path) == [make_listing(n).link for n in range(1, 6)]
+    assert store.listing_journal.pending_bytes() == 0 and not store.listing_journal.has_entries()
+
+    store.toggle_favourite(make_listing(4).link)  # journaled again, below the threshold
+    store.save_listings_cache(compact=False)
+    assert store.listing_journal.has_entries() and not json.loads(path.read_text(encoding='utf-8'))[3]["is_fav"]
+    assert make_store(path, monkeypatch).get_listing_by_link(make_listing(4).link).is_fav
+
+
+# Test Case 3: Entries rotated by a compaction that never finished are still replayed, before newer ones
+def test_unfinished_compaction_is_replayed(tmp_path):
+    journal = ListingJournal(str(tmp_path / "listings_cache.json"))
+    journal.append([make_listing(1).to_dict(), make_listing(2).to_dict()])
+    journal.rotate()  # the compactor died before writing the cache file
+    journal.append([make_listing(2, rent=99000).to_dict()])
+    journal.close()
+
+    reopened = ListingJournal(str(tmp_path / "listings_cache.json"))
+    assert {link: d["middle_rent"] for link, d in reopened.replay().items()} == {make_listing(1).link: 80000, make_listing(2).link: 99000}
+    reopened.rotate()
+    assert len(reopened.replay()) == 2 and not os.path.exists(reopened.path)
+    reopened.discard_rotated()
+    assert reopened.replay() == {} and not reopened.has_entries()
+
+
+# Test Case 4: Switching to another backend imports the JSON cache with the changes still in its journal
+def test_backend_switch_imports_journal(tmp_path, monkeypatch):
+    path = tmp_path / "listings_cache.json"
+    store = make_store(path, monkeypatch)
+    store.add_or_update_listings([make_listing(1), make_listing(2)], recheck_details=False)
+    store.save_listings_cache()
+    store.add_or_update_listings([make_listing(3)], recheck_details=False)
+    store.toggle_favourite(make_listing(2).link)
+    store.save_listings_cache(compact=False)
+    store.listing_journal.close()
+    assert len(cached_links(path)) == 2 and store.listing_journal.has_entries()
+
+    for cache_file in ("listings.db", "listings_cache.jsonl"):
+        switched = ListingStore(cache_file=str(tmp_path / cache_file), image_store=ImageStore(cache_dir=str(tmp_path / "images")), load_cache=False)
+        monkeypatch.setattr(switched, "_queue_detail_fetches", lambda listings, priority=None: None)
+        assert switched.import_json_cache(str(path)) == 3
+        reopened = make_store(tmp_path / cache_file, monkeypatch)
+        assert [l.link for l in reopened.get_all_listings()] == [make_listing(n).link for n in (1, 2, 3)]
+        assert reopened.get_listing_by_link(make_listing(2).link).is_fav
@@ -0,0 +1,72 @@
+import pytest
+import os
+import sys
+from PyQt5.QtCore import QCoreApplication
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scraper import Scraper, BASE_URL
+from data_manager import DataManager
+from listing import Listing
+from parser_backend import available_backends, get_backend
+
+MOCK_HTML_DIR = os.path.join(os.path.dirname(__file__), 'mock_html')
+LIST_PAGES = ['page_with_listings.html', 'page_with_one_listing.html', 'page_known_links.html', 'page_error.html']
+HTML_HEADERS = {'Content-Type': 'text/html; charset=EUC-JP'}
+
+def read_mock_html(filename):
+    with open(os.path.join(MOCK_HTML_DIR, filename), 'r', encoding='utf-8') as f:
+        return f.read()
+
+def comparable(listing):
+    d = listing.to_dict()
+    d.pop("date_added")
+    return d
+
+def scrape_with_backend(qtbot, requests_mock, backend_name, filename):
+    if QCoreApplication.instance() is None:
+        QCoreApplication(sys.argv if hasattr(sys, 'argv') else [])
+    scraper = Scraper(parser_backend=get_backend(backend_name))
+    requests_mock.get(scraper._build_url(page=1), text=read_mock_html(filename), headers=HTML_HEADERS)
+    requests_mock.get(scraper._build_url(page=2), text=read_mock_html('page_empty.html'), headers=HTML_HEADERS)
+    requests_mock.get(scraper._build_url(page=3), text=read_mock_html('page_empty.html'), headers=HTML_HEADERS)
+    listings_received = []
+    scraper.new_listing.connect(listings_received.append)
+    with qtbot.waitSignal(scraper.finished, timeout=10000) as blocker:
+        scraper.start(layout_params=["1K", "1DK", "1R", "1LDK"], known_links=set(), skip_cached=False)
+    blocker.wait()
+    return [comparable(l) for l in listings_received]
+
+
+def test_unknown_backend_falls_back_to_html_parser():
+    assert get_backend("no-such-parser").name == "html.parser"
+    assert available_backends()[-1] == "html.parser"
+
+
+@pytest.mark.parametrize("backend_name", [b for b in available_backends() if b != "html.parser"])
+@pytest.mark.parametrize("filename", LIST_PAGES)
+def test_list_page_backends_match_html_parser(qtbot, requests_mock, backend_name, filename):
+    expected = scrape_with_backend(qtbot, requests_mock, "html.parser", filename)
+    assert expected
+    assert scrape_with_backend(qtbot, requests_mock, backend_name, filename) == expected
+
+
+@pytest.mark.parametrize("backend_name", available_backends())
+def test_detail_page_backends_extract_same_fields(backend_name, requests_mock, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    requests_mock.get(BASE_URL + "/tokyo/rent/1001", content=read_mock_html('detail_page.html').encode('euc_jp'), headers=HTML_HEADERS)
+    requests_mock.get(BASE_URL + "/img/1001/01.jpg", content=b"jpg-1")
+    requests_mock.get(BASE_URL + "/img/1001/02.jpg", content=b"jpg-2")
+    requests_mock.get("https://cdn.example.com/img/1001/03.png", content=b"png-3")
+
+    data_manager = DataManager(parser_backend=get_backend(backend_name))
+    listing = Listing("Test Apartment 1", BASE_URL + "/tokyo/rent/1001", "Test Address 1", "", 25.0, "1K", "", "", 80000, "", "")
+    data_manager._fetch_listing_details_task(listing)
+
+    assert listing.fetch_status == "Details OK"
+    assert listing.photo_urls == [BASE_URL + "/img/1001/01.jpg", BASE_URL + "/img/1001/02.jpg", "https://cdn.example.com/img/1001/03.png"]
+    assert listing.appliances == ["エアコン", "冷蔵庫", "洗濯機"]
+    assert listing.remarks == "Quiet neighbourhood.\nNo pets allowed.\nTwo minutes to the supermarket."
+    assert (listing.latitude, listing.longitude) == (35.7295, 139.7109)
+    assert data_manager.wait_for_photos(poll_interval=0.05)  # photos download in their own stage
+    assert data_manager.get_photo_data(listing) == [b"jpg-1", b"jpg-2", b"png-3"]
@@ -0,0 +1,45 @@
+import pytest
+import os
+import sys
+import threading
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice
+from PyQt5.QtGui import QImage
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from image_store import ImageStore, THUMBNAIL
+from photo_loader import PhotoLoader
+
+URL = "https://www.monthly-mansion.com/img/1001/"
+
+
+def png_bytes(width, height):
+    image = QImage(width, height, QImage.Format_RGB32); image.fill(0xff336699)
+    data = QByteArray(); buffer = QBuffer(data); buffer.open(QIODevice.WriteOnly); image.save(buffer, "PNG")
+    return bytes(data)
+
+
+# Test Case 1: Photos are decoded in the background; a new generation drops the old one's results
+def test_photo_loader_streams_and_cancels(qtbot, tmp_path, monkeypatch):
+    store = ImageStore(cache_dir=str(tmp_path))
+    store.put(URL + "01.png", png_bytes(120, 80)); store.put(URL + "02.png", png_bytes(60, 40))
+    loader = PhotoLoader(store, max_workers=1)
+    received = []
+    loader.image_ready.connect(lambda *args: received.append(args))
+
+    # Hold the worker on the first listing's photo until the user has moved on
+    release = threading.Event()
+    original_get = store.get
+    monkeypatch.setattr(store, "get", lambda url, rendition=None: (release.wait(5), original_get(url, rendition))[1])
+    stale = loader.start()
+    loader.request(stale, 0, URL + "01.png", THUMBNAIL)
+    loader.request(stale, 1, URL + "02.png", THUMBNAIL)
+    current = loader.start()
+    loader.request(current, 0, URL + "02.png", THUMBNAIL)
+    loader.request(current, 1, URL + "missing.png", THUMBNAIL)
+    release.set()
+
+    qtbot.waitUntil(lambda: len(received) == 2, timeout=5000)
+    assert [(g, i, r) for g, i, r, _ in received] == [(current, 0, THUMBNAIL), (current, 1, THUMBNAIL)]
+    assert received[0][3].width() == 60 and received[1][3].isNull()
+    loader.shutdown()
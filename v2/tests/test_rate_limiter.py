@@ -0,0 +1,54 @@
+import pytest
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import rate_limiter
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+
+
+# Test Case 1: Throttling halves the rate, successes raise it again (AIMD)
+def test_aimd_rate_changes(monkeypatch):
+    limiter = AdaptiveRateLimiter(rate=4.0, min_rate=0.5, max_rate=5.0)
+    limiter.record_response(429)
+    assert limiter.current_rate == 2.0
+    limiter.record_response(503) # within the cooldown, counts as the same congestion event
+    assert limiter.current_rate == 2.0
+    for _ in range(3): limiter.record_response(200)
+    assert limiter.current_rate == pytest.approx(2.0 + 3 * rate_limiter.INCREASE_STEP)
+    monkeypatch.setattr(rate_limiter, "DECREASE_COOLDOWN", 0)
+    for _ in range(10): limiter.record_throttle()
+    assert limiter.current_rate == 0.5
+    for _ in range(100): limiter.record_success()
+    assert limiter.current_rate == 5.0
+
+
+# Test Case 2: The bucket spaces requests at the current rate after the burst
+def test_token_bucket_paces_requests():
+    limiter = AdaptiveRateLimiter(rate=20.0, burst=2)
+    start = time.monotonic()
+    for _ in range(6): assert limiter.acquire()
+    # 2 from the burst, then 4 more at 20/s (~0.2s)
+    assert 0.15 <= time.monotonic() - start < 1.0
+
+
+# Test Case 3: Retry-After pauses every caller and a stop event interrupts the wait
+def test_retry_after_blocks_and_stop_interrupts():
+    limiter = AdaptiveRateLimiter(rate=10.0)
+    limiter.record_response(429, "30")
+    assert limiter.snapshot()["blocked_for"] > 29
+    stop = threading.Event()
+    threading.Timer(0.1, stop.set).start()
+    start = time.monotonic()
+    assert limiter.acquire(stop) is False
+    assert time.monotonic() - start < 5
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0 # in the past
+    assert parse_retry_after("soon") is None
@@ -229,7 +229,7 @@ def test_scrape_http_client_error_then_gives_up(scraper_qtbot, requests_mock):
     # Temporarily modify global constants from scraper module for this test
     # This is generally not ideal, but for testing retry logic it's pragmatic
     # A better way would be to make these configurable on the Scraper instance
-    import scraper as scraper_module # Local import for modifying module globals
+    import crawler as scraper_module # Retry constants live in the Qt-free crawl module
     original_initial_backoff = scraper_module.INITIAL_BACKOFF_TIME
     original_max_backoff = scraper_module.MAX_BACKOFF_TIME
     original_max_retries = scraper_module.MAX_SCRAPER_RETRIES
@@ -275,7 +275,7 @@ def test_scrape_http_server_error_then_gives_up(scraper_qtbot, requests_mock):
     listings_received = []
     scraper.new_listing.connect(listings_received.append)
 
-    import scraper as scraper_module
+    import crawler as scraper_module
     original_initial_backoff = scraper_module.INITIAL_BACKOFF_TIME
     original_max_backoff = scraper_module.MAX_BACKOFF_TIME
     original_max_retries = scraper_module.MAX_SCRAPER_RETRIES
@@ -317,7 +317,7 @@ def test_scrape_network_error_then_gives_up(scraper_qtbot, requests_mock):
     listings_received = []
     scraper.new_listing.connect(listings_received.append)
 
-    import scraper as scraper_module
+    import crawler as scraper_module
     original_initial_backoff = scraper_module.INITIAL_BACKOFF_TIME
     original_max_backoff = scraper_module.MAX_BACKOFF_TIME
     original_max_retries = scraper_module.MAX_SCRAPER_RETRIES
@@ -341,3 +341,159 @@ def test_scrape_network_error_then_gives_up(scraper_qtbot, requests_mock):
     assert "Max retries exceeded" in error_message
     assert "ConnectTimeout" in error_message # Check for the exception type in the message
     assert requests_mock.call_count == 1 + 2 # Use the actual value set for the test (2)
+
+
+# Test Case 9: Pipelined crawl keeps page order and still stops after two empty pages
+def test_scrape_pipelined_pages_in_order(scraper_qtbot, requests_mock):
+    scraper, qtbot = scraper_qtbot
+
+    pages = ['page_with_listings.html', 'page_with_one_listing.html', 'page_empty.html', 'page_empty.html',
+             'page_empty.html', 'page_empty.html', 'page_empty.html']
+    for page_no, filename in enumerate(pages, start=1):
+        requests_mock.get(scraper._build_url(page=page_no), text=read_mock_html(filename), headers={'Content-Type': 'text/html; charset=EUC-JP'})
+
+    listings_received = []
+    scraper.new_listing.connect(listings_received.append)
+
+    with qtbot.waitSignal(scraper.finished, timeout=10000) as blocker:
+        scraper.start(layout_params=["1K", "1DK", "1R"], known_links=set(), skip_cached=False, page_concurrency=3)
+
+    blocker.wait()
+
+    assert [l.link for l in listings_received] == [
+        BASE_URL + "/tokyo/rent/1001", BASE_URL + "/tokyo/rent/1002",
+        BASE_URL + "/tokyo/rent/1003", BASE_URL + "/tokyo/rent/2001",
+    ]
+    # Pages 5 and 6 may already be in flight when page 4 ends the crawl, but nothing beyond the window
+    requested_pages = {int(r.qs['pno'][0]) for r in requests_mock.request_history}
+    assert {1, 2, 3, 4} <= requested_pages <= {1, 2, 3, 4, 5, 6}
+
+
+# Test Case 10: List-page parsing is a pure function that runs in a process pool
+def test_parse_list_page_in_process_pool():
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from list_parser import parse_list_page
+
+    raw = read_mock_html('page_with_listings.html').encode('utf-8')
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pooled = pool.submit(parse_list_page, raw, 1).result()
+
+    assert pooled == parse_list_page(raw, 1)
+    assert [d["link"] for d in pooled] == [BASE_URL + "/tokyo/rent/1001", BASE_URL + "/tokyo/rent/1002", BASE_URL + "/tokyo/rent/1003"]
+    assert Listing(**pooled[0]).middle_rent == 80000
+
+
+# Test Case 11: Scraper hands parsing to worker processes
+def test_scrape_with_parse_workers(scraper_qtbot, requests_mock):
+    scraper, qtbot = scraper_qtbot
+    requests_mock.get(scraper._build_url(page=1), text=read_mock_html('page_with_listings.html'), headers={'Content-Type': 'text/html; charset=EUC-JP'})
+    requests_mock.get(scraper._build_url(page=2), text=read_mock_html('page_empty.html'), headers={'Content-Type': 'text/html; charset=EUC-JP'})
+    requests_mock.get(scraper._build_url(page=3), text=read_mock_html('page_empty.html'), headers={'Content-Type': 'text/html; charset=EUC-JP'})
+
+    listings_received = []
+    scraper.new_listing.connect(listings_received.append)
+
+    with qtbot.waitSignal(scraper.finished, timeout=20000) as blocker:
+        scraper.start(layout_params=["1K", "1DK", "1R"], known_links=set(), skip_cached=False, parse_workers=2)
+
+    blocker.wait()
+
+    assert [l.title for l in listings_received] == ["Test Apartment 1", "Test Apartment 2", "Test Apartment 3 Minimal"]
+
+
+# Test Case 12: Each page is also delivered as one listings_batch
+def test_scrape_emits_one_batch_per_page(scraper_qtbot, requests_mock):
+    scraper, qtbot = scraper_qtbot
+    requests_mock.get(scraper._build_url(page=1), text=read_mock_html('page_with_listings.html'), headers={'Content-Type': 'text/html; charset=EUC-JP'})
+    requests_mock.get(scraper._build_url(page=2), text=read_mock_html('page_known_links.html'), headers={'Content-Type': 'text/html; charset=EUC-JP'})
+    requests_mock.get(scraper._build_url(page=3), text=read_mock_html('page_empty.html'), headers={'Content-Type': 'text/html; charset=EUC-JP'})
+    requests_mock.get(scraper._build_url(page=4), text=read_mock_html('page_empty.html'), headers={'Content-Type': 'text/html; charset=EUC-JP'})
+
+    batches = []
+    scraper.listings_batch.connect(batches.append)
+    known_links = {BASE_URL + "/tokyo/rent/4001", BASE_URL + "/tokyo/rent/4003"}
+
+    with qtbot.waitSignal(scraper.finished, timeout=10000) as blocker:
+        scraper.start(layout_params=["1K", "1DK", "1R"], known_links=known_links, skip_cached=True)
+
+    blocker.wait()
+
+    assert [[l.link.rsplit('/', 1)[1] for l in batch] for batch in batches] == [["1001", "1002", "1003"], ["4002"]]
+
+
+# Test Case 13: Delta crawl stops after K fully known pages and reports the pages saved
+def test_scrape_delta_stops_on_known_pages(scraper_qtbot, requests_mock):
+    scraper, qtbot = scraper_qtbot
+    pages = ['page_with_one_listing.html', 'page_known_links.html', 'page_with_listings.html', 'page_with_listings.html']
+    for page_no, filename in enumerate(pages, start=1):
+        requests_mock.get(scraper._build_url(page=page_no), text=read_mock_html(filename), headers={'Content-Type': 'text/html; charset=EUC-JP'})
+    known_links = {BASE_URL + f"/tokyo/rent/{n}" for n in (1001, 1002, 1003, 4001, 4002, 4003)}
+
+    listings_received = []
+    scraper.new_listing.connect(listings_received.append)
+
+    with qtbot.waitSignal(scraper.finished, timeout=10000) as blocker:
+        scraper.start(layout_params=["1K", "1DK", "1R"], known_links=known_links, skip_cached=True,
+                      known_page_stop=2, expected_pages=10)
+
+    blocker.wait()
+
+    assert [l.link for l in listings_received] == [BASE_URL + "/tokyo/rent/2001"]
+    assert requests_mock.call_count == 3 # page 4 is never requested
+    assert scraper.last_crawl_stats["stopped_early"]
+    assert scraper.last_crawl_stats["pages_fetched"] == 3
+    assert scraper.last_crawl_stats["pages_saved"] == 7
+
+
+# Test Case 14: Sharded crawl paginates each ward x layout query separately and merges by link
+def test_scrape_sharded_merges_by_link(scraper_qtbot, requests_mock):
+    scraper, qtbot = scraper_qtbot
+    html = {'Content-Type': 'text/html; charset=EUC-JP'}
+    shard_pages = {
+        ("13101", "1K"): ['page_with_listings.html', 'page_empty.html', 'page_empty.html'],
+        ("13101", "1R"): ['page_with_one_listing.html', 'page_with_listings.html', 'page_empty.html', 'page_empty.html'],
+        ("13102", "1K"): ['page_empty.html', 'page_empty.html'],
+        ("13102", "1R"): ['page_known_links.html', 'page_empty.html', 'page_empty.html'],
+    }
+    for (ward, layout), pages in shard_pages.items():
+        for page_no, filename in enumerate(pages, start=1):
+            url = scraper._build_url(page_no, ward_codes=[ward], layout_params=[layout])
+            requests_mock.get(url, text=read_mock_html(filename), headers=html)
+
+    listings_received = []
+    scraper.new_listing.connect(listings_received.append)
+
+    with qtbot.waitSignal(scraper.finished, timeout=20000) as blocker:
+        scraper.start(layout_params=["1K", "1R"], known_links=set(), skip_cached=False,
+                      sharded=True, ward_codes=["13101", "13102"], shard_concurrency=2)
+
+    blocker.wait()
+
+    links = sorted(l.link.rsplit('/', 1)[1] for l in listings_received)
+    assert links == ["1001", "1002", "1003", "2001", "4001", "4002", "4003"]
+    assert requests_mock.call_count == sum(len(pages) for pages in shard_pages.values())
+    assert scraper.last_crawl_stats["shards"] == 4
+    assert scraper.last_crawl_stats["reached_end"]
+
+
+# Test Case 15: Fetches still in flight when the crawl ends stop instead of backing off and retrying
+def test_crawl_end_stops_in_flight_fetches(requests_mock):
+    import threading
+    import time
+    from crawler import Crawler
+    from rate_limiter import AdaptiveRateLimiter
+
+    crawler = Crawler(rate_limiter=AdaptiveRateLimiter(rate=1000, max_rate=1000, burst=100))
+    pages = ['page_with_listings.html', 'page_empty.html', 'page_empty.html']
+    for page_no, filename in enumerate(pages, start=1):
+        requests_mock.get(crawler._build_url(page=page_no, layout_params=["1K"]), text=read_mock_html(filename), headers={'Content-Type': 'text/html; charset=EUC-JP'})
+    for page_no in (4, 5):  # past the end: the server is overloaded
+        requests_mock.get(crawler._build_url(page=page_no, layout_params=["1K"]), status_code=503)
+
+    crawler.start(layout_params=["1K"], known_links=set(), skip_cached=False, page_concurrency=4, background=False)
+
+    deadline = time.monotonic() + 2  # well before the first retry (INITIAL_BACKOFF_TIME)
+    while any(t.name.startswith("scraper-page") for t in threading.enumerate()) and time.monotonic() < deadline: time.sleep(0.05)
+    assert not any(t.name.startswith("scraper-page") for t in threading.enumerate())
+    assert sum(int(r.qs['pno'][0]) > 3 for r in requests_mock.request_history) <= 2  # no retries